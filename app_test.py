@@ -1,4 +1,8 @@
-from datetime import datetime
+import hmac
+import os
+import sys
+
+import flask
 import pandas as pd
 import numpy as np
 
@@ -6,304 +10,184 @@ import dash
 import dash_table
 import dash_core_components as dcc
 import dash_html_components as html
-from dash.dependencies import Input, Output
+from dash.dependencies import Input, Output, State
 
+from assignment import HAS_SCIPY, solve
+from competency import COMPETENCIES
+from data_loader import DataStore
+from metrics import METRICS, profiled, timed
+from org_chart import employee_id
+from ranking import top_k_indices
+from result_cache import ResultCache
+from table_query import PAGE_SIZE, page_count, page_rows, query_table
 
-app = dash.Dash(__name__)
 
 # ------------------------------------------------------------------------------
-# Import and clean data
-feedback_360 = pd.read_excel('360_feedback.xlsx')
-target = pd.read_excel('target.xlsx')
-talent = pd.read_excel('talent.xlsx')
-job_signatures = pd.read_excel("job_signatures.xlsx")
-job_history = pd.read_excel("job_history.xlsx")
-
-def yearsinfunction(hist):
-  hist = hist.sort_values(['Unique ID', 'Effective Date']) # sort value by ID and date
-  yearsinjob = (hist.groupby('Unique ID')['Effective Date'].shift(-1, fill_value=pd.datetime.today()) \
-    - hist.groupby('Unique ID')['Effective Date'].shift(0))/np.timedelta64(1, 'Y') # calculate years in this role
-  hist['yearsinjob'] = yearsinjob.round(1)
-  yearsinfunction = hist.groupby(['Unique ID','Function'])['yearsinjob'].sum() # calculate years in this function
-  hist = hist.merge(yearsinfunction, how = 'left', on=['Unique ID','Function']) \
-    .rename(columns={"yearsinjob_x": "yearsinjob", "yearsinjob_y": "yearsinfunction"})
-  hist['weighted_yearsinfunction'] = hist['yearsinfunction'] * hist['Pay Scale Group'] # weight the years
-  output = hist[['Unique ID', 'Function', 'yearsinfunction', 'weighted_yearsinfunction']].drop_duplicates(subset=['Unique ID', 'Function'], keep='first')
-  output = output.rename(columns={'yearsinfunction': 'Time in Function (years)', 'weighted_yearsinfunction': 'Time in Function Weighted (years)'})
-  return output
-
-job_history['Function'] = job_history['Function'].replace(['Tax','Accounting'], 'Finance')
-job_history['Function'] = job_history['Function'].replace(['Coffee'], 'Culinary')
-job_history['Function'] = job_history['Function'].replace(['Facilities'], 'People')
-job_history['Function'] = job_history['Function'].replace(['Global Development'], 'Development')
-time_in_function = yearsinfunction(job_history)
-target['Position Key'] = target['Position'].astype(str) + " " + target['Position Text']
-
-# swap 'communication' and 'working with others'
-titles = list(talent.columns)
-titles[6], titles[7] = titles[7], titles[6]
-talent = talent[titles]
-
-talent_pool = talent.merge(target, how="left", left_on='Unique ID', right_on='Unique ID')
-talent_pool = talent_pool.rename(columns={"9box Score (box number 1-9)": "9Box Score"})
-talent_pool['Sum of Weighted Differences'] = np.nan
-talent_pool['Sum of Weighted Differences (Absolute)'] = np.nan
-talent_pool['Time in Function (years)'] = np.nan
-talent_pool['Time in Function Weighted (years)'] = np.nan
-position_pool = target.merge(job_signatures, left_on="Job Profile", right_on="Job Profile Name")
-position_pool = position_pool.rename(columns={"Communication": "Communications"})
-position_pool = position_pool.rename(columns={"Influence and Negotiation": "Influence & Negotiation"})
-position_pool = position_pool.rename(columns={"Job Family Group_x": "Job Family Group"})
-position_pool['Sum of Weighted Differences'] = np.nan
-position_pool['Sum of Weighted Differences (Absolute)'] = np.nan
-
-# The following code finds and cuts the wrong scores (those were added twice) in half
-wrong_list=[]
-for row in range(0, talent_pool.iloc[:, 3:17].shape[0]):
-  for col in range(1, talent_pool.iloc[:, 3:17].shape[1]):
-    if talent_pool.iloc[:, 3:17].iloc[row, col] == 6:
-      if row not in wrong_list:
-        wrong_list.append(row)
-for row in wrong_list:
-  for column in range(3, 18):
-    talent_pool.iloc[row, column] = talent_pool.iloc[row, column].astype(int)/2
+# App layout
+# How long a page load waits for the warm-up before showing the loading page
+LAYOUT_WAIT_SECONDS = 1
 
-# ------------------------------------------------------------------------------
-# Prepare for app layout
-# Fill a position with the right employee
-# Choose the position you want to fill
-position_list = np.sort(target['Position Key'].unique())
-position_option = [{'label': i, 'value': i} for i in position_list]
+# Choices for how many of the best matches to show; no choice shows all of them
+TOP_K_OPTIONS = [10, 25, 50, 100]
 
-# Choose the constraints
-employee_level_list = np.sort(talent_pool['Employee Level'].unique())
-employee_level_option = [{'label': i, 'value': i} for i in employee_level_list]
+# The tables start empty with only their columns and are filled by the callbacks
+# once something is selected. The position and employee dropdowns start with no
+# options and offer at most OPTION_LIMIT matches of what has been typed.
+OPTION_LIMIT = 50
 
-function_list = np.sort(target['Function'].unique().astype(str))
-function_option = [{'label': i, 'value': i} for i in function_list]
+POSITION_TABLE_COLUMNS = ['Position', "Position Text", "Manager Unique ID", "Job Profile", "Job Profile Pay Band",
+                          "Job Family Group", "Company Code", "Location", "Organization", "Function", "Department",
+                          "Specialist / Generalist", "Qualification/Certification?"] + COMPETENCIES
 
-location_list = np.sort(target['Location'].unique().astype(str))
-location_option = [{'label': i, 'value': i} for i in location_list]
+CANDIDATE_TABLE_COLUMNS = ['Unique ID', "Employee Level", "9Box Score", 'Position Text', "Mobility", "Employee Preference",
+                           "Location", "Function", "Time in Position (months)", "Time in Level (months)",
+                           "Time in Company (years)", 'Time in Function (years)', 'Time in Function Weighted (years)'] + \
+                          COMPETENCIES + ['Sum of Weighted Differences', 'Sum of Weighted Differences (Absolute)']
 
-# Find an employee the right position
-employee_list = np.sort(talent['Unique ID'].unique())
-employee_option = [{'label': i, 'value': i} for i in employee_list]
+EMPLOYEE_TABLE_COLUMNS = ['Unique ID', "Employee Level", "9Box Score", "Previous 9Box Score", "Mobility",
+                          "Employee Preference", "Position Text", "Job Profile Pay Band", "Location", "Organization",
+                          "Function", 'Time in Position (months)', 'Time in Level (months)',
+                          'Time in Company (years)'] + COMPETENCIES
 
-job_profile_pay_band_list = np.sort(target['Job Profile Pay Band'].unique())
-job_profile_pay_band_option = [{'label': i, 'value': i} for i in job_profile_pay_band_list]
+POSITION_RESULT_TABLE_COLUMNS = POSITION_TABLE_COLUMNS + ['Sum of Weighted Differences', 'Sum of Weighted Differences (Absolute)']
 
-# ------------------------------------------------------------------------------
-# App layout
+# the employees nearest to the selected one by the weighted L1 distance of their competencies
+SIMILAR_TABLE_COLUMNS = ['Rank', 'Unique ID', "Employee Level", "9Box Score", 'Position Text', "Mobility",
+                         "Employee Preference", "Location", "Function", "Time in Position (months)",
+                         "Time in Level (months)", "Time in Company (years)"] + COMPETENCIES + ['Competency Distance']
 
-app.layout = html.Div([
-    dcc.Tabs([
-        dcc.Tab(label='Fill A Position With The Right Employee', children=[
+SIMILAR_DEFAULT = 10
 
-        html.H1(children='RBI Succession Planning System', className='six columns'),
+# one employee per open position, every employee at most once
+ASSIGNMENT_TABLE_COLUMNS = ['Position Key', 'Job Profile', 'Job Profile Pay Band', 'Unique ID', 'Employee Level',
+                            'Slate Rank', 'Sum of Weighted Differences', 'Sum of Weighted Differences (Absolute)']
 
-        html.Br(),
+# every seat opened by a proposed move, in the order the chain reaches it
+RIPPLE_TABLE_COLUMNS = ['Step', 'Position Key', 'Job Profile', 'Job Profile Pay Band', 'Reports To', 'Vacated By',
+                        'Unique ID', 'Employee Level', 'Slate Rank', 'Sum of Weighted Differences',
+                        'Sum of Weighted Differences (Absolute)', 'Outcome']
 
-        html.H4("Please choose the target position:"),
-        dcc.Dropdown(id="slct_position",
-                     options=position_option,
-                     multi=False,
-                     searchable=True,
-                     placeholder="Target Position"
-                     ),
+RIPPLE_STEP_OPTIONS = [1, 2, 3, 5, 10, 25]
 
-        html.Br(),
+# paged, sorted and filtered on the server; the browser only holds the page on
+# screen, so its CSV export is replaced by download_button, which sends every row
+SERVER_SIDE_TABLE = dict(page_action='custom', page_current=0, page_size=PAGE_SIZE, sort_action='custom',
+                         sort_mode='multi', sort_by=[], filter_action='custom', filter_query='', export_format='none')
 
-        html.H4("Please select time scale:"),
-        dcc.Dropdown(id="slct_time_scale_employee",
-                     options=[
-                        {'label': 'Ready Now', 'value': 'Ready Now'},
-                        {'label': 'Ready Soon', 'value': 'Ready Soon'},
-                        {'label': 'Ready Later', 'value': 'Ready Later'}
-                     ],
-                     multi=False,
-                     searchable=True,
-                     placeholder="Time Scale"
-                     ),
-
-        html.Br(),
-
-        html.H4("Please select relevant employee preferences:"),
-
-        dcc.Dropdown(id="slct_employee_level",
-                     options=employee_level_option,
-                     multi=True,
-                     searchable=True,
-                     placeholder="Employee Level"
-                     ),
 
+def loading_layout(store):
+    return html.Div([
+        html.H1(children='RBI Succession Planning System', className='six columns'),
         html.Br(),
+        html.H4(id='loading_status', children=describe_progress(store.status())),
+        dcc.Interval(id='loading_poll', interval=1000),
+        dcc.Location(id='loading_reload', refresh=True)
+    ])
 
-        dcc.Dropdown(id="slct_employee_function",
-                     options=function_option,
-                     multi=True,
-                     searchable=True,
-                     placeholder="Function"
-                     ),
 
-        html.Br(),
+def describe_progress(status):
+    progress = status['progress']
+    if status['status'] == 'error':
+        return "Loading the data failed: " + progress.get('error', '')
+    if progress['stage'] == 'reading':
+        return "Loading data: {} of {} workbooks read".format(progress['workbooks_read'], progress['workbooks_total'])
+    return "Loading data ({})...".format(progress['stage'])
 
-        dcc.Dropdown(id="slct_employee_location",
-                     options=location_option,
-                     multi=True,
-                     searchable=True,
-                     placeholder="Location"
-                     ),
 
-        html.Br(),
+def describe_matches(shown, total, what, filtered=None):
+    if shown < total:
+        text = "Showing the best {} of {} matching {}".format(shown, total, what)
+    else:
+        text = "{} matching {}".format(total, what)
+    if filtered is not None and filtered < shown:
+        text += ", {} after the table filters".format(filtered)
+    return text
 
-        dcc.Dropdown(
-                id='slct_9box',
-                options=[
-                    {'label': '1', 'value': 1},
-                    {'label': '2', 'value': 2},
-                    {'label': '3', 'value': 3},
-                    {'label': '4', 'value': 4},
-                    {'label': '5', 'value': 5},
-                    {'label': '6', 'value': 6},
-                    {'label': '7', 'value': 7},
-                    {'label': '8', 'value': 8},
-                    {'label': '9', 'value': 9}
-                ],
-                multi=True,
-                searchable=True,
-                placeholder="9 Box Score"
-            ),
 
-        html.Br(),
+def download_button(table_id):
+    # every row of a server-side table after its filter and sort, as CSV
+    return html.Div([
+        html.Button("Download all rows (CSV)", id=table_id + '_download_button'),
+        dcc.Download(id=table_id + '_download')
+    ])
 
-        dcc.Dropdown(
-            id='tip',
-            options=[
-                {'label': '6', 'value': 6},
-                {'label': '12', 'value': 12},
-                {'label': '18', 'value': 18},
-                {'label': '24', 'value': 24}
-            ],
-            multi=False,
-            searchable=False,
-            placeholder="Minimum Time In Position Target (Months)"
-        ),
 
-        html.Br(),
+def data_table(table_id, columns, **props):
+    props.setdefault('export_format', "csv")
+    return dash_table.DataTable(
+        id=table_id,
+        columns=[{"name": i, "id": i} for i in columns],
+        data=[],
 
-        dcc.Dropdown(
-            id='til',
-            options=[
-                {'label': '12', 'value': 12},
-                {'label': '18', 'value': 18},
-                {'label': '24', 'value': 24},
-                {'label': '30', 'value': 30},
-                {'label': '36', 'value': 36}
-            ],
-            multi=False,
-            searchable=True,
-            placeholder="Minimum Time In Level Target (Months)"
-        ),
+        style_cell={
+            'font_family': 'arial',
+            'font_size': '14px',
+            'text_align': 'left'
+        },
 
-        html.Br(),
-        html.Br(),
-        html.Br(),
+        style_table={'overflowX': 'auto'},
 
-        dash_table.DataTable(
-            id='output1',
-            columns=[{"name": i, "id": i} for i in position_pool[['Position', "Position Text", "Manager Unique ID", "Job Profile", "Job Profile Pay Band",
-                              "Job Family Group", "Company Code", "Location", "Organization", "Function", "Department", "Specialist / Generalist", "Qualification/Certification?",
-                              'Quantitative', 'Analytical', 'Conceptual', 'Communications', 'Working with Others',
-                              'Influence & Negotiation', 'Work Management', 'People Management',
-                              'Inspiring Leadership', 'Company', 'Industry Knowledge', 'General Business Knowledge',
-                              'Functional Expertise', 'Mentoring']].columns],
-            data=position_pool[['Position', "Position Text", "Manager Unique ID", "Job Profile", "Job Profile Pay Band",
-                              "Job Family Group", "Company Code", "Location", "Organization", "Function", "Department", "Specialist / Generalist", "Qualification/Certification?",
-                              'Quantitative', 'Analytical', 'Conceptual', 'Communications', 'Working with Others',
-                              'Influence & Negotiation', 'Work Management', 'People Management',
-                              'Inspiring Leadership', 'Company', 'Industry Knowledge', 'General Business Knowledge',
-                              'Functional Expertise', 'Mentoring']].to_dict('records'),
-            export_format="csv",
-
-            style_cell={
-                'font_family': 'arial',
-                'font_size': '14px',
-                'text_align': 'left'
-            },
-
-            style_table={'overflowX': 'auto'},
-
-            style_data_conditional=[
-                {
-                    'if': {'row_index': 'odd'},
-                    'backgroundColor': 'rgb(248, 248, 248)'
-                }
-            ],
-            style_header={
-                'backgroundColor': 'rgb(230, 230, 230)',
-                'fontWeight': 'bold'
+        style_data_conditional=[
+            {
+                'if': {'row_index': 'odd'},
+                'backgroundColor': 'rgb(248, 248, 248)'
             }
-        ),
+        ],
+        style_header={
+            'backgroundColor': 'rgb(230, 230, 230)',
+            'fontWeight': 'bold'
+        },
+        **props
+    )
+
+
+def matching_options(values, search_text, search, selected, limit=OPTION_LIMIT):
+    # dropdown options for the values whose text contains search, and the selected value(s)
+    options = []
+    if search:
+        rows = np.flatnonzero(np.char.find(search_text, search.lower()) >= 0)[:limit]
+        options = [{'label': v, 'value': v} for v in values[rows].tolist()]
+    shown = [o['value'] for o in options]
+    for value in reversed(selected if isinstance(selected, list) else [selected]):
+        if value is not None and value not in shown:
+            options.insert(0, {'label': value, 'value': value})
+    return options
+
+
+def serve_layout(data):
+    # Prepare for app layout
+    # Fill a position with the right employee
+    # Choose the constraints
+    employee_level_option = [{'label': i, 'value': i} for i in data.employee_level_list]
+    function_option = [{'label': i, 'value': i} for i in data.function_list]
+    location_option = [{'label': i, 'value': i} for i in data.location_list]
+
+    top_k_option = [{'label': str(k), 'value': k} for k in TOP_K_OPTIONS]
+
+    return html.Div([
+        dcc.Tabs([
+            dcc.Tab(label='Fill A Position With The Right Employee', children=[
 
-            html.Br(),
-            html.Br(),
-            html.Br(),
-
-        dash_table.DataTable(
-            id='output2',
-            columns=[{"name": i, "id": i} for i in talent_pool[['Unique ID', "Employee Level", "9Box Score", 'Position Text', "Mobility", "Employee Preference", "Location", "Function", "Time in Position (months)", "Time in Level (months)", "Time in Company (years)",
-                              'Time in Function (years)', 'Time in Function Weighted (years)', 'Quantitative', 'Analytical', 'Conceptual', 'Communications', 'Working with Others',
-                              'Influence & Negotiation', 'Work Management', 'People Management',
-                              'Inspiring Leadership', 'Company', 'Industry Knowledge', 'General Business Knowledge',
-                              'Functional Expertise', 'Mentoring', 'Sum of Weighted Differences', 'Sum of Weighted Differences (Absolute)']].columns],
-            data=talent_pool[['Unique ID', "Employee Level", "9Box Score", 'Position Text', "Mobility", "Employee Preference", "Location", "Function", "Time in Position (months)", "Time in Level (months)", "Time in Company (years)",
-                              'Time in Function (years)', 'Time in Function Weighted (years)', 'Quantitative', 'Analytical', 'Conceptual', 'Communications', 'Working with Others',
-                              'Influence & Negotiation', 'Work Management', 'People Management',
-                              'Inspiring Leadership', 'Company', 'Industry Knowledge', 'General Business Knowledge',
-                              'Functional Expertise', 'Mentoring', 'Sum of Weighted Differences', 'Sum of Weighted Differences (Absolute)']].to_dict('records'),
-            export_format="csv",
-
-            style_cell={
-                'font_family': 'arial',
-                'font_size': '14px',
-                'text_align': 'left'
-            },
-
-            style_table={'overflowX': 'auto'},
-
-            style_data_conditional=[
-                {
-                    'if': {'row_index': 'odd'},
-                    'backgroundColor': 'rgb(248, 248, 248)'
-                }
-            ],
-            style_header={
-                'backgroundColor': 'rgb(230, 230, 230)',
-                'fontWeight': 'bold'
-            }
-        )
-        ]),
-        dcc.Tab(label='Find An Employee The Right Position', children=[
             html.H1(children='RBI Succession Planning System', className='six columns'),
 
             html.Br(),
 
-            html.H4("Please choose the target employee:"),
-            dcc.Dropdown(id="slct_employee",
-                         options=employee_option,
+            html.H4("Please choose the target position:"),
+            dcc.Dropdown(id="slct_position",
+                         options=[],
                          multi=False,
                          searchable=True,
-                         placeholder="Target Employee"
+                         placeholder="Target Position (type to search)"
                          ),
 
             html.Br(),
 
             html.H4("Please select time scale:"),
-            dcc.Dropdown(id="slct_time_scale_position",
+            dcc.Dropdown(id="slct_time_scale_employee",
                          options=[
-                             {'label': 'Ready Now', 'value': 'Ready Now'},
-                             {'label': 'Ready Soon', 'value': 'Ready Soon'},
-                             {'label': 'Ready Later', 'value': 'Ready Later'}
+                            {'label': 'Ready Now', 'value': 'Ready Now'},
+                            {'label': 'Ready Soon', 'value': 'Ready Soon'},
+                            {'label': 'Ready Later', 'value': 'Ready Later'}
                          ],
                          multi=False,
                          searchable=True,
@@ -312,18 +196,18 @@ app.layout = html.Div([
 
             html.Br(),
 
-            html.H4("Please select relevant position preferences:"),
+            html.H4("Please select relevant employee preferences:"),
 
-            dcc.Dropdown(id="slct_job_profile_pay_band",
+            dcc.Dropdown(id="slct_employee_level",
                          options=employee_level_option,
                          multi=True,
                          searchable=True,
-                         placeholder="Job Profile Pay Band"
+                         placeholder="Employee Level"
                          ),
 
             html.Br(),
 
-            dcc.Dropdown(id="slct_position_function",
+            dcc.Dropdown(id="slct_employee_function",
                          options=function_option,
                          multi=True,
                          searchable=True,
@@ -332,7 +216,7 @@ app.layout = html.Div([
 
             html.Br(),
 
-            dcc.Dropdown(id="slct_position_location",
+            dcc.Dropdown(id="slct_employee_location",
                          options=location_option,
                          multi=True,
                          searchable=True,
@@ -340,140 +224,590 @@ app.layout = html.Div([
                          ),
 
             html.Br(),
+
+            dcc.Dropdown(
+                    id='slct_9box',
+                    options=[
+                        {'label': '1', 'value': 1},
+                        {'label': '2', 'value': 2},
+                        {'label': '3', 'value': 3},
+                        {'label': '4', 'value': 4},
+                        {'label': '5', 'value': 5},
+                        {'label': '6', 'value': 6},
+                        {'label': '7', 'value': 7},
+                        {'label': '8', 'value': 8},
+                        {'label': '9', 'value': 9}
+                    ],
+                    multi=True,
+                    searchable=True,
+                    placeholder="9 Box Score"
+                ),
+
             html.Br(),
+
+            dcc.Dropdown(
+                id='tip',
+                options=[
+                    {'label': '6', 'value': 6},
+                    {'label': '12', 'value': 12},
+                    {'label': '18', 'value': 18},
+                    {'label': '24', 'value': 24}
+                ],
+                multi=False,
+                searchable=False,
+                placeholder="Minimum Time In Position Target (Months)"
+            ),
+
             html.Br(),
 
-            dash_table.DataTable(
-                id='output3',
-                columns=[{"name": i, "id": i} for i in talent_pool[
-                    ['Unique ID', "Employee Level", "9Box Score", "Previous 9Box Score", "Mobility",
-                     "Employee Preference", "Position Text", "Job Profile Pay Band", "Location", "Organization", "Function",
-                     'Time in Position (months)', 'Time in Level (months)', 'Time in Company (years)',
-                     'Quantitative', 'Analytical', 'Conceptual', 'Communications', 'Working with Others',
-                     'Influence & Negotiation', 'Work Management', 'People Management',
-                     'Inspiring Leadership', 'Company', 'Industry Knowledge', 'General Business Knowledge',
-                     'Functional Expertise', 'Mentoring']].columns],
-                data=talent_pool[
-                    ['Unique ID', "Employee Level", "9Box Score", "Previous 9Box Score", "Mobility",
-                     "Employee Preference", "Position Text", "Job Profile Pay Band", "Location", "Organization", "Function",
-                     'Time in Position (months)', 'Time in Level (months)', 'Time in Company (years)',
-                     'Quantitative', 'Analytical', 'Conceptual', 'Communications', 'Working with Others',
-                     'Influence & Negotiation', 'Work Management', 'People Management',
-                     'Inspiring Leadership', 'Company', 'Industry Knowledge', 'General Business Knowledge',
-                     'Functional Expertise', 'Mentoring']].to_dict('records'),
-                export_format="csv",
-
-                style_cell={
-                    'font_family': 'arial',
-                    'font_size': '14px',
-                    'text_align': 'left'
-                },
-
-                style_table={'overflowX': 'auto'},
-
-                style_data_conditional=[
-                    {
-                        'if': {'row_index': 'odd'},
-                        'backgroundColor': 'rgb(248, 248, 248)'
-                    }
+            dcc.Dropdown(
+                id='til',
+                options=[
+                    {'label': '12', 'value': 12},
+                    {'label': '18', 'value': 18},
+                    {'label': '24', 'value': 24},
+                    {'label': '30', 'value': 30},
+                    {'label': '36', 'value': 36}
                 ],
-                style_header={
-                    'backgroundColor': 'rgb(230, 230, 230)',
-                    'fontWeight': 'bold'
-                }
+                multi=False,
+                searchable=True,
+                placeholder="Minimum Time In Level Target (Months)"
+            ),
+
+            html.Br(),
+
+            dcc.Dropdown(
+                id='top_k_employee',
+                options=top_k_option,
+                multi=False,
+                searchable=False,
+                placeholder="Number Of Best Candidates To Show (All)"
             ),
 
             html.Br(),
             html.Br(),
             html.Br(),
 
-            dash_table.DataTable(
-                id='output4',
-                columns=[{"name": i, "id": i} for i in position_pool[
-                    ['Position', "Position Text", "Manager Unique ID", "Job Profile", "Job Profile Pay Band",
-                     "Job Family Group", "Company Code", "Location", "Organization", "Function", "Department",
-                     "Specialist / Generalist", "Qualification/Certification?", 'Quantitative', 'Analytical',
-                     'Conceptual', 'Communications', 'Working with Others', 'Influence & Negotiation',
-                     'Work Management', 'People Management', 'Inspiring Leadership', 'Company',
-                     'Industry Knowledge', 'General Business Knowledge', 'Functional Expertise',
-                     'Mentoring', 'Sum of Weighted Differences', 'Sum of Weighted Differences (Absolute)']].columns],
-                data=position_pool[
-                    ['Position', "Position Text", "Manager Unique ID", "Job Profile", "Job Profile Pay Band",
-                     "Job Family Group", "Company Code", "Location", "Organization", "Function", "Department",
-                     "Specialist / Generalist", "Qualification/Certification?", 'Quantitative', 'Analytical',
-                     'Conceptual', 'Communications', 'Working with Others', 'Influence & Negotiation',
-                     'Work Management', 'People Management', 'Inspiring Leadership', 'Company',
-                     'Industry Knowledge', 'General Business Knowledge', 'Functional Expertise',
-                     'Mentoring', 'Sum of Weighted Differences', 'Sum of Weighted Differences (Absolute)']].to_dict('records'),
-                export_format="csv",
-
-                style_cell={
-                    'font_family': 'arial',
-                    'font_size': '14px',
-                    'text_align': 'left'
-                },
-
-                style_table={'overflowX': 'auto'},
-
-                style_data_conditional=[
-                    {
-                        'if': {'row_index': 'odd'},
-                        'backgroundColor': 'rgb(248, 248, 248)'
-                    }
-                ],
-                style_header={
-                    'backgroundColor': 'rgb(230, 230, 230)',
-                    'fontWeight': 'bold'
-                }
-            )
-        ]),
+            data_table('output1', POSITION_TABLE_COLUMNS),
+
+                html.Br(),
+                html.Br(),
+                html.Br(),
+
+            html.H4(id='output2_count'),
+
+            download_button('output2'),
+
+            data_table('output2', CANDIDATE_TABLE_COLUMNS, **SERVER_SIDE_TABLE)
+            ]),
+            dcc.Tab(label='Find An Employee The Right Position', children=[
+                html.H1(children='RBI Succession Planning System', className='six columns'),
+
+                html.Br(),
+
+                html.H4("Please choose the target employee:"),
+                dcc.Dropdown(id="slct_employee",
+                             options=[],
+                             multi=False,
+                             searchable=True,
+                             placeholder="Target Employee (type to search)"
+                             ),
+
+                html.Br(),
+
+                html.H4("Please select time scale:"),
+                dcc.Dropdown(id="slct_time_scale_position",
+                             options=[
+                                 {'label': 'Ready Now', 'value': 'Ready Now'},
+                                 {'label': 'Ready Soon', 'value': 'Ready Soon'},
+                                 {'label': 'Ready Later', 'value': 'Ready Later'}
+                             ],
+                             multi=False,
+                             searchable=True,
+                             placeholder="Time Scale"
+                             ),
+
+                html.Br(),
+
+                html.H4("Please select relevant position preferences:"),
+
+                dcc.Dropdown(id="slct_job_profile_pay_band",
+                             options=employee_level_option,
+                             multi=True,
+                             searchable=True,
+                             placeholder="Job Profile Pay Band"
+                             ),
+
+                html.Br(),
+
+                dcc.Dropdown(id="slct_position_function",
+                             options=function_option,
+                             multi=True,
+                             searchable=True,
+                             placeholder="Function"
+                             ),
+
+                html.Br(),
+
+                dcc.Dropdown(id="slct_position_location",
+                             options=location_option,
+                             multi=True,
+                             searchable=True,
+                             placeholder="Location"
+                             ),
+
+                html.Br(),
+
+                dcc.Dropdown(id="top_k_position",
+                             options=top_k_option,
+                             multi=False,
+                             searchable=False,
+                             placeholder="Number Of Best Positions To Show (All)"
+                             ),
+
+                html.Br(),
+                html.Br(),
+                html.Br(),
+
+                data_table('output3', EMPLOYEE_TABLE_COLUMNS),
+
+                html.Br(),
+                html.Br(),
+                html.Br(),
+
+                html.H4(id='output4_count'),
+
+                download_button('output4'),
+
+                data_table('output4', POSITION_RESULT_TABLE_COLUMNS, **SERVER_SIDE_TABLE),
+
+                html.Br(),
+                html.Br(),
+                html.Br(),
+
+                html.H4("Employees with the most similar competencies:"),
+                dcc.RadioItems(id="similarity_metric",
+                               options=[
+                                   {'label': 'Weighted like the fit scores', 'value': 'weighted'},
+                                   {'label': 'Unweighted', 'value': 'unweighted'}
+                               ],
+                               value='weighted',
+                               labelStyle={'display': 'inline-block'}
+                               ),
+
+                html.Br(),
+
+                dcc.Dropdown(id="top_k_similar",
+                             options=top_k_option,
+                             multi=False,
+                             searchable=False,
+                             placeholder="Number Of Similar Employees To Show ({})".format(SIMILAR_DEFAULT)
+                             ),
+
+                html.Br(),
+
+                html.H4(id='output5_count'),
+
+                data_table('output5', SIMILAR_TABLE_COLUMNS)
+            ]),
+            dcc.Tab(label='Fill Several Positions At Once', children=[
+                html.H1(children='RBI Succession Planning System', className='six columns'),
+
+                html.Br(),
+
+                html.H4("Please choose the open positions:"),
+                dcc.Dropdown(id="slct_open_positions",
+                             options=[],
+                             multi=True,
+                             searchable=True,
+                             placeholder="Open Positions (type to search)"
+                             ),
+
+                html.Br(),
+
+                html.H4("Or fill every position in:"),
+
+                dcc.Dropdown(id="slct_open_function",
+                             options=function_option,
+                             multi=True,
+                             searchable=True,
+                             placeholder="Function"
+                             ),
+
+                html.Br(),
+
+                dcc.Dropdown(id="slct_open_location",
+                             options=location_option,
+                             multi=True,
+                             searchable=True,
+                             placeholder="Location"
+                             ),
+
+                html.Br(),
+
+                html.H4("Please select time scale:"),
+                dcc.Dropdown(id="slct_time_scale_assignment",
+                             options=[
+                                 {'label': 'Ready Now', 'value': 'Ready Now'},
+                                 {'label': 'Ready Soon', 'value': 'Ready Soon'},
+                                 {'label': 'Ready Later', 'value': 'Ready Later'}
+                             ],
+                             multi=False,
+                             searchable=True,
+                             placeholder="Time Scale"
+                             ),
+
+                html.Br(),
+
+                dcc.Dropdown(id="top_k_assignment",
+                             options=top_k_option,
+                             multi=False,
+                             searchable=False,
+                             placeholder="Best Candidates Considered Per Position (As Many As There Are Positions)"
+                             ),
+
+                html.Br(),
+                html.Br(),
+                html.Br(),
+
+                html.H4(id='output6_count'),
+
+                data_table('output6', ASSIGNMENT_TABLE_COLUMNS, page_size=PAGE_SIZE, sort_action='native',
+                           filter_action='native')
+            ]),
+            dcc.Tab(label='Simulate A Move', children=[
+                html.H1(children='RBI Succession Planning System', className='six columns'),
+
+                html.Br(),
+
+                html.H4("Please choose the employee to move:"),
+                dcc.Dropdown(id="slct_ripple_employee",
+                             options=[],
+                             multi=False,
+                             searchable=True,
+                             placeholder="Unique ID (type to search)"
+                             ),
+
+                html.Br(),
+
+                html.H4("And the position to move them to:"),
+                dcc.Dropdown(id="slct_ripple_position",
+                             options=[],
+                             multi=False,
+                             searchable=True,
+                             placeholder="Position (type to search)"
+                             ),
+
+                html.Br(),
+
+                html.H4("Fill the seats that open with employees who are:"),
+                dcc.Dropdown(id="slct_time_scale_ripple",
+                             options=[
+                                 {'label': 'Ready Now', 'value': 'Ready Now'},
+                                 {'label': 'Ready Soon', 'value': 'Ready Soon'},
+                                 {'label': 'Ready Later', 'value': 'Ready Later'}
+                             ],
+                             value='Ready Now',
+                             multi=False,
+                             searchable=True,
+                             placeholder="Time Scale"
+                             ),
+
+                html.Br(),
+
+                dcc.RadioItems(id="ripple_scope",
+                               options=[
+                                   {'label': 'From anywhere in the organization', 'value': 'anyone'},
+                                   {'label': 'From the team of the person who left the seat', 'value': 'team'}
+                               ],
+                               value='anyone',
+                               labelStyle={'display': 'inline-block'}
+                               ),
+
+                html.Br(),
+
+                dcc.Dropdown(id="ripple_steps",
+                             options=[{'label': str(k), 'value': k} for k in RIPPLE_STEP_OPTIONS],
+                             multi=False,
+                             searchable=False,
+                             placeholder="Steps To Follow (Until The Chain Ends)"
+                             ),
+
+                html.Br(),
+                html.Br(),
+                html.Br(),
+
+                html.H4(id='output7_count'),
+
+                data_table('output7', RIPPLE_TABLE_COLUMNS, page_size=PAGE_SIZE, sort_action='native',
+                           filter_action='native')
+            ]),
+        ])
     ])
-])
 
 # ------------------------------------------------------------------------------
 # Connect the Plotly graphs with Function
-@app.callback(
-    [Output("output1", "data"),
-    Output("output2", "data"),
-    Output("output3", "data"),
-    Output("output4", "data")],
-    Input("slct_position", "value"),
-    Input("slct_time_scale_employee", "value"),
-    Input("slct_employee_level", "value"),
-    Input("slct_employee_function", "value"),
-    Input("slct_employee_location", "value"),
-    Input("slct_9box", "value"),
-    Input("tip", "value"),
-    Input("til", "value"),
-    Input("slct_employee", "value"),
-    Input("slct_time_scale_position", "value"),
-    Input("slct_job_profile_pay_band", "value"),
-    Input("slct_position_function", "value"),
-    Input("slct_position_location", "value"),
-)
-
-def final_output(slct_position, slct_time_scale_employee, slct_employee_level, slct_employee_function, slct_employee_location, slct_9box, tip, til,
-                 slct_employee, slct_time_scale_position, slct_job_profile_pay_band, slct_position_function, slct_position_location):
-
-    output1 = find_position(slct_position)
-    df = calculateScore_position(slct_position, talent_pool)
-    output2 = filter_employees(df, slct_time_scale_employee, slct_position, slct_employee_level, slct_employee_function, slct_employee_location, slct_9box, tip, til)
-
-    output3 = find_employee(slct_employee)
-    df2 = calculateScore_employee(slct_employee, position_pool)
-    output4 = filter_positions(df2, slct_time_scale_position, slct_employee, slct_job_profile_pay_band, slct_position_function, slct_position_location)
-    return [output1, output2, output3, output4]
-
-def find_position(slct_position):
+def register_callbacks(app, store, results):
+    # Fill a position: the selected position, and the candidates for it. Only the
+    # candidate callback depends on the filters; the score stage behind it is
+    # cached in results, so changing a filter only re-runs the filter stage. The
+    # ranked candidates are cached as well, so paging and sorting the table only
+    # query them again and send the requested page. Nothing is sent before a
+    # selection is made.
+    @app.callback(
+        Output("slct_position", "options"),
+        Input("slct_position", "search_value"),
+        State("slct_position", "value"),
+    )
+
+    def search_positions(search_value, slct_position):
+        data = store.get()
+        return matching_options(data.position_list, data.position_search, search_value, slct_position)
+
+    @app.callback(
+        Output("output1", "data"),
+        Input("slct_position", "value"),
+        prevent_initial_call=True,
+    )
+
+    def update_position(slct_position):
+        with profiled('update_position'), timed('update_position'):
+            return measured('find_position', lambda: find_position(store.get(), slct_position))
+
+    @app.callback(
+        [Output("output2", "data"),
+        Output("output2", "page_count"),
+        Output("output2", "page_current"),
+        Output("output2_count", "children")],
+        Input("slct_position", "value"),
+        Input("slct_time_scale_employee", "value"),
+        Input("slct_employee_level", "value"),
+        Input("slct_employee_function", "value"),
+        Input("slct_employee_location", "value"),
+        Input("slct_9box", "value"),
+        Input("tip", "value"),
+        Input("til", "value"),
+        Input("top_k_employee", "value"),
+        Input("output2", "page_current"),
+        Input("output2", "page_size"),
+        Input("output2", "sort_by"),
+        Input("output2", "filter_query"),
+        prevent_initial_call=True,
+    )
+
+    def update_candidates(slct_position, slct_time_scale_employee, slct_employee_level, slct_employee_function, slct_employee_location, slct_9box, tip, til, top_k_employee,
+                          page_current, page_size, sort_by, filter_query):
+        with profiled('update_candidates'), timed('update_candidates'):
+            ranked, count2, view = employee_view(results, store.get(), slct_position, slct_time_scale_employee, slct_employee_level, slct_employee_function, slct_employee_location, slct_9box, tip, til, top_k_employee, sort_by, filter_query)
+            page, rows = page_rows(view, current_page("output2", page_current), page_size)
+            output2 = measured('serialize_employees', lambda: rows.to_dict('records'))
+            return [output2, page_count(len(view), page_size or PAGE_SIZE), page,
+                    describe_matches(len(ranked), count2, 'employees', len(view))]
+
+    @app.callback(
+        Output("output2_download", "data"),
+        Input("output2_download_button", "n_clicks"),
+        State("slct_position", "value"),
+        State("slct_time_scale_employee", "value"),
+        State("slct_employee_level", "value"),
+        State("slct_employee_function", "value"),
+        State("slct_employee_location", "value"),
+        State("slct_9box", "value"),
+        State("tip", "value"),
+        State("til", "value"),
+        State("top_k_employee", "value"),
+        State("output2", "sort_by"),
+        State("output2", "filter_query"),
+        prevent_initial_call=True,
+    )
+
+    def download_candidates(n_clicks, *selection):
+        with profiled('download_candidates'), timed('download_candidates'):
+            _, _, view = employee_view(results, store.get(), *selection)
+            return csv_download(view, CANDIDATE_TABLE_COLUMNS, 'candidates.csv')
+
+    # Find a position: the selected employee, and the positions for them
+    @app.callback(
+        Output("slct_employee", "options"),
+        Input("slct_employee", "search_value"),
+        State("slct_employee", "value"),
+    )
+
+    def search_employees(search_value, slct_employee):
+        data = store.get()
+        return matching_options(data.employee_list, data.employee_search, search_value, slct_employee)
+
+    @app.callback(
+        Output("output3", "data"),
+        Input("slct_employee", "value"),
+        prevent_initial_call=True,
+    )
+
+    def update_employee(slct_employee):
+        with profiled('update_employee'), timed('update_employee'):
+            return measured('find_employee', lambda: find_employee(store.get(), slct_employee))
+
+    @app.callback(
+        [Output("output4", "data"),
+        Output("output4", "page_count"),
+        Output("output4", "page_current"),
+        Output("output4_count", "children")],
+        Input("slct_employee", "value"),
+        Input("slct_time_scale_position", "value"),
+        Input("slct_job_profile_pay_band", "value"),
+        Input("slct_position_function", "value"),
+        Input("slct_position_location", "value"),
+        Input("top_k_position", "value"),
+        Input("output4", "page_current"),
+        Input("output4", "page_size"),
+        Input("output4", "sort_by"),
+        Input("output4", "filter_query"),
+        prevent_initial_call=True,
+    )
+
+    def update_positions(slct_employee, slct_time_scale_position, slct_job_profile_pay_band, slct_position_function, slct_position_location, top_k_position,
+                         page_current, page_size, sort_by, filter_query):
+        with profiled('update_positions'), timed('update_positions'):
+            ranked, count4, view = position_view(results, store.get(), slct_employee, slct_time_scale_position, slct_job_profile_pay_band, slct_position_function, slct_position_location, top_k_position, sort_by, filter_query)
+            page, rows = page_rows(view, current_page("output4", page_current), page_size)
+            output4 = measured('serialize_positions', lambda: rows.to_dict('records'))
+            return [output4, page_count(len(view), page_size or PAGE_SIZE), page,
+                    describe_matches(len(ranked), count4, 'positions', len(view))]
+
+    @app.callback(
+        Output("output4_download", "data"),
+        Input("output4_download_button", "n_clicks"),
+        State("slct_employee", "value"),
+        State("slct_time_scale_position", "value"),
+        State("slct_job_profile_pay_band", "value"),
+        State("slct_position_function", "value"),
+        State("slct_position_location", "value"),
+        State("top_k_position", "value"),
+        State("output4", "sort_by"),
+        State("output4", "filter_query"),
+        prevent_initial_call=True,
+    )
+
+    def download_positions(n_clicks, *selection):
+        with profiled('download_positions'), timed('download_positions'):
+            _, _, view = position_view(results, store.get(), *selection)
+            return csv_download(view, POSITION_RESULT_TABLE_COLUMNS, 'positions.csv')
+
+    # Similar talent: the employees whose competencies are nearest to the selected employee
+    @app.callback(
+        [Output("output5", "data"),
+        Output("output5_count", "children")],
+        Input("slct_employee", "value"),
+        Input("top_k_similar", "value"),
+        Input("similarity_metric", "value"),
+        prevent_initial_call=True,
+    )
+
+    def update_similar(slct_employee, top_k_similar, similarity_metric):
+        with profiled('update_similar'), timed('update_similar'):
+            data = store.get()
+            similar = results.get(selection_key('similar', slct_employee, top_k_similar, similarity_metric), data.version,
+                                  lambda: similar_employees(data, slct_employee, top_k_similar, similarity_metric))
+            output5 = measured('serialize_similar', lambda: similar.to_dict('records'))
+            return [output5, "{} employees with the most similar competencies".format(len(similar))]
+
+    # Fill several positions: the open positions, and the best assignment of employees to them
+    @app.callback(
+        Output("slct_open_positions", "options"),
+        Input("slct_open_positions", "search_value"),
+        State("slct_open_positions", "value"),
+    )
+
+    def search_open_positions(search_value, slct_open_positions):
+        data = store.get()
+        return matching_options(data.position_list, data.position_search, search_value, slct_open_positions)
+
+    @app.callback(
+        [Output("output6", "data"),
+        Output("output6_count", "children")],
+        Input("slct_open_positions", "value"),
+        Input("slct_open_function", "value"),
+        Input("slct_open_location", "value"),
+        Input("slct_time_scale_assignment", "value"),
+        Input("top_k_assignment", "value"),
+        prevent_initial_call=True,
+    )
+
+    def update_assignment(slct_open_positions, slct_open_function, slct_open_location, slct_time_scale_assignment, top_k_assignment):
+        with profiled('update_assignment'), timed('update_assignment'):
+            data = store.get()
+            positions = open_positions(data, slct_open_positions, slct_open_function, slct_open_location)
+            if not positions:
+                return [[], "Choose the open positions"]
+            if not HAS_SCIPY:
+                return [[], "Filling several positions at once needs scipy"]
+            selection = selection_key('assignment', positions, slct_time_scale_assignment, top_k_assignment)
+            assignment = results.get(selection, data.version, lambda: assign_positions(data, positions, slct_time_scale_assignment, top_k_assignment))
+            output6 = measured('serialize_assignment', lambda: assignment.to_dict('records'))
+            return [output6, describe_assignment(assignment)]
+
+    # Simulate a move: the chain of seats a proposed move opens, and who fills them
+    @app.callback(
+        Output("slct_ripple_employee", "options"),
+        Input("slct_ripple_employee", "search_value"),
+        State("slct_ripple_employee", "value"),
+    )
+
+    def search_ripple_employees(search_value, slct_ripple_employee):
+        data = store.get()
+        return matching_options(data.employee_list, data.employee_search, search_value, slct_ripple_employee)
+
+    @app.callback(
+        Output("slct_ripple_position", "options"),
+        Input("slct_ripple_position", "search_value"),
+        State("slct_ripple_position", "value"),
+    )
+
+    def search_ripple_positions(search_value, slct_ripple_position):
+        data = store.get()
+        return matching_options(data.position_list, data.position_search, search_value, slct_ripple_position)
+
+    @app.callback(
+        [Output("output7", "data"),
+        Output("output7_count", "children")],
+        Input("slct_ripple_employee", "value"),
+        Input("slct_ripple_position", "value"),
+        Input("slct_time_scale_ripple", "value"),
+        Input("ripple_scope", "value"),
+        Input("ripple_steps", "value"),
+        prevent_initial_call=True,
+    )
+
+    def update_ripple(slct_ripple_employee, slct_ripple_position, slct_time_scale_ripple, ripple_scope, ripple_steps):
+        with profiled('update_ripple'), timed('update_ripple'):
+            data = store.get()
+            selection = selection_key('ripple', slct_ripple_employee, slct_ripple_position, slct_time_scale_ripple, ripple_scope, ripple_steps)
+            chain = results.get(selection, data.version, lambda: ripple(results, data, slct_ripple_position, slct_ripple_employee,
+                                                                        slct_time_scale_ripple, ripple_steps, ripple_scope))
+            output7 = measured('serialize_ripple', lambda: chain.to_dict('records'))
+            return [output7, describe_ripple(chain)]
+
+    # reload the page from the loading screen once the warm-up has finished
+    @app.callback(
+        [Output("loading_reload", "href"),
+        Output("loading_status", "children")],
+        Input("loading_poll", "n_intervals"),
+    )
+
+    def poll_loading(n_intervals):
+        if store.ready():
+            return app.get_relative_path('/'), "Data loaded"
+        return dash.no_update, describe_progress(store.status())
+
+def find_position(data, slct_position):
     try:
-        position = position_pool.loc[position_pool['Position Key'] == slct_position]
-        position = position[['Position', "Position Text", "Manager Unique ID", "Job Profile", "Job Profile Pay Band",
+        position = data.position_pool_records.take(data.position_pool_by_key.rows(slct_position), ['Position', "Position Text", "Manager Unique ID", "Job Profile", "Job Profile Pay Band",
                              "Job Family Group", "Company Code", "Location", "Organization", "Function", "Department",
                              "Specialist / Generalist", "Qualification/Certification?",
                              'Quantitative', 'Analytical', 'Conceptual', 'Communications', 'Working with Others',
                              'Influence & Negotiation', 'Work Management', 'People Management',
                              'Inspiring Leadership', 'Company', 'Industry Knowledge', 'General Business Knowledge',
-                             'Functional Expertise', 'Mentoring']]
+                             'Functional Expertise', 'Mentoring'])
         position[['Quantitative', 'Analytical', 'Conceptual', 'Communications', 'Working with Others',
                              'Influence & Negotiation', 'Work Management', 'People Management',
                              'Inspiring Leadership', 'Company', 'Industry Knowledge', 'General Business Knowledge',
@@ -492,55 +826,125 @@ def find_position(slct_position):
                      'Functional Expertise', 'Mentoring'])
     return position.to_dict('records')
 
-def calculateScore_position(slct_position, talent_pool):
+EMPLOYEE_INFO_COLUMNS = ['Unique ID', 'Employee Level', '9Box Score', 'Position Text', 'Mobility', 'Employee Preference',
+                         'Location', 'Function', 'Time in Position (months)', 'Time in Level (months)', 'Time in Company (years)']
+
+POSITION_INFO_COLUMNS = ['Position', "Position Text", "Manager Unique ID", "Job Profile", "Job Profile Pay Band",
+                         "Job Family Group", "Company Code", "Location", "Organization", "Function", "Department",
+                         "Specialist / Generalist", "Qualification/Certification?"]
+
+def position_function(data, slct_position):
+    # the function of the position, named as in job_history
+    function = data.target_by_key.get(slct_position, "Function")
+    if function == "Tax":
+        function = "Finance"
+    if function == "Accounting":
+        function = "Finance"
+    if function == "Coffee":
+        function = "Culinary"
+    if function == "Facilities":
+        function = "People"
+    if function == "Global Development":
+        function = "Development"
+    return function
+
+def scored_employees(data, rows, function, signed, absolute):
+    # rows of data.talent_candidates with their time in function, level-adjusted scores and fit
+    talent_info = data.candidate_records.take(rows, EMPLOYEE_INFO_COLUMNS).reset_index(drop=True)
+    # candidates without any job history have tenure row -1, the NaN appended here
+    years, weighted = data.tenure.column(function)
+    tenure_rows = data.candidate_tenure_rows[rows]
+    talent_info['Time in Function (years)'] = np.append(years, np.nan)[tenure_rows]
+    talent_info['Time in Function Weighted (years)'] = np.append(weighted, np.nan)[tenure_rows]
+
+    df_talent = pd.DataFrame(data.engine.pool.adjusted[rows], columns=COMPETENCIES, dtype=float)
+    df_talent['Sum of Weighted Differences'] = signed
+    df_talent['Sum of Weighted Differences (Absolute)'] = absolute
+    return talent_info.merge(df_talent, left_index=True, right_index=True)
+
+# ------------------------------------------------------------------------------
+# Score stage: depends only on the data snapshot and the selected position/employee.
+# Results are kept in a ResultCache keyed by the selection and the snapshot version;
+# they are shared between callbacks and must not be modified in place.
+RESULT_CACHE_ENTRIES = int(os.environ.get('RESULT_CACHE_ENTRIES', 256))
+RESULT_CACHE_MB = float(os.environ.get('RESULT_CACHE_MB', 256))
+
+def measured(stage, compute):
+    # runs compute as a timed stage; frames and record lists count as its rows, masks their selected rows
+    with timed(stage) as info:
+        result = compute()
+        if isinstance(result, (pd.DataFrame, list)):
+            info['rows'] = len(result)
+        elif isinstance(result, np.ndarray) and result.dtype == bool:
+            info['rows'] = result.sum()
+    return result
+
+def score_position(results, data, slct_position):
+    return results.get(('position', slct_position), data.version,
+                       lambda: measured('calculateScore_position', lambda: calculateScore_position(data, slct_position)))
+
+def position_fit(results, data, slct_position):
+    return results.get(('position_fit', slct_position), data.version,
+                       lambda: measured('calculateFit_position', lambda: calculateFit_position(data, slct_position)))
+
+def score_employee(results, data, slct_employee):
+    return results.get(('employee', slct_employee), data.version,
+                       lambda: measured('calculateScore_employee', lambda: calculateScore_employee(data, slct_employee)))
+
+def selection_key(*values):
+    # dropdown values as a cache key; multi-select values arrive as lists
+    return tuple(tuple(v) if isinstance(v, list) else v for v in values)
+
+def table_view(results, data, selection, ranked, filter_query, sort_by):
+    # the ranked rows after the table's own filter and sort, cached per query
+    if not filter_query and not sort_by:
+        return ranked
+    order = tuple((s.get('column_id'), s.get('direction')) for s in sort_by or [])
+    return results.get(selection + ('query', filter_query, order), data.version,
+                       lambda: measured('query_table', lambda: query_table(ranked, filter_query, sort_by)))
+
+def employee_view(results, data, slct_position, slct_time_scale_employee, slct_employee_level, slct_employee_function, slct_employee_location, slct_9box, tip, til, top_k, sort_by, filter_query):
+    # the ranked candidates, how many matched, and the rows the table shows after its filter and sort
+    selection = selection_key('employees', slct_position, top_k, slct_time_scale_employee, slct_employee_level, slct_employee_function, slct_employee_location, slct_9box, tip, til)
+    ranked, count = results.get(selection, data.version, lambda: ranked_employees(results, data, slct_position, top_k, slct_time_scale_employee, slct_employee_level, slct_employee_function, slct_employee_location, slct_9box, tip, til))
+    return ranked, count, table_view(results, data, selection, ranked, filter_query, sort_by)
+
+def position_view(results, data, slct_employee, slct_time_scale_position, slct_job_profile_pay_band, slct_position_function, slct_position_location, top_k, sort_by, filter_query):
+    selection = selection_key('positions', slct_employee, top_k, slct_time_scale_position, slct_job_profile_pay_band, slct_position_function, slct_position_location)
+    ranked, count = results.get(selection, data.version, lambda: ranked_positions(results, data, slct_employee, top_k, slct_time_scale_position, slct_job_profile_pay_band, slct_position_function, slct_position_location))
+    return ranked, count, table_view(results, data, selection, ranked, filter_query, sort_by)
+
+def csv_download(view, columns, filename):
+    # the table's columns of every row in view, in the order shown
+    columns = [c for c in columns if c in view.columns]
+    return dcc.send_data_frame(view[columns].to_csv, filename, index=False)
+
+def current_page(table, page_current):
+    # a new selection, filter or sort starts again on the first page
+    triggered = [t['prop_id'] for t in dash.callback_context.triggered]
+    return page_current if triggered == [table + '.page_current'] else 0
+
+def calculateFit_position(data, slct_position):
+    # job signature fit of every talent candidate, or None for an unknown position
+    try:
+        target_signature = data.target_by_key.get(slct_position, "Job Profile")
+        function = position_function(data, slct_position)
+        signed, absolute = data.fit.position_scores(target_signature)
+    except:
+        return None
+    return function, signed, absolute
+
+def calculateScore_position(data, slct_position):
     try:
         # find the job profile of the target position
-        target_signature = target[target['Position Key'] == slct_position]["Job Profile"].reset_index(drop=True)[0]
-        df_target = job_signatures.loc[job_signatures['Job Profile Name'] == target_signature]
-        df_target = df_target.drop(columns=['Job Profile Name', 'Job Code', 'Department', 'Job Family Group',
-                                            'Specialist / Generalist', 'Qualification/Certification?', 'Market Definition',
-                                            'Knowledge Creator'])
-
-        df_talent = talent_pool.loc[(talent_pool['Employee Level'] >= 0)]
-        talent_info = df_talent[['Unique ID', 'Employee Level', '9Box Score', 'Position Text', 'Mobility', 'Employee Preference',
-                        'Location', 'Function', 'Time in Position (months)', 'Time in Level (months)', 'Time in Company (years)']]
-
-        function = target[target['Position Key'] == slct_position]["Function"].reset_index(drop=True)[0]
-        if function == "Tax":
-            function = "Finance"
-        if function == "Accounting":
-            function = "Finance"
-        if function == "Coffee":
-            function = "Culinary"
-        if function == "Facilities":
-            function = "People"
-        if function == "Global Development":
-            function = "Development"
-        target_function = time_in_function[time_in_function['Function'] == function][["Unique ID", 'Time in Function (years)', 'Time in Function Weighted (years)']]
-        talent_info = talent_info.merge(target_function, how='left', on='Unique ID')
-
-        # adjust weights of the performance scores
-        adjusted_target = adjust_scores(df_target).drop(columns=['Job Grade'])
-        df_talent = df_talent[
-             ['Employee Level', 'Quantitative', 'Analytical', 'Conceptual', 'Communications', 'Working with Others',
-             'Influence & Negotiation', 'Work Management', 'People Management',
-             'Inspiring Leadership', 'Company', 'Industry Knowledge', 'General Business Knowledge',
-             'Functional Expertise', 'Mentoring']]
-        df_talent = adjust_scores(df_talent).drop(columns=['Employee Level'])
-
-        # Calculate differences and adjust weights
-        df_target = df_target.replace([2], 1)
-        df_target = df_target.replace([1], 0.5)
-        df_target = df_target.drop(columns=['Job Grade'])
-
-        diff = adjusted_target.values.squeeze() - df_talent
-        weighted_diff = diff * df_target.values.squeeze()
-        df_talent['Sum of Weighted Differences'] = weighted_diff.sum(axis=1)
-        weighted_diff_abs = diff.abs() * df_target.values.squeeze()
-        df_talent['Sum of Weighted Differences (Absolute)'] = weighted_diff_abs.sum(axis=1)
-
-        df_talent = talent_info.merge(df_talent, left_index=True, right_index=True)
-        df_talent = df_talent.sort_values('Sum of Weighted Differences')
+        target_signature = data.target_by_key.get(slct_position, "Job Profile")
+        function = position_function(data, slct_position)
+
+        # level-adjusted scores and the precomputed weighted differences against the job signature
+        signed, absolute = data.fit.position_scores(target_signature)
+        df_talent = scored_employees(data, np.arange(len(signed)), function, signed, absolute)
+        # ties stay in row order, as in top_k_indices, so a top-K table is a prefix of this ranking
+        df_talent = df_talent.sort_values('Sum of Weighted Differences', kind='stable')
         df_talent.dropna(subset=['Communications'], inplace=True)
 
     except:
@@ -551,102 +955,85 @@ def calculateScore_position(slct_position, talent_pool):
                               'Functional Expertise', 'Mentoring', 'Sum of Weighted Differences', 'Sum of Weighted Differences (Absolute)'])
     return df_talent
 
-def adjust_scores(df):
-  for row in range(0, df.shape[0]):
-    for col in range(1, df.shape[1]):
-      df.iloc[row, col] = df.iloc[row,0] + (df.iloc[row,col]-3)
-  return df
-
-def filter_employees(df, slct_time_scale_employee, slct_position, slct_employee_level, slct_employee_function, slct_employee_location, slct_9box, tip, til):
+def employee_mask(data, slct_time_scale_employee, slct_position, slct_employee_level, slct_employee_function, slct_employee_location, slct_9box, tip, til):
+    # talent_candidates rows that pass the readiness and preference filters
+    filters = data.candidate_filters
+    mask = filters.everything()
     if slct_time_scale_employee is not None:
-        job_profile_pay_band = target[target['Position Key'] == slct_position]["Job Profile Pay Band"].values[0]
-        if slct_time_scale_employee == "Ready Now":
-            df = df.loc[(df['Employee Level'] >= job_profile_pay_band-2) & (df['Employee Level'] <= job_profile_pay_band + 1)]
-        if slct_time_scale_employee == "Ready Soon":
-            if job_profile_pay_band == 1:
-                df = df.loc[(df['Employee Level'] == 0)]
-            if job_profile_pay_band == 2:
-                df = df.loc[(df['Employee Level'] >= 0) & (df['Employee Level'] <= 1)]
-            if job_profile_pay_band == 3:
-                df = df.loc[(df['Employee Level'] >= 0) & (df['Employee Level'] <= 2)]
-            if job_profile_pay_band == 4:
-                df = df.loc[(df['Employee Level'] >= 1) & (df['Employee Level'] <= 3)]
-            if job_profile_pay_band == 5:
-                df = df.loc[(df['Employee Level'] >= 2) & (df['Employee Level'] <= 4)]
-            if job_profile_pay_band == 6:
-                df = df.loc[(df['Employee Level'] >= 4) & (df['Employee Level'] <= 5)]
-            if job_profile_pay_band == 7:
-                df = df.loc[(df['Employee Level'] >= 5) & (df['Employee Level'] <= 6)]
-            if job_profile_pay_band == 8:
-                df = df.loc[(df['Employee Level'] == 7)]
-            if job_profile_pay_band == 9:
-                df = df.loc[(df['Employee Level'] == 8)]
-            if job_profile_pay_band == 10:
-                df = df.loc[(df['Employee Level'] == 9)]
-            if job_profile_pay_band == 12:
-                df = df.loc[(df['Employee Level'] == 10)]
-        if slct_time_scale_employee == "Ready Later":
-            if job_profile_pay_band == 1:
-                df = df.loc[(df['Employee Level'] == 0)]
-            if job_profile_pay_band == 2:
-                df = df.loc[(df['Employee Level'] == 0)]
-            if job_profile_pay_band == 3:
-                df = df.loc[(df['Employee Level'] == 0)]
-            if job_profile_pay_band == 4:
-                df = df.loc[(df['Employee Level'] >= 0) & (df['Employee Level'] <= 1)]
-            if job_profile_pay_band == 5:
-                df = df.loc[(df['Employee Level'] >= 1) & (df['Employee Level'] <= 2)]
-            if job_profile_pay_band == 6:
-                df = df.loc[(df['Employee Level'] >= 2) & (df['Employee Level'] <= 4)]
-            if job_profile_pay_band == 7:
-                df = df.loc[(df['Employee Level'] >= 4) & (df['Employee Level'] <= 5)]
-            if job_profile_pay_band == 8:
-                df = df.loc[(df['Employee Level'] >= 6) & (df['Employee Level'] <= 7)]
-            if job_profile_pay_band == 9:
-                df = df.loc[(df['Employee Level'] >= 7) & (df['Employee Level'] <= 8)]
-            if job_profile_pay_band == 10:
-                df = df.loc[(df['Employee Level'] >= 8) & (df['Employee Level'] <= 9)]
-            if job_profile_pay_band == 12:
-                df = df.loc[(df['Employee Level'] >= 9) & (df['Employee Level'] <= 10)]
+        job_profile_pay_band = data.target_by_key.get(slct_position, "Job Profile Pay Band")
+        levels = data.readiness.range('employee', slct_time_scale_employee, job_profile_pay_band)
+        if levels is not None:
+            mask &= filters.between('Employee Level', *levels)
     else:
-        df = df.loc[df['Employee Level'] <0]
+        mask &= filters.below('Employee Level', 0)
     if slct_employee_level is not None:
         if len(slct_employee_level) > 0:
-            df = df.loc[df['Employee Level'].isin(slct_employee_level)]
+            mask &= filters.isin('Employee Level', slct_employee_level)
         else:
-            df = df.loc[df['Employee Level'].isin(employee_level_list)]
+            mask &= filters.isin('Employee Level', data.employee_level_list)
     if slct_employee_function is not None:
         if len(slct_employee_function) > 0:
-            df = df.loc[df['Function'].isin(slct_employee_function)]
+            mask &= filters.isin('Function', slct_employee_function)
         else:
-            df = df.loc[df['Function'].isin(function_list)]
+            mask &= filters.isin('Function', data.function_list)
     if slct_employee_location is not None:
         if len(slct_employee_location) > 0:
-            df = df.loc[df['Location'].isin(slct_employee_location)]
+            mask &= filters.isin('Location', slct_employee_location)
         else:
-            df = df.loc[df['Location'].isin(location_list)]
+            mask &= filters.isin('Location', data.location_list)
     if slct_9box is not None:
         if len(slct_9box) > 0:
-            df = df.loc[df['9Box Score'].isin(slct_9box)]
+            mask &= filters.isin('9Box Score', slct_9box)
         else:
-            df = df.loc[df['9Box Score'].isin([1, 2, 3, 4, 5, 6, 7, 8, 9])]
+            mask &= filters.isin('9Box Score', [1, 2, 3, 4, 5, 6, 7, 8, 9])
     if tip is not None:
-        df = df.loc[df['Time in Position (months)'] >= tip]
+        mask &= filters.at_least('Time in Position (months)', tip)
     if til is not None:
-        df = df.loc[df['Time in Level (months)'] >= til]
-
-    return df.to_dict('records')
-
-def find_employee(slct_employee):
+        mask &= filters.at_least('Time in Level (months)', til)
+
+    return filters.mask(mask)
+
+def select_employees(data, df, slct_time_scale_employee, slct_position, slct_employee_level, slct_employee_function, slct_employee_location, slct_9box, tip, til):
+    mask = employee_mask(data, slct_time_scale_employee, slct_position, slct_employee_level, slct_employee_function, slct_employee_location, slct_9box, tip, til)
+    return df[mask[data.candidate_filters.positions(df)]]
+
+def ranked_employees(results, data, slct_position, top_k, slct_time_scale_employee, slct_employee_level, slct_employee_function, slct_employee_location, slct_9box, tip, til):
+    # the candidates shown for a selection, best first, and how many matched
+    if top_k is None:
+        df = measured('score_position', lambda: score_position(results, data, slct_position))
+        selected = measured('filter_employees', lambda: select_employees(data, df, slct_time_scale_employee, slct_position, slct_employee_level, slct_employee_function, slct_employee_location, slct_9box, tip, til))
+        return selected, len(selected)
+    return top_employee_table(results, data, slct_position, top_k, slct_time_scale_employee, slct_employee_level, slct_employee_function, slct_employee_location, slct_9box, tip, til)
+
+def top_employees(results, data, slct_position, top_k, slct_time_scale_employee, slct_employee_level, slct_employee_function, slct_employee_location, slct_9box, tip, til):
+    df, count = top_employee_table(results, data, slct_position, top_k, slct_time_scale_employee, slct_employee_level, slct_employee_function, slct_employee_location, slct_9box, tip, til)
+    return measured('serialize_employees', lambda: df.to_dict('records')), count
+
+def top_employee_table(results, data, slct_position, top_k, slct_time_scale_employee, slct_employee_level, slct_employee_function, slct_employee_location, slct_9box, tip, til):
+    # filters first, then only the top_k best fits are sorted and materialized
+    engine = data.engine
+    mask = measured('filter_employees', lambda: employee_mask(data, slct_time_scale_employee, slct_position, slct_employee_level, slct_employee_function, slct_employee_location, slct_9box, tip, til))
+    fit = measured('position_fit', lambda: position_fit(results, data, slct_position))
+    if fit is None:
+        return calculateScore_position(data, None), 0
+    function, signed, absolute = fit
+    with timed('top_k_employees') as info:
+        mask &= ~np.isnan(engine.pool.adjusted[:, COMPETENCIES.index('Communications')])
+        candidates = np.flatnonzero(mask)
+        rows = candidates[top_k_indices(signed[candidates], top_k)]
+        info['rows'] = len(rows)
+    df = measured('employee_table', lambda: scored_employees(data, rows, function, signed[rows], absolute[rows]))
+    return df, len(candidates)
+
+def find_employee(data, slct_employee):
     try:
-        employee = talent_pool.loc[talent_pool['Unique ID'] == slct_employee]
-        employee = employee[['Unique ID', "Employee Level", "9Box Score", "Previous 9Box Score", "Mobility",
+        employee = data.talent_pool_records.take(data.talent_pool_by_id.rows(slct_employee), ['Unique ID', "Employee Level", "9Box Score", "Previous 9Box Score", "Mobility",
                      "Employee Preference", "Position Text", "Job Profile Pay Band", "Location", "Organization", "Function",
                      'Time in Position (months)', 'Time in Level (months)', 'Time in Company (years)',
                      'Quantitative', 'Analytical', 'Conceptual', 'Communications', 'Working with Others',
                      'Influence & Negotiation', 'Work Management', 'People Management',
                      'Inspiring Leadership', 'Company', 'Industry Knowledge', 'General Business Knowledge',
-                     'Functional Expertise', 'Mentoring']]
+                     'Functional Expertise', 'Mentoring'])
         employee[['Quantitative', 'Analytical', 'Conceptual', 'Communications', 'Working with Others',
                              'Influence & Negotiation', 'Work Management', 'People Management',
                              'Inspiring Leadership', 'Company', 'Industry Knowledge', 'General Business Knowledge',
@@ -665,41 +1052,25 @@ def find_employee(slct_employee):
                      'Functional Expertise', 'Mentoring'])
     return employee.to_dict('records')
 
-def calculateScore_employee(slct_employee, position_pool):
+def scored_positions(data, rows, signed, absolute):
+    # rows of position_pool with their level-adjusted scores and fit
+    position_info = data.position_pool_records.take(rows, POSITION_INFO_COLUMNS)
+    df_position = pd.DataFrame(data.engine.positions.adjusted[rows], columns=COMPETENCIES, index=position_info.index, dtype=float)
+    df_position['Sum of Weighted Differences'] = signed
+    df_position['Sum of Weighted Differences (Absolute)'] = absolute
+    return position_info.merge(df_position, left_index=True, right_index=True)
+
+def calculateScore_employee(data, slct_employee):
     try:
-        # find the job profile of the target position
-        df_employee = talent.loc[talent['Unique ID'] == slct_employee]
-        df_employee = df_employee.drop(columns=['Unique ID', '9box Score (box number 1-9)', 'Previous 9Box Score',
-                                                'Knowledge Creator', 'Mobility', 'Employee Preference'])
-
-        employee_level = talent[talent['Unique ID'] == slct_employee]["Employee Level"].values[0]
-        df_position = position_pool.loc[position_pool['Job Profile Pay Band'] >= employee_level]
-        position_info = df_position[['Position', "Position Text", "Manager Unique ID", "Job Profile", "Job Profile Pay Band",
-                                    "Job Family Group", "Company Code", "Location", "Organization", "Function", "Department",
-                                    "Specialist / Generalist", "Qualification/Certification?"]]
-
-        # adjust weights of the performance scores and calculate differences
-        adjusted_employee = adjust_scores(df_employee).drop(columns=['Employee Level'])
-        df_position = df_position[
-             ['Job Profile Pay Band', 'Quantitative', 'Analytical', 'Conceptual', 'Communications',
-              'Working with Others', 'Influence & Negotiation', 'Work Management', 'People Management',
-              'Inspiring Leadership', 'Company', 'Industry Knowledge', 'General Business Knowledge',
-              'Functional Expertise', 'Mentoring']]
-        df_position = adjust_scores(df_position).drop(columns=['Job Profile Pay Band'])
-
-        # calculate differences and adjust weight
-        df_employee = df_employee.replace([2], 1)
-        df_employee = df_employee.replace([1], 0.5)
-        df_employee = df_employee.drop(columns=['Employee Level'])
-
-        diff = adjusted_employee.values.squeeze() - df_position
-        weighted_diff = diff * df_employee.values.squeeze()
-        df_position['Sum of Weighted Differences'] = weighted_diff.sum(axis=1)
-        weighted_diff_abs = diff.abs() * df_employee.values.squeeze()
-        df_position['Sum of Weighted Differences (Absolute)'] = weighted_diff_abs.sum(axis=1)
-
-        df_position = position_info.merge(df_position, left_index=True, right_index=True)
-        df_position = df_position.sort_values('Sum of Weighted Differences', ascending=False)
+        engine = data.engine
+        # find the level of the target employee and the positions at or above it
+        employee_level = engine.employee(slct_employee)[0]
+        rows = np.flatnonzero(engine.position_bands >= employee_level)
+
+        # level-adjusted scores and the precomputed weighted differences against the employee
+        signed, absolute = data.fit.employee_scores(slct_employee, rows)
+        df_position = scored_positions(data, rows, signed, absolute)
+        df_position = df_position.sort_values('Sum of Weighted Differences', ascending=False, kind='stable')
         df_position.dropna(subset=['Communications'], inplace=True)
     except:
         df_position = pd.DataFrame(columns = ['Position', "Position Text", "Manager Unique ID", "Job Profile", "Job Profile Pay Band",
@@ -711,81 +1082,373 @@ def calculateScore_employee(slct_employee, position_pool):
                      'Mentoring', 'Sum of Weighted Differences', 'Sum of Weighted Differences (Absolute)'])
     return df_position
 
-def filter_positions(df2, slct_time_scale_position, slct_employee, slct_job_profile_pay_band, slct_position_function, slct_position_location):
+def position_mask(data, slct_time_scale_position, slct_employee, slct_job_profile_pay_band, slct_position_function, slct_position_location):
+    # position_pool rows that pass the readiness and preference filters
+    filters = data.position_filters
+    mask = filters.everything()
     if slct_time_scale_position is not None:
-        employee_level = talent[talent['Unique ID'] == slct_employee]["Employee Level"].values[0]
-        if slct_time_scale_position == "Ready Now":
-            df2 = df2.loc[(df2['Job Profile Pay Band'] >= employee_level) & (df2['Job Profile Pay Band'] <= employee_level + 2)]
-        if slct_time_scale_position == "Ready Soon":
-            if employee_level == 1:
-                df2 = df2.loc[(df2['Job Profile Pay Band'] >= 2) & (df2['Job Profile Pay Band'] <= 4)]
-            if employee_level == 2:
-                df2 = df2.loc[(df2['Job Profile Pay Band'] >= 3) & (df2['Job Profile Pay Band'] <= 4)]
-            if employee_level == 3:
-                df2 = df2.loc[(df2['Job Profile Pay Band'] >= 4) & (df2['Job Profile Pay Band'] <= 5)]
-            if employee_level == 4:
-                df2 = df2.loc[(df2['Job Profile Pay Band'] >= 4) & (df2['Job Profile Pay Band'] <= 5)]
-            if employee_level == 5:
-                df2 = df2.loc[(df2['Job Profile Pay Band'] >= 5) & (df2['Job Profile Pay Band'] <= 6)]
-            if employee_level == 6:
-                df2 = df2.loc[(df2['Job Profile Pay Band'] >= 6) & (df2['Job Profile Pay Band'] <= 7)]
-            if employee_level == 7:
-                df2 = df2.loc[(df2['Job Profile Pay Band'] >= 7) & (df2['Job Profile Pay Band'] <= 8)]
-            if employee_level == 8:
-                df2 = df2.loc[(df2['Job Profile Pay Band'] >= 8) & (df2['Job Profile Pay Band'] <= 9)]
-            if employee_level == 9:
-                df2 = df2.loc[(df2['Job Profile Pay Band'] >= 9) & (df2['Job Profile Pay Band'] <= 10)]
-            if employee_level == 10:
-                df2 = df2.loc[(df2['Job Profile Pay Band'] >= 10) & (df2['Job Profile Pay Band'] <= 12)]
-            if employee_level == 12:
-                df2 = df2.loc[(df2['Job Profile Pay Band'] == 12)]
-        if slct_time_scale_position == "Ready Later":
-            if employee_level == 1:
-                df2 = df2.loc[(df2['Job Profile Pay Band'] >= 4) & (df2['Job Profile Pay Band'] <= 5)]
-            if employee_level == 2:
-                df2 = df2.loc[(df2['Job Profile Pay Band'] >= 4) & (df2['Job Profile Pay Band'] <= 5)]
-            if employee_level == 3:
-                df2 = df2.loc[(df2['Job Profile Pay Band'] >= 5) & (df2['Job Profile Pay Band'] <= 6)]
-            if employee_level == 4:
-                df2 = df2.loc[(df2['Job Profile Pay Band'] >= 5) & (df2['Job Profile Pay Band'] <= 6)]
-            if employee_level == 5:
-                df2 = df2.loc[(df2['Job Profile Pay Band'] >= 6) & (df2['Job Profile Pay Band'] <= 7)]
-            if employee_level == 6:
-                df2 = df2.loc[df2['Job Profile Pay Band'] == 7]
-            if employee_level == 7:
-                df2 = df2.loc[df2['Job Profile Pay Band'] == 8]
-            if employee_level == 8:
-                df2 = df2.loc[df2['Job Profile Pay Band'] == 9]
-            if employee_level == 9:
-                df2 = df2.loc[df2['Job Profile Pay Band'] == 10]
-            if employee_level == 10:
-                df2 = df2.loc[df2['Job Profile Pay Band'] == 12]
-            if employee_level == 12:
-                df2 = df2.loc[df2['Job Profile Pay Band'] == 12]
+        employee_level = data.talent_by_id.get(slct_employee, "Employee Level")
+        bands = data.readiness.range('position', slct_time_scale_position, employee_level)
+        if bands is not None:
+            mask &= filters.between('Job Profile Pay Band', *bands)
     else:
-        df2 = df2.loc[df2['Job Profile Pay Band'] < 0]
+        mask &= filters.below('Job Profile Pay Band', 0)
 
     if slct_job_profile_pay_band is not None:
         if len(slct_job_profile_pay_band) > 0:
-            df2 = df2.loc[df2['Job Profile Pay Band'].isin(slct_job_profile_pay_band)]
+            mask &= filters.isin('Job Profile Pay Band', slct_job_profile_pay_band)
         else:
-            df2 = df2.loc[df2['Job Profile Pay Band'].isin(job_profile_pay_band_list)]
+            mask &= filters.isin('Job Profile Pay Band', data.job_profile_pay_band_list)
     if slct_position_function is not None:
         if len(slct_position_function) > 0:
-            df2 = df2.loc[df2['Function'].isin(slct_position_function)]
+            mask &= filters.isin('Function', slct_position_function)
         else:
-            df2 = df2.loc[df2['Function'].isin(function_list)]
+            mask &= filters.isin('Function', data.function_list)
     if slct_position_location is not None:
         if len(slct_position_location) > 0:
-            df2 = df2.loc[df2['Location'].isin(slct_position_location)]
+            mask &= filters.isin('Location', slct_position_location)
         else:
-            df2 = df2.loc[df2['Location'].isin(location_list)]
-
-    return df2.to_dict('records')
+            mask &= filters.isin('Location', data.location_list)
+
+    return filters.mask(mask)
+
+def select_positions(data, df2, slct_time_scale_position, slct_employee, slct_job_profile_pay_band, slct_position_function, slct_position_location):
+    mask = position_mask(data, slct_time_scale_position, slct_employee, slct_job_profile_pay_band, slct_position_function, slct_position_location)
+    return df2[mask[data.position_filters.positions(df2)]]
+
+def ranked_positions(results, data, slct_employee, top_k, slct_time_scale_position, slct_job_profile_pay_band, slct_position_function, slct_position_location):
+    # the positions shown for a selection, best first, and how many matched
+    if top_k is None:
+        df2 = measured('score_employee', lambda: score_employee(results, data, slct_employee))
+        selected = measured('filter_positions', lambda: select_positions(data, df2, slct_time_scale_position, slct_employee, slct_job_profile_pay_band, slct_position_function, slct_position_location))
+        return selected, len(selected)
+    return top_position_table(data, slct_employee, top_k, slct_time_scale_position, slct_job_profile_pay_band, slct_position_function, slct_position_location)
+
+def top_positions(data, slct_employee, top_k, slct_time_scale_position, slct_job_profile_pay_band, slct_position_function, slct_position_location):
+    df2, count = top_position_table(data, slct_employee, top_k, slct_time_scale_position, slct_job_profile_pay_band, slct_position_function, slct_position_location)
+    return measured('serialize_positions', lambda: df2.to_dict('records')), count
+
+def top_position_table(data, slct_employee, top_k, slct_time_scale_position, slct_job_profile_pay_band, slct_position_function, slct_position_location):
+    # filters first, then only the top_k best fits are sorted and materialized
+    engine = data.engine
+    mask = measured('filter_positions', lambda: position_mask(data, slct_time_scale_position, slct_employee, slct_job_profile_pay_band, slct_position_function, slct_position_location))
+    try:
+        employee_level = engine.employee(slct_employee)[0]
+    except:
+        return calculateScore_employee(data, None), 0
+    with timed('top_k_positions') as info:
+        mask &= engine.position_bands >= employee_level
+        mask &= ~np.isnan(engine.positions.adjusted[:, COMPETENCIES.index('Communications')])
+        candidates = np.flatnonzero(mask)
+        signed, absolute = data.fit.employee_scores(slct_employee, candidates)
+        order = top_k_indices(signed, top_k, descending=True)
+        info['rows'] = len(order)
+    df2 = measured('position_table', lambda: scored_positions(data, candidates[order], signed[order], absolute[order]))
+    return df2, len(candidates)
+
+def similar_employees(data, slct_employee, top_k, metric):
+    # talent candidates nearest to the employee's level-adjusted competencies, nearest first;
+    # 'weighted' weighs every competency as the employee's fit scores do
+    engine = data.engine
+    try:
+        level, adjusted, weights = engine.employee(slct_employee)
+    except:
+        return pd.DataFrame(columns=SIMILAR_TABLE_COLUMNS)
+    # the employee's own candidate rows are left out
+    own = np.searchsorted(engine.pool_rows, data.talent_pool_by_id.rows(slct_employee))
+    with timed('similarity_search') as info:
+        rows, distances = data.talent_similarity.nearest(adjusted, None if metric == 'unweighted' else weights,
+                                                         top_k or SIMILAR_DEFAULT, own)
+        info['rows'] = len(rows)
+    similar = data.candidate_records.take(rows, EMPLOYEE_INFO_COLUMNS).reset_index(drop=True)
+    similar = similar.merge(pd.DataFrame(engine.pool.adjusted[rows], columns=COMPETENCIES, dtype=float),
+                            left_index=True, right_index=True)
+    similar.insert(0, 'Rank', np.arange(1, len(rows) + 1))
+    similar['Competency Distance'] = distances
+    return similar
 
-if __name__ == '__main__':
-    app.run_server(debug=True)
+# ------------------------------------------------------------------------------
+# Fill several positions at once
+# Every open position gets at most one employee and every employee at most one
+# position, at the lowest total Sum of Weighted Differences; the candidates of a
+# position are the ones its "Fill A Position" slate would list, ranked the same.
+# Only the top_k candidates of each position are considered. With top_k at least
+# the number of positions the result is the optimum over all candidates: one of
+# a position's top_k is always still free to swap in.
+def open_positions(data, slct_open_positions, slct_open_function, slct_open_location):
+    # the chosen positions, or without any, every position in the chosen functions and locations
+    if slct_open_positions:
+        return list(dict.fromkeys(slct_open_positions))
+    if not slct_open_function and not slct_open_location:
+        return []
+    filters = data.position_filters
+    mask = filters.everything()
+    if slct_open_function:
+        mask &= filters.isin('Function', slct_open_function)
+    if slct_open_location:
+        mask &= filters.isin('Location', slct_open_location)
+    return list(pd.unique(data.position_keys[filters.mask(mask)]))
+
+def position_slate(data, position, time_scale, filters=(None,) * 6, top_k=None):
+    # (candidate rows, signed, absolute) of the top_k candidates of a position, best first and one row
+    # per employee; the slate depends only on the job profile and pay band of the position
+    fit = calculateFit_position(data, position)
+    if fit is None:
+        return np.empty(0, dtype=np.intp), np.empty(0), np.empty(0)
+    ids = data.candidate_ids
+    scored = ~np.isnan(data.engine.pool.adjusted[:, COMPETENCIES.index('Communications')])
+    rows = np.flatnonzero(employee_mask(data, time_scale, position, *filters) & scored)
+    rows = np.sort(rows[np.unique(ids[rows], return_index=True)[1]])
+    rows = rows[top_k_indices(fit[1][rows], top_k)]
+    return rows, fit[1][rows], fit[2][rows]
+
+def assignment_candidates(data, positions, time_scale, top_k, filters=(None,) * 6):
+    # (position, candidate row, slate rank, signed, absolute) of the top_k candidates of every position,
+    # one row per employee; positions with the same job profile and pay band share their slate
+    slates = {}
+    candidates = []
+    for i, position in enumerate(positions):
+        if position not in data.target_by_key:
+            continue
+        key = (data.target_by_key.get(position, 'Job Profile'), data.target_by_key.get(position, 'Job Profile Pay Band'))
+        if key not in slates:
+            rows, signed, absolute = position_slate(data, position, time_scale, filters, top_k)
+            slates[key] = (rows, np.arange(1, len(rows) + 1), signed, absolute)
+        candidates.append((np.full(len(slates[key][0]), i),) + slates[key])
+    if not candidates:
+        return (np.empty(0, dtype=np.intp),) * 3 + (np.empty(0),) * 2
+    return tuple(np.concatenate(column) for column in zip(*candidates))
+
+def assign_positions(data, positions, time_scale, top_k=None, filters=(None,) * 6):
+    positions = list(dict.fromkeys(positions))
+    with timed('assignment_candidates') as info:
+        position_index, rows, ranks, signed, absolute = assignment_candidates(data, positions, time_scale, top_k or len(positions), filters)
+        info['rows'] = len(rows)
+    ids = data.candidate_ids
+    with timed('assignment_solve') as info:
+        columns, employees = pd.factorize(ids[rows])
+        assigned = solve(position_index, columns, signed, len(positions), len(employees))
+        info['rows'] = int((assigned >= 0).sum())
+
+    # the chosen pair of every filled position; unfilled positions are left empty
+    chosen = np.flatnonzero(assigned[position_index] == columns)
+    assignment = pd.DataFrame({
+        'Position Key': positions,
+        'Job Profile': [data.target_by_key.get(p, 'Job Profile') if p in data.target_by_key else None for p in positions],
+        'Job Profile Pay Band': [data.target_by_key.get(p, 'Job Profile Pay Band') if p in data.target_by_key else None for p in positions]})
+    # object columns keep whole numbers whole next to the empty rows
+    return assignment.join(pd.DataFrame({
+        'Unique ID': pd.Series(ids[rows[chosen]], dtype=object),
+        'Employee Level': pd.Series(data.candidate_levels[rows[chosen]], dtype=object),
+        'Slate Rank': pd.Series(ranks[chosen], dtype=object),
+        'Sum of Weighted Differences': signed[chosen],
+        'Sum of Weighted Differences (Absolute)': absolute[chosen]}, index=position_index[chosen]))
+
+def describe_assignment(assignment):
+    filled = assignment['Unique ID'].notna()
+    if not filled.any():
+        return "None of the {} positions can be filled".format(len(assignment))
+    return "{} of {} positions filled, {} with their best candidate, total Sum of Weighted Differences {:g}".format(
+        filled.sum(), len(assignment), (assignment['Slate Rank'] == 1).sum(),
+        assignment['Sum of Weighted Differences'].sum())
 
+# ------------------------------------------------------------------------------
+# Succession ripple
+# A proposed move (an employee into a position) opens the seats the employee holds.
+# Every opened seat is filled with the best free candidate of its slate, whose own
+# seats open in turn, a step at a time until no seat is open or the steps run out;
+# nobody is moved twice. Slates are cached per job profile, pay band and time scale,
+# so a step only scores the seats whose slate has not been seen yet, and finding the
+# best free candidate reads a slate only up to that candidate.
+def seat_slate(results, data, position, time_scale, filters=(None,) * 6):
+    key = selection_key('slate', data.target_by_key.get(position, 'Job Profile'),
+                        data.target_by_key.get(position, 'Job Profile Pay Band'), time_scale, *filters)
+    return results.get(key, data.version, lambda: measured('position_slate', lambda: position_slate(data, position, time_scale, filters)))
+
+def first_free(slate, taken, allowed=None, batch=64):
+    # position of the first employee code in slate not taken (and allowed), -1 when there is none
+    start = 0
+    while start < len(slate):
+        codes = slate[start:start + batch]
+        free = ~taken[codes]
+        if allowed is not None:
+            free &= allowed[codes]
+        hit = np.flatnonzero(free)
+        if len(hit):
+            return start + hit[0]
+        start += batch
+        batch *= 2
+    return -1
+
+def ripple(results, data, slct_position, slct_employee, time_scale, steps=None, scope='anyone', filters=(None,) * 6):
+    # one row per seat of the chain, the proposed move first; with scope 'team' a seat is only
+    # filled from the people reporting to the employee who left it
+    if slct_position not in data.target_by_key or slct_employee not in data.talent_by_id:
+        return pd.DataFrame(columns=RIPPLE_TABLE_COLUMNS)
+    chart = data.org_chart
+    ids = data.candidate_ids
+    levels = data.candidate_levels
+    codes, employees = pd.factorize(pd.Index(ids))
+    taken = np.zeros(len(employees), dtype=bool)
+    # slates already read by this chain; a long chain can need more than the result cache keeps
+    slates = {}
+
+    def slate(position):
+        key = (data.target_by_key.get(position, 'Job Profile'), data.target_by_key.get(position, 'Job Profile Pay Band'))
+        if key not in slates:
+            slates[key] = seat_slate(results, data, position, time_scale, filters)
+        return slates[key]
+
+    def seat(step, position, left, outcome):
+        return {'Step': step, 'Position Key': position, 'Job Profile': data.target_by_key.get(position, 'Job Profile'),
+                'Job Profile Pay Band': data.target_by_key.get(position, 'Job Profile Pay Band'),
+                'Reports To': chart.manager(position), 'Vacated By': left, 'Outcome': outcome}
+
+    # the proposed move, scored like any candidate whether or not the employee is on the slate
+    rows, signed, absolute = slate(slct_position)
+    on_slate = np.flatnonzero(ids[rows] == slct_employee)
+    fit = position_fit(results, data, slct_position)
+    own = np.flatnonzero(ids == slct_employee)
+    holders = [h for h in chart.holders_of(slct_position) if h != slct_employee]
+    move = seat(0, slct_position, holders[0] if holders else None, 'Proposed move')
+    move.update({'Unique ID': slct_employee, 'Employee Level': data.talent_by_id.get(slct_employee, 'Employee Level'),
+                 'Slate Rank': on_slate[0] + 1 if len(on_slate) else None,
+                 'Sum of Weighted Differences': fit[1][own[0]] if fit is not None and len(own) else None,
+                 'Sum of Weighted Differences (Absolute)': fit[2][own[0]] if fit is not None and len(own) else None})
+    chain = [move]
+    taken[codes[own]] = True
+    filled = {slct_position}
+
+    # the seats opened by the last step and the employee who left each of them
+    opened = [(position, slct_employee) for position in chart.seats(slct_employee)]
+    step = 1
+    with timed('ripple_steps') as info:
+        while opened:
+            following = []
+            for position, left in opened:
+                if position in filled or position not in data.target_by_key:
+                    continue
+                filled.add(position)
+                if steps is not None and step > steps:
+                    chain.append(seat(step, position, left, 'Not followed'))
+                    continue
+                rows, signed, absolute = slate(position)
+                allowed = None
+                if scope == 'team':
+                    allowed = np.zeros(len(employees), dtype=bool)
+                    team = employees.get_indexer(chart.team(left))
+                    allowed[team[team >= 0]] = True
+                i = first_free(codes[rows], taken, allowed)
+                if i < 0:
+                    chain.append(seat(step, position, left, 'No free candidate'))
+                    continue
+                chosen = ids[rows[i]]
+                taken[codes[rows[i]]] = True
+                filled_seat = seat(step, position, left, 'Filled')
+                filled_seat.update({'Unique ID': chosen, 'Employee Level': levels[rows[i]], 'Slate Rank': i + 1,
+                                    'Sum of Weighted Differences': signed[i],
+                                    'Sum of Weighted Differences (Absolute)': absolute[i]})
+                chain.append(filled_seat)
+                following += [(vacated, chosen) for vacated in chart.seats(chosen)]
+            if steps is not None and step > steps:
+                break
+            opened = following
+            step += 1
+        info['rows'] = len(chain)
+
+    # numpy values as plain ones in object columns, so whole numbers stay whole next to the empty rows
+    chain = pd.DataFrame([{column: employee_id(value) for column, value in row.items()}
+                          for row in chain], columns=RIPPLE_TABLE_COLUMNS, dtype=object)
+    scores = ['Sum of Weighted Differences', 'Sum of Weighted Differences (Absolute)']
+    chain[scores] = chain[scores].astype(float)
+    return chain
+
+def describe_ripple(chain):
+    if not len(chain):
+        return "Choose the employee and the position to move them to"
+    opened = chain[chain['Step'] > 0]
+    if not len(opened):
+        return "The move opens no other seat"
+    outcome = opened['Outcome'].value_counts()
+    steps = opened.loc[opened['Outcome'] != 'Not followed', 'Step'].max()
+    text = "Seats opened by the move: {} in {} steps, {} filled, {} without a free candidate".format(
+        len(opened), steps, outcome.get('Filled', 0), outcome.get('No free candidate', 0))
+    if outcome.get('Not followed', 0):
+        text += ", {} not followed".format(outcome['Not followed'])
+    return text + "; total Sum of Weighted Differences {:g}".format(chain['Sum of Weighted Differences'].sum())
 
+# ------------------------------------------------------------------------------
+# App factory
+# POST /admin/reload with ADMIN_TOKEN in an X-Admin-Token header reloads the workbooks
+# without a restart; without ADMIN_TOKEN the route does not exist. RELOAD_POLL_SECONDS > 0
+# also reloads whenever they change on disk. Neither is available with preload: a reload
+# would only reach the worker that got the request and would rewrite the fit matrix
+# files the other workers have mapped, so those restart instead (kill -HUP the master).
+RELOAD_POLL_SECONDS = float(os.environ.get('RELOAD_POLL_SECONDS', 0))
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+def create_app(data_source='.', preload=False):
+    # serves right away; the data is loaded by a background warm-up. With preload the
+    # data is loaded before returning and no thread is started, so a gunicorn master
+    # can load it once and fork workers that share it (see wsgi.py). The workbooks are
+    # read in spawned processes, which import the calling script again: call this under
+    # if __name__ == '__main__' in a script, or the workbooks are read one by one
+    store = DataStore(data_source)
+    results = ResultCache(RESULT_CACHE_ENTRIES, int(RESULT_CACHE_MB * 2 ** 20))
+    # results of the old snapshot are dropped before the new one is served
+    store.listeners.append(lambda snapshot: results.invalidate(snapshot.version))
+    app = dash.Dash(__name__, suppress_callback_exceptions=True)
+
+    def layout():
+        try:
+            return serve_layout(store.get(timeout=LAYOUT_WAIT_SECONDS))
+        except Exception:
+            return loading_layout(store)
+
+    app.layout = layout
+    register_callbacks(app, store, results)
+
+    @app.server.route('/health')
+    def health():
+        status = store.status()
+        return flask.jsonify(status), 200 if status['status'] == 'ready' else 503
+
+    @app.server.route('/cache')
+    def cache_stats():
+        return flask.jsonify(results.stats())
+
+    if ADMIN_TOKEN and not preload:
+        @app.server.route('/admin/reload', methods=['POST'])
+        def reload_data():
+            if not hmac.compare_digest(flask.request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN):
+                return flask.jsonify({'error': 'forbidden'}), 403
+            started = store.reload()
+            return flask.jsonify(dict(store.status(), reload_started=started)), 202 if started else 409
+
+    @app.server.route('/metrics')
+    def metrics():
+        # stage histograms plus the result cache counters, as Prometheus text
+        stats = results.stats()
+        lines = []
+        for name, kind in [('hits_total', 'counter'), ('misses_total', 'counter'), ('evictions_total', 'counter'),
+                           ('invalidations_total', 'counter'), ('entries', 'gauge'), ('bytes', 'gauge')]:
+            lines.append('# TYPE succession_result_cache_{} {}'.format(name, kind))
+            lines.append('succession_result_cache_{} {}'.format(name, stats[name.replace('_total', '')]))
+        lines.append('# TYPE succession_data_ready gauge')
+        lines.append('succession_data_ready {}'.format(int(store.ready())))
+        return flask.Response(METRICS.render() + '\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+    app.store = store
+    app.results = results
+    if preload:
+        store.load()
+    else:
+        store.start()
+        if RELOAD_POLL_SECONDS > 0:
+            store.watch(RELOAD_POLL_SECONDS)
+    return app
 
 
+if __name__ == '__main__':
+    app = create_app(sys.argv[1] if len(sys.argv) > 1 else '.')
+    app.run_server(debug=True)
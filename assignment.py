@@ -0,0 +1,37 @@
+import numpy as np
+
+try:
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import min_weight_full_bipartite_matching
+    HAS_SCIPY = True
+except ImportError:
+    HAS_SCIPY = False
+
+
+# ------------------------------------------------------------------------------
+# Assignment
+# Positions (rows) are filled with employees (columns) one to one at the lowest
+# total cost, over the sparse set of allowed pairs, the top-K candidates of each
+# position. Every position also has an "unfilled" column of its own that costs
+# more than any set of real pairs, so as many positions as possible are filled
+# and a position is only left open when its candidates are all taken. Solved as a
+# min-weight full bipartite matching (LAPJVsp) on the sparse pairs.
+def solve(rows, cols, costs, n_rows, n_cols):
+    # rows, cols, costs: the allowed (position, employee) pairs, each at most once;
+    # returns the column of every row, -1 when it stays unfilled
+    if not HAS_SCIPY:
+        raise ImportError('the assignment solver needs scipy')
+    assigned = np.full(n_rows, -1)
+    if not len(costs):
+        return assigned
+    # the sparse matrix drops zeros, so every weight is made positive
+    costs = np.asarray(costs, dtype=np.float64)
+    weights = costs - costs.min() + 1
+    unfilled = weights.max() * n_rows + 1
+    graph = csr_matrix((np.concatenate([weights, np.full(n_rows, unfilled)]),
+                        (np.concatenate([rows, np.arange(n_rows)]),
+                         np.concatenate([cols, n_cols + np.arange(n_rows)]))),
+                       shape=(n_rows, n_cols + n_rows))
+    row_ind, col_ind = min_weight_full_bipartite_matching(graph)
+    assigned[row_ind] = np.where(col_ind < n_cols, col_ind, -1)
+    return assigned
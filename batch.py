@@ -0,0 +1,161 @@
+import argparse
+import sys
+import time
+
+import pandas as pd
+
+import assignment
+import snapshot_cache
+from app_test import assign_positions, calculateScore_position, describe_assignment, select_employees
+from data_loader import DataStore
+
+
+# ------------------------------------------------------------------------------
+# Batch succession slates
+# Scores every position (or the chosen ones) once, filters the candidates for each
+# time scale with the same code as the "Fill A Position" tab and streams the slates
+# to CSV or Parquet, a chunk at a time. With --assign the positions are filled at
+# once instead, every employee at most once (see assign_positions).
+CHUNK_ROWS = 100000
+
+
+class CsvWriter:
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+
+    def write(self, df):
+        df.to_csv(self.path, mode='a' if self.rows else 'w', header=not self.rows, index=False)
+        self.rows += len(df)
+
+    def close(self):
+        pass
+
+
+class ParquetWriter:
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self.writer = None
+
+    def write(self, df):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        # object columns are written as text so every chunk has the same schema
+        df = df.copy()
+        for column in df.columns[df.dtypes == object]:
+            df[column] = df[column].where(df[column].isna(), df[column].astype(str))
+        if self.writer is None:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            fields = [pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f for f in table.schema]
+            self.schema = pa.schema(fields)
+            self.writer = pq.ParquetWriter(self.path, self.schema)
+        self.writer.write_table(pa.Table.from_pandas(df, schema=self.schema, preserve_index=False))
+        self.rows += len(df)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def slates(data, positions, time_scales, filters, top_k=None):
+    # one frame per position and time scale: the ranked candidates that pass the filters
+    for position in positions:
+        df = calculateScore_position(data, position)
+        for time_scale in time_scales:
+            try:
+                slate = select_employees(data, df, time_scale, position, *filters)
+            except KeyError:
+                # unknown position
+                continue
+            if top_k is not None:
+                slate = slate.head(top_k)
+            slate = slate.reset_index(drop=True)
+            slate.insert(0, 'Rank', range(1, len(slate) + 1))
+            slate.insert(0, 'Time Scale', time_scale)
+            slate.insert(0, 'Position Key', position)
+            yield position, slate
+
+
+def run(data, positions, time_scales, writer, filters=(None,) * 6, top_k=None, chunk_rows=CHUNK_ROWS, log=sys.stderr):
+    started = time.time()
+    chunk, chunk_size, done = [], 0, set()
+
+    def flush():
+        if chunk:
+            writer.write(pd.concat(chunk, ignore_index=True))
+            del chunk[:]
+        elapsed = time.time() - started
+        print("{} of {} positions, {} rows, {:.1f}s, {:.1f} positions/s, {:.0f} rows/s".format(
+            len(done), len(positions), writer.rows, elapsed, len(done) / max(elapsed, 1e-9),
+            writer.rows / max(elapsed, 1e-9)), file=log)
+
+    for position, slate in slates(data, positions, time_scales, filters, top_k):
+        done.add(position)
+        if len(slate):
+            chunk.append(slate)
+            chunk_size += len(slate)
+        if chunk_size >= chunk_rows:
+            flush()
+            chunk_size = 0
+    flush()
+    writer.close()
+    return writer.rows
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Write the ranked candidate slate of every position.')
+    parser.add_argument('data_dir', nargs='?', default='.', help='directory with the source workbooks')
+    parser.add_argument('-o', '--output', required=True, help='output file, .csv or .parquet')
+    parser.add_argument('--positions', nargs='+', help='Position Keys to score (default: all positions)')
+    parser.add_argument('--positions-file', help='file with one Position Key per line')
+    parser.add_argument('--time-scale', nargs='+', help='time scales (default: all of them)')
+    parser.add_argument('--level', nargs='+', type=float, help='employee levels')
+    parser.add_argument('--function', nargs='+', help='employee functions')
+    parser.add_argument('--location', nargs='+', help='employee locations')
+    parser.add_argument('--9box', dest='box', nargs='+', type=int, help='9 box scores')
+    parser.add_argument('--tip', type=float, help='minimum time in position (months)')
+    parser.add_argument('--til', type=float, help='minimum time in level (months)')
+    parser.add_argument('--top-k', type=int, help='keep only the best K candidates per slate')
+    parser.add_argument('--assign', action='store_true',
+                        help='fill the positions one to one at the lowest total weighted difference, '
+                             'considering the best --top-k candidates per position (default: as many as positions)')
+    parser.add_argument('--workers', type=int, help='processes for scoring the fit matrices (default: $SCORING_WORKERS or 1)')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help='rows written per chunk')
+    args = parser.parse_args(argv)
+    if args.output.endswith('.parquet') and not snapshot_cache.HAS_PARQUET:
+        parser.error('writing Parquet needs pyarrow')
+    if args.assign and not assignment.HAS_SCIPY:
+        parser.error('--assign needs scipy')
+    if args.assign and len(args.time_scale or []) != 1:
+        parser.error('--assign needs exactly one --time-scale')
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    print("Loading data from {}".format(args.data_dir), file=sys.stderr)
+    data = DataStore(args.data_dir, args.workers).start().get()
+
+    positions = list(data.position_list)
+    if args.positions or args.positions_file:
+        positions = list(args.positions or [])
+        if args.positions_file:
+            with open(args.positions_file) as f:
+                positions += [line.strip() for line in f if line.strip()]
+    time_scales = args.time_scale or list(data.readiness.tables['employee'])
+    filters = (args.level, args.function, args.location, args.box, args.tip, args.til)
+
+    writer = ParquetWriter(args.output) if args.output.endswith('.parquet') else CsvWriter(args.output)
+    if args.assign:
+        started = time.time()
+        result = assign_positions(data, positions, time_scales[0], args.top_k, filters)
+        writer.write(result)
+        writer.close()
+        print("{} in {:.1f}s".format(describe_assignment(result), time.time() - started), file=sys.stderr)
+        return
+    run(data, positions, time_scales, writer, filters, args.top_k, args.chunk_rows)
+
+
+if __name__ == '__main__':
+    main()
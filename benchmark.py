@@ -0,0 +1,219 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+import app_test
+import data_loader
+import snapshot_cache
+import synthetic_data
+from competency import COMPETENCIES, adjust_scores
+from tenure import TenureMatrix
+
+
+# ------------------------------------------------------------------------------
+# Per-stage benchmark
+# Times every stage of loading and of both tabs on synthetic data (or on real
+# workbooks) and writes the timings as JSON, so runs on different commits can be
+# compared with --compare.
+SAMPLE = 20
+
+
+class Timings:
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        # the block may set info['rows'] to the number of rows it produced
+        info = {}
+        start = time.perf_counter()
+        yield info
+        elapsed = time.perf_counter() - start
+        entry = self.stages.setdefault(name, {'seconds': [], 'rows': 0})
+        entry['seconds'].append(elapsed)
+        entry['rows'] += int(info.get('rows', 0))
+
+    @contextmanager
+    def wrapped(self, module, attribute, name):
+        # times every call of module.attribute made while the block runs
+        original = getattr(module, attribute)
+
+        def timed(*args, **kwargs):
+            with self.stage(name):
+                return original(*args, **kwargs)
+        setattr(module, attribute, timed)
+        try:
+            yield
+        finally:
+            setattr(module, attribute, original)
+
+    def summary(self):
+        result = {}
+        for name, entry in self.stages.items():
+            seconds = np.array(entry['seconds'])
+            result[name] = {'runs': len(seconds), 'total_seconds': seconds.sum(), 'median_seconds': np.median(seconds),
+                            'min_seconds': seconds.min(), 'max_seconds': seconds.max(), 'rows': entry['rows']}
+        return {name: {k: (round(float(v), 6) if isinstance(v, float) else v) for k, v in stats.items()}
+                for name, stats in result.items()}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_stages(timings, frames, work_dir):
+    with timings.stage('clean_data') as info, timings.wrapped(data_loader, 'fix_double_scores', 'fix_double_scores'), \
+            timings.wrapped(data_loader, 'compact_frames', 'compact_frames'):
+        frames = data_loader.clean_data(frames)
+        info['rows'] = len(frames['talent_pool'])
+
+    cache_dir = os.path.join(work_dir, 'snapshot')
+    with timings.stage('snapshot_write'):
+        snapshot_cache.write_snapshot(cache_dir, frames, {})
+    with timings.stage('load') as info:
+        manifest = snapshot_cache.read_manifest(cache_dir)
+        frames = {name: snapshot_cache.read_frame(cache_dir, name, fmt) for name, fmt in manifest['frames'].items()}
+        info['rows'] = sum(len(df) for df in frames.values())
+
+    with timings.stage('tenure') as info:
+        tenure = TenureMatrix(frames['job_history'])
+        info['rows'] = len(frames['job_history'])
+    for function in tenure.functions:
+        with timings.stage('tenure_column') as info:
+            tenure.column(function)
+            info['rows'] = len(tenure)
+
+    talent_pool = frames['talent_pool']
+    with timings.stage('adjust_scores') as info:
+        adjust_scores(talent_pool[['Employee Level'] + COMPETENCIES].copy())
+        info['rows'] = len(talent_pool)
+
+    with timings.stage('data_snapshot'), timings.wrapped(data_loader, 'FitMatrices', 'fit_matrices'):
+        data = data_loader.DataSnapshot(frames, os.path.join(work_dir, 'fit'), 'benchmark')
+    return data
+
+
+def position_stages(timings, data, positions, time_scales):
+    for position in positions:
+        with timings.stage('calculateScore_position') as info:
+            df = app_test.calculateScore_position(data, position)
+            info['rows'] = len(df)
+        for time_scale in time_scales:
+            with timings.stage('filter_employees') as info:
+                selected = app_test.select_employees(data, df, time_scale, position, None, None, None, None, None, None)
+                info['rows'] = len(selected)
+            with timings.stage('to_dict_employees') as info:
+                selected.to_dict('records')
+                info['rows'] = len(selected)
+            with timings.stage('top_employees') as info:
+                records, _ = app_test.top_employees(app_test.ResultCache(), data, position, 25, time_scale,
+                                                    None, None, None, None, None, None)
+                info['rows'] = len(records)
+
+
+def employee_stages(timings, data, employees, time_scales):
+    for employee in employees:
+        with timings.stage('calculateScore_employee') as info:
+            df2 = app_test.calculateScore_employee(data, employee)
+            info['rows'] = len(df2)
+        for time_scale in time_scales:
+            with timings.stage('filter_positions') as info:
+                selected = app_test.select_positions(data, df2, time_scale, employee, None, None, None)
+                info['rows'] = len(selected)
+            with timings.stage('to_dict_positions') as info:
+                selected.to_dict('records')
+                info['rows'] = len(selected)
+            with timings.stage('top_positions') as info:
+                records, _ = app_test.top_positions(data, employee, 25, time_scale, None, None, None)
+                info['rows'] = len(records)
+        with timings.stage('similar_employees') as info:
+            info['rows'] = len(app_test.similar_employees(data, employee, 25, 'weighted'))
+
+
+def ripple_stages(timings, data, positions, people, time_scales, steps=10):
+    # every sampled employee moved into a sampled position, the chain followed for steps;
+    # the moves of a time scale share their slates, as in the app
+    for time_scale in time_scales:
+        results = app_test.ResultCache()
+        for position, employee in zip(positions, people):
+            with timings.stage('ripple') as info:
+                info['rows'] = len(app_test.ripple(results, data, position, employee, time_scale, steps))
+
+
+def run(employees=1000, seed=0, data_dir=None, sample=SAMPLE):
+    timings = Timings()
+    if data_dir is None:
+        with timings.stage('generate') as info:
+            frames = synthetic_data.generate(employees, seed)
+            info['rows'] = sum(len(df) for df in frames.values())
+    else:
+        with timings.stage('read_workbooks') as info:
+            frames = data_loader.read_workbooks(data_dir)
+            info['rows'] = sum(len(df) for df in frames.values())
+        employees = len(frames['talent'])
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        data = load_stages(timings, frames, work_dir)
+        rng = np.random.default_rng(seed)
+        positions = rng.choice(data.position_list, min(sample, len(data.position_list)), replace=False)
+        people = rng.choice(data.employee_list, min(sample, len(data.employee_list)), replace=False)
+        time_scales = list(data.readiness.tables['employee'])
+        position_stages(timings, data, positions, time_scales)
+        employee_stages(timings, data, people, time_scales)
+        ripple_stages(timings, data, positions, people, time_scales)
+        memory = data.memory.to_dict('records')
+        # drop the memory maps before the directory goes
+        del data
+
+    return {'meta': {'commit': git_commit(), 'time': pd.Timestamp.now().isoformat(timespec='seconds'),
+                     'employees': employees, 'seed': seed, 'data_dir': data_dir, 'sample': sample,
+                     'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__},
+            'stages': timings.summary(), 'memory': memory}
+
+
+def report(results, baseline=None, out=sys.stdout):
+    print("{:<26}{:>6}{:>12}{:>12}{:>10}".format('stage', 'runs', 'median ms', 'rows', 'vs base'), file=out)
+    for name, stats in results['stages'].items():
+        ratio = ''
+        if baseline is not None and name in baseline['stages'] and baseline['stages'][name]['median_seconds'] > 0:
+            ratio = '{:.2f}x'.format(stats['median_seconds'] / baseline['stages'][name]['median_seconds'])
+        print("{:<26}{:>6}{:>12.2f}{:>12}{:>10}".format(name, stats['runs'], stats['median_seconds'] * 1000,
+                                                       stats['rows'], ratio), file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time every loading and scoring stage.')
+    parser.add_argument('-n', '--employees', type=int, default=1000, help='synthetic employees (1,000 to 1,000,000)')
+    parser.add_argument('--data-dir', help='benchmark these workbooks instead of synthetic data')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--sample', type=int, default=SAMPLE, help='positions and employees scored per tab')
+    parser.add_argument('-o', '--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='results JSON of an earlier run to compare with')
+    args = parser.parse_args(argv)
+
+    results = run(args.employees, args.seed, args.data_dir, args.sample)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    report(results, baseline)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+
+# ------------------------------------------------------------------------------
+# Compact frames
+# Cleaned frames are stored with the smallest dtypes that hold their values
+# exactly: repeated strings (Location, Function, Job Profile, Position Text, ...)
+# become categoricals, whole numbers the smallest integer type and fractional
+# scores float16 or float32 when that loses nothing. Scores and outputs are
+# therefore the same as with the wide frames. Key columns stay as they are, they
+# are looked up by value.
+KEY_COLUMNS = ['Unique ID', 'Position Key', 'Job Profile Name', 'Position', 'Manager Unique ID']
+
+# strings are only dictionary-encoded if at least every other row repeats one
+CATEGORY_MAX_RATIO = 0.5
+
+INTEGER_TYPES = [np.int8, np.int16, np.int32]
+FLOAT_TYPES = [np.float16, np.float32]
+
+
+def compact_column(values):
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values
+    # text is object dtype before pandas 3 and the str dtype from it on
+    if pd.api.types.is_string_dtype(values) or values.dtype == object:
+        if len(values) and values.nunique(dropna=True) <= len(values) * CATEGORY_MAX_RATIO:
+            return values.astype('category')
+        return values
+    if not pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+        return values
+    array = values.to_numpy()
+    candidates = FLOAT_TYPES if np.isnan(array.astype(np.float64)).any() else INTEGER_TYPES + FLOAT_TYPES
+    for dtype in candidates:
+        if np.dtype(dtype).itemsize >= array.dtype.itemsize:
+            break
+        with np.errstate(over='ignore', invalid='ignore'):
+            converted = array.astype(dtype)
+        if np.array_equal(converted.astype(np.float64), array.astype(np.float64), equal_nan=True):
+            return pd.Series(converted, index=values.index, name=values.name)
+    return values
+
+
+def compact_frame(df):
+    return pd.DataFrame({column: df[column] if column in KEY_COLUMNS else compact_column(df[column])
+                         for column in df.columns}, index=df.index)
+
+
+def frame_bytes(df):
+    return int(df.memory_usage(deep=True).sum())
+
+
+def memory_report(before, after):
+    # memory of every frame before and after compaction, with a total row
+    report = pd.DataFrame({'Frame': list(after),
+                           'Rows': [len(after[name]) for name in after],
+                           'Before (MB)': [frame_bytes(before[name]) / 2 ** 20 for name in after],
+                           'After (MB)': [frame_bytes(after[name]) / 2 ** 20 for name in after]})
+    total = pd.DataFrame({'Frame': ['total'], 'Rows': [report['Rows'].sum()],
+                          'Before (MB)': [report['Before (MB)'].sum()], 'After (MB)': [report['After (MB)'].sum()]})
+    report = pd.concat([report, total], ignore_index=True)
+    report['Saved (%)'] = (100 * (1 - report['After (MB)'] / report['Before (MB)'])).fillna(0).round(1)
+    report[['Before (MB)', 'After (MB)']] = report[['Before (MB)', 'After (MB)']].round(3)
+    return report
+
+
+def main(argv=None):
+    # memory of the frames of a workbook directory, wide and compact
+    import data_loader
+    parser = argparse.ArgumentParser(description='Report the memory of the cleaned frames before and after compaction.')
+    parser.add_argument('data_dir', nargs='?', default='.', help='directory with the source workbooks')
+    args = parser.parse_args(argv)
+    frames = data_loader.clean_data(data_loader.read_workbooks(args.data_dir))
+    print(frames['memory'].to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+
+
+# ------------------------------------------------------------------------------
+# Competency engine
+# Talent and job signature competencies are held as contiguous float32 matrices.
+# Scores are shifted by the employee level / pay band (level + score - 3) and the
+# weighted differences are computed as matrix-vector products.
+COMPETENCIES = ['Quantitative', 'Analytical', 'Conceptual', 'Communications', 'Working with Others',
+                'Influence & Negotiation', 'Work Management', 'People Management',
+                'Inspiring Leadership', 'Company', 'Industry Knowledge', 'General Business Knowledge',
+                'Functional Expertise', 'Mentoring']
+
+# job_signatures.xlsx spells two of them differently
+SIGNATURE_COLUMNS = {"Communications": "Communication", "Influence & Negotiation": "Influence and Negotiation"}
+
+
+def adjust_scores(df):
+  # first column is the level, the rest are competency scores
+  df.iloc[:, 1:] = df.iloc[:, 1:].values + (df.iloc[:, [0]].values - 3)
+  return df
+
+
+def adjust_matrix(levels, scores):
+    return np.ascontiguousarray(levels[:, None] + scores - 3, dtype=np.float32)
+
+
+def importance_weights(adjusted):
+    # adjusted scores of 1 and 2 count half, everything else by its value
+    return np.where((adjusted == 1) | (adjusted == 2), 0.5, adjusted).astype(np.float32)
+
+
+def level_array(values):
+    values = np.asarray(values, dtype=np.float64)
+    if np.isnan(values).any():
+        return values.astype(np.float32)
+    return values.astype(np.int8)
+
+
+def competency_matrix(df, columns=COMPETENCIES):
+    return np.ascontiguousarray(df[columns].to_numpy(dtype=np.float32))
+
+
+def unique_loc(index, key):
+    # position of a key that must occur exactly once
+    i = index.get_loc(key)
+    if not isinstance(i, (int, np.integer)):
+        raise KeyError(key)
+    return i
+
+
+class CompetencyMatrix:
+    # level-adjusted competencies of a set of rows; missing scores contribute nothing to the sums
+    def __init__(self, levels, scores):
+        self.levels = level_array(levels)
+        self.adjusted = adjust_matrix(self.levels, scores)
+        missing = np.isnan(self.adjusted)
+        self.has_missing = bool(missing.any())
+        if self.has_missing:
+            self.valid = np.ascontiguousarray(~missing, dtype=np.float32)
+            self.filled = np.where(missing, np.float32(0), self.adjusted)
+        else:
+            self.valid = None
+            self.filled = self.adjusted
+
+    def __len__(self):
+        return self.adjusted.shape[0]
+
+
+class CompetencyEngine:
+    def __init__(self, talent_pool, talent, position_pool, job_signatures):
+        # "fill a position": every employee in talent_pool with a level against a job signature
+        levels = talent_pool['Employee Level'].to_numpy(dtype=np.float64)
+        self.pool_rows = np.flatnonzero(levels >= 0)
+        self.pool = CompetencyMatrix(levels[self.pool_rows],
+                                     competency_matrix(talent_pool)[self.pool_rows])
+
+        self.signature_index = pd.Index(job_signatures['Job Profile Name'])
+        self.signature_grades = level_array(job_signatures['Job Grade'])
+        self.signature_scores = competency_matrix(job_signatures, [SIGNATURE_COLUMNS.get(c, c) for c in COMPETENCIES])
+
+        # "find a position": every position against one employee of talent
+        self.positions = CompetencyMatrix(position_pool['Job Profile Pay Band'].to_numpy(dtype=np.float64),
+                                          competency_matrix(position_pool))
+        self.position_bands = self.positions.levels
+        self.talent_index = pd.Index(talent['Unique ID'])
+        self.talent_levels = level_array(talent['Employee Level'])
+        self.talent_scores = competency_matrix(talent)
+
+    def signature(self, job_profile):
+        i = unique_loc(self.signature_index, job_profile)
+        target = adjust_matrix(self.signature_grades[i:i + 1], self.signature_scores[i:i + 1])[0]
+        return target, importance_weights(target)
+
+    def employee(self, unique_id):
+        i = unique_loc(self.talent_index, unique_id)
+        adjusted = adjust_matrix(self.talent_levels[i:i + 1], self.talent_scores[i:i + 1])[0]
+        return self.talent_levels[i], adjusted, importance_weights(adjusted)
@@ -0,0 +1,471 @@
+import functools
+import hashlib
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+
+import pandas as pd
+import numpy as np
+
+import parallel
+import snapshot_cache
+from compact import compact_frame, memory_report
+from competency import COMPETENCIES, CompetencyEngine
+from filters import FilterIndex
+from fit_matrix import FitMatrices
+from lookup import FrameRecords, KeyIndex
+from metrics import timed
+from org_chart import OrgChart
+from readiness import ReadinessRules
+from similarity import SimilarityIndex
+from storage import SqlFilterIndex, SqlRecords, SqlStorage
+from tenure import TenureMatrix
+from validation import fix_double_scores, validation_report
+
+
+# ------------------------------------------------------------------------------
+# Source workbooks
+SOURCE_FILES = {
+    'feedback_360': '360_feedback.xlsx',
+    'target': 'target.xlsx',
+    'talent': 'talent.xlsx',
+    'job_signatures': 'job_signatures.xlsx',
+    'job_history': 'job_history.xlsx',
+}
+
+SNAPSHOT_DIR = '.snapshot'
+
+# 'memory', or 'sqlite' / 'duckdb' to also keep the tables in an embedded database and filter there
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'memory')
+
+
+def source_paths(data_dir):
+    return {name: os.path.join(data_dir, file) for name, file in SOURCE_FILES.items()}
+
+
+def read_workbooks(data_dir, progress=None):
+    # the workbooks are independent and openpyxl parsing holds the GIL, so each one is read in its own process;
+    # this runs in the warm-up and reload threads while requests are served, and forking a threaded
+    # process can leave a lock held in the child, so the workers are spawned
+    paths = source_paths(data_dir)
+    frames = {}
+
+    def read(name, df):
+        frames[name] = df
+        if progress is not None:
+            progress('reading', workbooks_read=len(frames))
+
+    try:
+        with ProcessPoolExecutor(max_workers=len(paths), mp_context=get_context('spawn')) as pool:
+            futures = {pool.submit(pd.read_excel, path): name for name, path in paths.items()}
+            for future in as_completed(futures):
+                read(futures[future], future.result())
+    except BrokenProcessPool:
+        # spawned workers import the __main__ script again, which fails when it loads the data
+        # without an if __name__ == '__main__' guard; the workbooks left are then read one by one
+        for name, path in paths.items():
+            if name not in frames:
+                read(name, pd.read_excel(path))
+    return frames
+
+
+# ------------------------------------------------------------------------------
+# Import and clean data
+def clean_data(frames):
+    target = frames['target']
+    talent = frames['talent']
+    job_signatures = frames['job_signatures']
+    job_history = frames['job_history']
+
+    job_history['Function'] = job_history['Function'].replace(['Tax','Accounting'], 'Finance')
+    job_history['Function'] = job_history['Function'].replace(['Coffee'], 'Culinary')
+    job_history['Function'] = job_history['Function'].replace(['Facilities'], 'People')
+    job_history['Function'] = job_history['Function'].replace(['Global Development'], 'Development')
+    target['Position Key'] = target['Position'].astype(str) + " " + target['Position Text']
+
+    # swap 'communication' and 'working with others'
+    titles = list(talent.columns)
+    titles[6], titles[7] = titles[7], titles[6]
+    talent = talent[titles]
+
+    talent_pool = talent.merge(target, how="left", left_on='Unique ID', right_on='Unique ID')
+    talent_pool = talent_pool.rename(columns={"9box Score (box number 1-9)": "9Box Score"})
+    talent_pool['Sum of Weighted Differences'] = np.nan
+    talent_pool['Sum of Weighted Differences (Absolute)'] = np.nan
+    talent_pool['Time in Function (years)'] = np.nan
+    talent_pool['Time in Function Weighted (years)'] = np.nan
+    position_pool = target.merge(job_signatures, left_on="Job Profile", right_on="Job Profile Name")
+    position_pool = position_pool.rename(columns={"Communication": "Communications"})
+    position_pool = position_pool.rename(columns={"Influence and Negotiation": "Influence & Negotiation"})
+    position_pool = position_pool.rename(columns={"Job Family Group_x": "Job Family Group"})
+    position_pool['Sum of Weighted Differences'] = np.nan
+    position_pool['Sum of Weighted Differences (Absolute)'] = np.nan
+
+    # cut the wrong scores (those were added twice) in half and check the inputs
+    fixed_rows = fix_double_scores(talent_pool)
+    validation = validation_report(talent, target, job_signatures, talent_pool, fixed_rows)
+
+    # store every frame with the smallest dtypes that hold it exactly
+    frames = dict(frames, target=target, talent=talent, job_history=job_history,
+                  talent_pool=talent_pool, position_pool=position_pool)
+    compact = compact_frames(frames)
+    return dict(compact, validation=validation, memory=memory_report(frames, compact))
+
+
+def compact_frames(frames):
+    return {name: compact_frame(df) for name, df in frames.items()}
+
+
+def load_data(data_dir='.', cache_dir=None, progress=None):
+    # the cleaned frames come from the on-disk snapshot unless a workbook changed;
+    # returns the frames and the snapshot version
+    if cache_dir is None:
+        cache_dir = os.path.join(data_dir, SNAPSHOT_DIR)
+
+    def build():
+        with timed('read_workbooks') as info:
+            frames = read_workbooks(data_dir, progress)
+            info['rows'] = sum(len(df) for df in frames.values())
+        if progress is not None:
+            progress('cleaning')
+        with timed('clean_data') as info:
+            frames = clean_data(frames)
+            info['rows'] = len(frames['talent_pool'])
+        return frames
+
+    if progress is not None:
+        progress('snapshot')
+    with timed('load_snapshot'):
+        return snapshot_cache.load_snapshot(source_paths(data_dir), cache_dir, build)
+
+
+# ------------------------------------------------------------------------------
+# Loaded data
+LOCAL_VERSIONS = itertools.count()
+
+
+def same_frame(old, new):
+    return old is new or (old.shape == new.shape and old.equals(new))
+
+
+def frame_fingerprint(df):
+    # tells frames apart as same_frame does, for a frame that is no longer in memory
+    digest = hashlib.sha1(repr((df.shape, list(df.columns), [str(dtype) for dtype in df.dtypes])).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+# the frames a snapshot on a database writes there; all but job_history, which a reload
+# folds into time in function, are then dropped from memory
+DATABASE_TABLES = ['feedback_360', 'target', 'talent', 'job_signatures', 'job_history', 'talent_pool',
+                   'position_pool', 'talent_candidates']
+
+
+class DataSnapshot:
+    # The cleaned frames, the dropdown option lists and the scoring structures derived
+    # from them. Never modified once built, so a reload builds a new one; structures
+    # whose input frames equal those of previous are taken over instead of rebuilt.
+    def __init__(self, frames, fit_dir=None, version=None, workers=None, previous=None, store_dir=None, backend=None):
+        # version keys cached results; snapshots built without one never share them
+        self.version = version if version is not None else 'local-{}'.format(next(LOCAL_VERSIONS))
+        self.feedback_360 = frames['feedback_360']
+        self.target = frames['target']
+        self.talent = frames['talent']
+        self.job_signatures = frames['job_signatures']
+        self.job_history = frames['job_history']
+        self.talent_pool = frames['talent_pool']
+        self.position_pool = frames['position_pool']
+        self.validation = frames['validation']
+        self.memory = frames['memory']
+        # names of the structures taken over from previous
+        self.reused = []
+        # fingerprints of the frames compared with the next snapshot, once they are dropped
+        self.fingerprints = {}
+
+        self.position_list = np.sort(self.target['Position Key'].unique())
+        self.employee_level_list = np.sort(self.talent_pool['Employee Level'].unique())
+        self.function_list = np.sort(self.target['Function'].unique().astype(str))
+        self.location_list = np.sort(self.target['Location'].unique().astype(str))
+        self.employee_list = np.sort(self.talent['Unique ID'].unique())
+        self.job_profile_pay_band_list = np.sort(self.target['Job Profile Pay Band'].unique())
+        # lowercased text of the position and employee choices, searched as the user types; fixed-width
+        # arrays hold no Python objects, so forked workers read them without copying their pages
+        self.position_search = np.char.lower(self.position_list.astype(str))
+        self.employee_search = self.employee_list.astype(str)
+
+        # selections are looked up through these instead of scanning the key columns
+        if self._unchanged(previous, 'target', 'position_pool'):
+            self._reuse(previous, 'target_by_key', 'position_pool_by_key')
+        else:
+            self.target_by_key = KeyIndex(self.target, 'Position Key', ['Job Profile', 'Job Profile Pay Band', 'Function'])
+            self.position_pool_by_key = KeyIndex(self.position_pool, 'Position Key')
+        # who holds every seat and whom it reports to, for the succession ripple
+        if self._unchanged(previous, 'target'):
+            self._reuse(previous, 'org_chart')
+        else:
+            with timed('org_chart') as info:
+                self.org_chart = OrgChart(self.target)
+                info['rows'] = len(self.org_chart)
+        if self._unchanged(previous, 'talent', 'talent_pool'):
+            self._reuse(previous, 'talent_by_id', 'talent_pool_by_id')
+        else:
+            self.talent_by_id = KeyIndex(self.talent, 'Unique ID', ['Employee Level'])
+            self.talent_pool_by_id = KeyIndex(self.talent_pool, 'Unique ID')
+
+        # years in every function per employee, and the row of every talent candidate in it
+        with timed('tenure') as info:
+            self.tenure = self._tenure(previous)
+            info['rows'] = len(self.job_history)
+
+        if self._unchanged(previous, 'talent_pool', 'talent', 'position_pool', 'job_signatures'):
+            self._reuse(previous, 'engine', 'fit', 'talent_similarity')
+            # a snapshot on a database no longer holds the candidate frame
+            if previous.talent_candidates is not None:
+                self._reuse(previous, 'talent_candidates')
+            else:
+                self.talent_candidates = self.talent_pool.iloc[self.engine.pool_rows].reset_index(drop=True)
+        else:
+            with timed('competency_engine'):
+                self.engine = CompetencyEngine(self.talent_pool, self.talent, self.position_pool, self.job_signatures)
+            # the talent_pool rows that can be scored, in the row order of the fit matrices
+            self.talent_candidates = self.talent_pool.iloc[self.engine.pool_rows].reset_index(drop=True)
+            # fit_dir keeps the all-pairs matrices on disk between runs; without it they live in memory.
+            # Only the rows and columns whose inputs changed are rescored.
+            # workers > 1 (default: $SCORING_WORKERS) scores large matrices in a process pool
+            with timed('fit_matrices'):
+                self.fit = FitMatrices(self.engine, self.talent_pool, self.talent, self.position_pool, fit_dir,
+                                       functools.partial(parallel.fill, workers=workers))
+            # the candidates with assessed competencies (those the candidate table shows), for the similar talent search
+            with timed('similarity_index') as info:
+                adjusted = self.engine.pool.adjusted
+                self.talent_similarity = SimilarityIndex(
+                    adjusted, np.flatnonzero(~np.isnan(adjusted[:, COMPETENCIES.index('Communications')])))
+                info['rows'] = len(self.talent_similarity)
+        self._filters(previous, store_dir, backend)
+        self.candidate_tenure_rows = self.tenure.employees.get_indexer(self.talent_candidates['Unique ID'])
+        # the columns read whole by the assignment, the ripple and the open positions
+        self.candidate_ids = self.talent_candidates['Unique ID'].to_numpy()
+        self.candidate_levels = self.talent_candidates['Employee Level'].to_numpy()
+        self.position_keys = self.position_pool['Position Key'].to_numpy()
+        # Ready Now / Soon / Later level and pay band ranges, read again on every load
+        self.readiness = ReadinessRules.load()
+        self._records()
+
+    def _unchanged(self, previous, *names):
+        return previous is not None and all(self._same(previous, name) for name in names)
+
+    def _same(self, previous, name):
+        old = getattr(previous, name)
+        if old is None:
+            return previous.fingerprints.get(name) == self.fingerprint(name)
+        return same_frame(old, getattr(self, name))
+
+    def fingerprint(self, name):
+        if name not in self.fingerprints:
+            self.fingerprints[name] = frame_fingerprint(getattr(self, name))
+        return self.fingerprints[name]
+
+    def _reuse(self, previous, *names):
+        for name in names:
+            setattr(self, name, getattr(previous, name))
+        self.reused += names
+
+    def _filters(self, previous, store_dir, backend):
+        # readiness and preference filters of both tabs, in memory or in the database of this version
+        self.storage = None
+        if store_dir is not None and backend not in (None, 'memory'):
+            tables = {name: getattr(self, name) for name in DATABASE_TABLES}
+            with timed('storage') as info:
+                self.storage = SqlStorage.build(store_dir, self.version, tables, backend)
+                info['rows'] = sum(len(df) for df in tables.values())
+            self.position_filters = SqlFilterIndex(self.storage, 'position_pool', self.position_pool)
+            self.candidate_filters = SqlFilterIndex(self.storage, 'talent_candidates', self.talent_candidates)
+            return
+        if self._unchanged(previous, 'position_pool') and isinstance(previous.position_filters, FilterIndex):
+            self._reuse(previous, 'position_filters')
+        else:
+            self.position_filters = FilterIndex(self.position_pool, ['Job Profile Pay Band', 'Function', 'Location'])
+        if self._unchanged(previous, 'talent_candidates') and isinstance(previous.candidate_filters, FilterIndex):
+            self._reuse(previous, 'candidate_filters')
+        else:
+            self.candidate_filters = FilterIndex(self.talent_candidates,
+                                                 ['Employee Level', 'Function', 'Location', '9Box Score'],
+                                                 ['Time in Position (months)', 'Time in Level (months)'])
+
+    def _records(self):
+        # the rows the tables show; on a database they are read from it, and the frames written
+        # there leave memory once everything derived from them is built
+        if self.storage is None:
+            self.position_pool_records = FrameRecords(self.position_pool)
+            self.talent_pool_records = FrameRecords(self.talent_pool)
+            self.candidate_records = FrameRecords(self.talent_candidates)
+            return
+        self.position_pool_records = SqlRecords(self.storage, 'position_pool', self.position_pool)
+        self.talent_pool_records = SqlRecords(self.storage, 'talent_pool', self.talent_pool)
+        self.candidate_records = SqlRecords(self.storage, 'talent_candidates', self.talent_candidates)
+        for name in DATABASE_TABLES:
+            if name != 'job_history':
+                self.fingerprint(name)
+                setattr(self, name, None)
+
+    def _tenure(self, previous):
+        if self._unchanged(previous, 'job_history'):
+            self.reused.append('tenure')
+            return previous.tenure
+        if previous is not None:
+            # rows appended to the old job_history are folded into a copy of the old matrix
+            old = previous.job_history
+            if len(self.job_history) > len(old) and same_frame(old, self.job_history.iloc[:len(old)]):
+                self.reused.append('tenure')
+                return previous.tenure.copy().append(self.job_history.iloc[len(old):], self.job_history)
+        return TenureMatrix(self.job_history)
+
+
+class DataStore:
+    # Loads the data in a background thread. get() blocks on the readiness future,
+    # status() reports the loading progress without blocking. reload() builds a new
+    # snapshot in the background and swaps it in by replacing the future, so a
+    # request that already holds the old snapshot finishes on it.
+    def __init__(self, data_dir='.', workers=None, backend=None):
+        self.data_dir = data_dir
+        self.workers = workers
+        self.backend = backend or STORAGE_BACKEND
+        self.cache_dir = os.path.join(data_dir, SNAPSHOT_DIR)
+        self.future = Future()
+        self.future.set_running_or_notify_cancel()
+        self.progress = {'stage': 'pending', 'workbooks_read': 0, 'workbooks_total': len(SOURCE_FILES)}
+        self.started = None
+        self.finished = None
+        # called with every snapshot a reload swaps in, before requests can see it
+        self.listeners = []
+        self.reload_lock = threading.Lock()
+        self.reloading = False
+        self.reload_status = {'state': 'idle', 'reloads': 0, 'started': None, 'finished': None,
+                              'result': None, 'error': None, 'reused': []}
+
+    def start(self):
+        self.started = time.time()
+        threading.Thread(target=self._warm_up, name='data-warm-up', daemon=True).start()
+        return self
+
+    def load(self):
+        # loads in the calling thread, e.g. in a gunicorn master before it forks the workers
+        self.started = time.time()
+        self._warm_up()
+        return self
+
+    def _report(self, stage, **info):
+        self.progress = dict(self.progress, stage=stage, **info)
+
+    def _build(self, progress=None, previous=None):
+        frames, version = load_data(self.data_dir, self.cache_dir, progress=progress)
+        if previous is not None and version == previous.version:
+            return None
+        if progress is not None:
+            progress('scoring')
+        with timed('data_snapshot'):
+            return DataSnapshot(frames, os.path.join(self.cache_dir, 'fit'), version, self.workers, previous,
+                                os.path.join(self.cache_dir, 'store'), self.backend)
+
+    def _warm_up(self):
+        try:
+            snapshot = self._build(self._report)
+        except Exception as e:
+            self._report('error', error=repr(e))
+            self.future.set_exception(e)
+        else:
+            self._report('ready')
+            self.future.set_result(snapshot)
+        self.finished = time.time()
+
+    def reload(self):
+        # False while the first load or another reload is still running
+        with self.reload_lock:
+            if self.reloading or not self.future.done():
+                return False
+            self.reloading = True
+        self.reload_status = dict(self.reload_status, state='reloading', started=time.time())
+        threading.Thread(target=self._reload, name='data-reload', daemon=True).start()
+        return True
+
+    def _reload(self):
+        previous = self.future.result() if self.ready() else None
+        try:
+            with timed('reload'):
+                snapshot = self._build(previous=previous)
+            if snapshot is not None:
+                self._swap(snapshot)
+        except Exception as e:
+            self.reload_status = dict(self.reload_status, state='error', finished=time.time(), error=repr(e))
+        else:
+            self.reload_status = dict(self.reload_status, state='idle', finished=time.time(), error=None,
+                                      reloads=self.reload_status['reloads'] + 1,
+                                      result='unchanged' if snapshot is None else 'swapped',
+                                      reused=[] if snapshot is None else snapshot.reused)
+        with self.reload_lock:
+            self.reloading = False
+
+    def _swap(self, snapshot):
+        for listener in self.listeners:
+            listener(snapshot)
+        future = Future()
+        future.set_running_or_notify_cancel()
+        future.set_result(snapshot)
+        self.future = future
+        self._report('ready', error=None)
+
+    def watch(self, interval):
+        # reloads when a workbook changed and then kept its size and mtime for one interval
+        paths = source_paths(self.data_dir)
+        seen = self._source_stats(paths)
+        threading.Thread(target=self._watch, args=(paths, seen, interval), name='data-watch', daemon=True).start()
+        return self
+
+    @staticmethod
+    def _source_stats(paths):
+        try:
+            return {name: (st['size'], st['mtime']) for name, st in snapshot_cache.source_stats(paths).items()}
+        except OSError:
+            # a workbook is being replaced
+            return None
+
+    def _watch(self, paths, seen, interval):
+        pending = None
+        while True:
+            time.sleep(interval)
+            stats = self._source_stats(paths)
+            if stats is None or stats == seen:
+                pending = None
+            elif stats != pending:
+                pending = stats
+            elif self.reload():
+                seen, pending = stats, None
+
+    def get(self, timeout=None):
+        return self.future.result(timeout)
+
+    def ready(self):
+        return self.future.done() and self.future.exception() is None
+
+    def status(self):
+        future = self.future
+        if not future.done():
+            status = 'loading'
+        elif future.exception() is not None:
+            status = 'error'
+        else:
+            status = 'ready'
+        end = self.finished or time.time()
+        elapsed = round(end - self.started, 3) if self.started else 0.0
+        result = {'status': status, 'progress': self.progress, 'elapsed_seconds': elapsed, 'reload': self.reload_status,
+                  'storage': self.backend}
+        if status == 'ready':
+            data = future.result()
+            result['version'] = data.version
+            result['validation'] = dict(zip(data.validation['Check'], data.validation['Count'].tolist()))
+            result['memory'] = data.memory.to_dict('records')
+        return result
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+
+
+# ------------------------------------------------------------------------------
+# Filter index
+# Every filter column is encoded once per data load as categorical codes. Columns
+# with few distinct values also keep a packed bitset per value, so a dropdown
+# selection is an OR of a few bitsets and a set of filters is an AND of those.
+# Rows are only unpacked and materialized once, at the end.
+BITSET_MAX_VALUES = 64
+
+
+class Dimension:
+    def __init__(self, values):
+        codes, uniques = pd.factorize(values)
+        self.codes = codes
+        self.values = pd.Index(uniques)
+        # missing values get code -1
+        self.missing = np.packbits(codes < 0)
+        if len(uniques) <= BITSET_MAX_VALUES:
+            self.bitsets = np.zeros((len(uniques), len(self.missing)), dtype=np.uint8)
+            for i in range(len(uniques)):
+                self.bitsets[i] = np.packbits(codes == i)
+        else:
+            self.bitsets = None
+
+    def select(self, chosen, missing=False):
+        # rows whose value is one of the chosen codes (and missing rows if asked)
+        if self.bitsets is not None:
+            bits = np.bitwise_or.reduce(self.bitsets[chosen], axis=0) if len(chosen) else np.zeros_like(self.missing)
+            if missing:
+                bits = bits | self.missing
+            return bits
+        # too many values for a bitset each: look the codes up instead
+        lookup = np.zeros(len(self.values) + 1, dtype=bool)
+        lookup[chosen] = True
+        lookup[-1] = missing
+        return np.packbits(lookup[self.codes])
+
+    def isin(self, selected):
+        selected = np.asarray(list(selected), dtype=object)
+        chosen = self.values.get_indexer(selected)
+        return self.select(chosen[chosen >= 0], bool(pd.isna(selected).any()))
+
+    def between(self, low, high):
+        values = self.values.to_numpy(dtype=np.float64)
+        return self.select(np.flatnonzero((values >= low) & (values <= high)))
+
+    def below(self, high):
+        return self.select(np.flatnonzero(self.values.to_numpy(dtype=np.float64) < high))
+
+
+class FilterIndex:
+    # the filter columns of one frame; thresholds are numeric columns compared with >=
+    def __init__(self, df, dimensions, thresholds=()):
+        self.index = df.index
+        self.size = len(df)
+        self.dimensions = {column: Dimension(df[column]) for column in dimensions}
+        self.thresholds = {column: df[column].to_numpy(dtype=np.float64) for column in thresholds}
+
+    def everything(self):
+        return np.packbits(np.ones(self.size, dtype=bool))
+
+    def isin(self, column, values):
+        return self.dimensions[column].isin(values)
+
+    def between(self, column, low, high):
+        return self.dimensions[column].between(low, high)
+
+    def below(self, column, high):
+        return self.dimensions[column].below(high)
+
+    def at_least(self, column, value):
+        return np.packbits(self.thresholds[column] >= value)
+
+    def mask(self, bits):
+        return np.unpackbits(bits, count=self.size).view(bool)
+
+    def positions(self, df):
+        # row positions in the indexed frame of df, a subset of its rows in any order
+        return self.index.get_indexer(df.index)
@@ -0,0 +1,233 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from competency import CompetencyMatrix, competency_matrix, importance_weights, unique_loc
+
+
+# ------------------------------------------------------------------------------
+# All-pairs fit matrices
+# Every reference (a job signature or an employee) is scored against every row on
+# the other side once, in cache-sized blocks, and the signed and absolute sums are
+# kept as .npy files opened as memory maps. A callback then only slices one row.
+# On refresh only references and columns whose inputs changed are recomputed.
+BLOCK_REFS = 32
+BLOCK_OTHERS = 2048
+
+
+def occurrence_keys(values):
+    # make repeated keys unique: 'A', 'A' -> 'A#0', 'A#1'
+    values = pd.Series(values).astype(str).reset_index(drop=True)
+    return (values + '#' + values.groupby(values).cumcount().astype(str)).to_numpy(dtype=str)
+
+
+def unique_rows(inputs):
+    # first occurrence of every distinct row and the distinct row of every input row
+    inputs = np.ascontiguousarray(inputs)
+    rows = inputs.view(np.dtype((np.void, inputs.dtype.itemsize * inputs.shape[1]))).ravel()
+    _, first, inverse = np.unique(rows, return_index=True, return_inverse=True)
+    return first, inverse.ravel()
+
+
+def content_keys(inputs):
+    return np.array([row.tobytes().hex() for row in inputs])
+
+
+def same_rows(old, new):
+    return ((old == new) | (np.isnan(old) & np.isnan(new))).all(axis=1)
+
+
+class References:
+    # reference vectors with their weights; unknown entries contribute nothing
+    def __init__(self, levels, scores):
+        levels = np.asarray(levels, dtype=np.float32)
+        adjusted = levels[:, None] + scores - 3
+        weights = importance_weights(adjusted)
+        unknown = np.isnan(adjusted) | np.isnan(weights)
+        self.inputs = np.ascontiguousarray(np.column_stack([levels, scores]), dtype=np.float32)
+        self.adjusted = np.where(unknown, np.float32(0), adjusted).astype(np.float32)
+        self.weights = np.where(unknown, np.float32(0), weights).astype(np.float32)
+
+    def __len__(self):
+        return self.adjusted.shape[0]
+
+
+def score_block(refs, others, ref_rows, other_cols):
+    reference = refs.adjusted[ref_rows]
+    weights = refs.weights[ref_rows]
+    filled = others.filled[other_cols]
+    diff = reference[:, None, :] - filled[None, :, :]
+    if others.valid is None:
+        signed = (reference * weights).sum(axis=1)[:, None] - weights @ filled.T
+    else:
+        valid = others.valid[other_cols]
+        signed = (reference * weights) @ valid.T - weights @ filled.T
+        diff *= valid[None, :, :]
+    np.abs(diff, out=diff)
+    absolute = np.einsum('ijk,ik->ij', diff, weights)
+    return signed, absolute
+
+
+def fill(signed, absolute, refs, others, ref_rows, other_cols):
+    # ref_rows/other_cols are index arrays; blocks keep the temporary diff cube small
+    for i in range(0, len(ref_rows), BLOCK_REFS):
+        rows = ref_rows[i:i + BLOCK_REFS]
+        for j in range(0, len(other_cols), BLOCK_OTHERS):
+            cols = other_cols[j:j + BLOCK_OTHERS]
+            s, a = score_block(refs, others, rows, cols)
+            if len(cols) == signed.shape[1]:
+                signed[rows] = s
+                absolute[rows] = a
+            else:
+                signed[np.ix_(rows, cols)] = s
+                absolute[np.ix_(rows, cols)] = a
+
+
+class FitMatrix:
+    def __init__(self, name, ref_keys, other_keys, ref_inputs, other_inputs, signed, absolute, generation=0):
+        self.name = name
+        self.ref_keys = np.asarray(ref_keys)
+        self.other_keys = np.asarray(other_keys)
+        self.ref_inputs = ref_inputs
+        self.other_inputs = other_inputs
+        self.signed = signed
+        self.absolute = absolute
+        self.generation = generation
+        self.recomputed = (len(ref_keys), len(other_keys))
+
+    def row(self, i, cols=None):
+        if cols is None:
+            return np.asarray(self.signed[i], dtype=np.float64), np.asarray(self.absolute[i], dtype=np.float64)
+        return self.signed[i][cols].astype(np.float64), self.absolute[i][cols].astype(np.float64)
+
+    # -- persistence ---------------------------------------------------------
+    @staticmethod
+    def files(directory, name, generation):
+        prefix = os.path.join(directory, '{}.{}'.format(name, generation))
+        return {part: prefix + '.' + part + '.npy' for part in
+                ('signed', 'absolute', 'ref_keys', 'other_keys', 'ref_inputs', 'other_inputs')}
+
+    @classmethod
+    def open(cls, directory, name):
+        try:
+            with open(os.path.join(directory, name + '.json')) as f:
+                generation = json.load(f)['generation']
+            files = cls.files(directory, name, generation)
+            return cls(name, np.load(files['ref_keys']), np.load(files['other_keys']),
+                       np.load(files['ref_inputs']), np.load(files['other_inputs']),
+                       np.load(files['signed'], mmap_mode='r'), np.load(files['absolute'], mmap_mode='r'),
+                       generation)
+        except (OSError, ValueError, KeyError):
+            return None
+
+    @classmethod
+    def build(cls, name, ref_keys, refs, other_keys, others, other_inputs, directory=None, fill_blocks=fill):
+        # fill_blocks scores blocks of pairs, e.g. parallel.fill to use several processes
+        previous = cls.open(directory, name) if directory else None
+        ref_keys = np.asarray(ref_keys)
+        other_keys = np.asarray(other_keys)
+        shape = (len(ref_keys), len(other_keys))
+
+        ref_map = np.full(shape[0], -1)
+        other_map = np.full(shape[1], -1)
+        if previous is not None:
+            ref_map = pd.Index(previous.ref_keys).get_indexer(ref_keys)
+            other_map = pd.Index(previous.other_keys).get_indexer(other_keys)
+            known = ref_map >= 0
+            known[known] = same_rows(previous.ref_inputs[ref_map[known]], refs.inputs[known])
+            ref_map[~known] = -1
+            known = other_map >= 0
+            known[known] = same_rows(previous.other_inputs[other_map[known]], other_inputs[known])
+            other_map[~known] = -1
+        dirty_refs = np.flatnonzero(ref_map < 0)
+        dirty_others = np.flatnonzero(other_map < 0)
+
+        if previous is not None and previous.signed.shape == shape \
+                and np.array_equal(ref_map, np.arange(shape[0])) \
+                and np.array_equal(other_map, np.arange(shape[1])):
+            previous.recomputed = (0, 0)
+            return previous
+
+        generation = previous.generation + 1 if previous is not None else 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            files = cls.files(directory, name, generation)
+            signed = np.lib.format.open_memmap(files['signed'], mode='w+', dtype=np.float32, shape=shape)
+            absolute = np.lib.format.open_memmap(files['absolute'], mode='w+', dtype=np.float32, shape=shape)
+        else:
+            signed = np.empty(shape, dtype=np.float32)
+            absolute = np.empty(shape, dtype=np.float32)
+
+        # carry over every pair whose two sides are unchanged
+        clean_refs = np.flatnonzero(ref_map >= 0)
+        clean_others = np.flatnonzero(other_map >= 0)
+        if len(clean_refs) and len(clean_others):
+            old_cols = other_map[clean_others]
+            for i in range(0, len(clean_refs), BLOCK_REFS):
+                rows = clean_refs[i:i + BLOCK_REFS]
+                old_rows = ref_map[rows]
+                signed[np.ix_(rows, clean_others)] = previous.signed[old_rows][:, old_cols]
+                absolute[np.ix_(rows, clean_others)] = previous.absolute[old_rows][:, old_cols]
+
+        everything = np.arange(shape[1])
+        fill_blocks(signed, absolute, refs, others, dirty_refs, everything)
+        fill_blocks(signed, absolute, refs, others, clean_refs, dirty_others)
+
+        matrix = cls(name, ref_keys, other_keys, refs.inputs, other_inputs, signed, absolute, generation)
+        matrix.recomputed = (len(dirty_refs), len(dirty_others))
+        if directory:
+            matrix.save(directory, previous)
+        return matrix
+
+    def save(self, directory, previous=None):
+        files = self.files(directory, self.name, self.generation)
+        self.signed.flush()
+        self.absolute.flush()
+        np.save(files['ref_keys'], self.ref_keys)
+        np.save(files['other_keys'], self.other_keys)
+        np.save(files['ref_inputs'], self.ref_inputs)
+        np.save(files['other_inputs'], self.other_inputs)
+        manifest = os.path.join(directory, self.name + '.json')
+        with open(manifest + '.tmp', 'w') as f:
+            json.dump({'generation': self.generation, 'shape': list(self.signed.shape)}, f)
+        os.replace(manifest + '.tmp', manifest)
+        # open memory maps of the previous generation stay valid after the unlink
+        if previous is not None:
+            for path in self.files(directory, self.name, previous.generation).values():
+                if os.path.exists(path):
+                    os.remove(path)
+
+
+class FitMatrices:
+    # position: job signature x talent_pool employee (the "fill a position" tab)
+    # employee: talent employee x distinct position signature (the "find a position" tab)
+    def __init__(self, engine, talent_pool, talent, position_pool, directory=None, fill_blocks=fill):
+        self.engine = engine
+
+        signature_refs = References(engine.signature_grades, engine.signature_scores)
+        pool_ids = talent_pool['Unique ID'].to_numpy()[engine.pool_rows]
+        self.position = FitMatrix.build('position', occurrence_keys(engine.signature_index),
+                                        signature_refs, occurrence_keys(pool_ids), engine.pool,
+                                        np.column_stack([engine.pool.levels, engine.pool.adjusted]).astype(np.float32),
+                                        directory, fill_blocks)
+
+        # positions with the same pay band and job signature score identically, so they share a column
+        position_inputs = np.column_stack([position_pool['Job Profile Pay Band'].to_numpy(dtype=np.float32),
+                                           competency_matrix(position_pool)]).astype(np.float32)
+        first, self.position_columns = unique_rows(position_inputs)
+        columns = CompetencyMatrix(position_inputs[first, 0], position_inputs[first, 1:])
+        talent_refs = References(engine.talent_levels, engine.talent_scores)
+        self.employee = FitMatrix.build('employee', occurrence_keys(engine.talent_index),
+                                        talent_refs, content_keys(position_inputs[first]), columns,
+                                        position_inputs[first], directory, fill_blocks)
+
+    def position_scores(self, job_profile):
+        # scores of engine.pool_rows against the job signature
+        return self.position.row(unique_loc(self.engine.signature_index, job_profile))
+
+    def employee_scores(self, unique_id, rows=None):
+        # scores of position_pool rows (all by default) against the employee
+        cols = self.position_columns if rows is None else self.position_columns[rows]
+        return self.employee.row(unique_loc(self.engine.talent_index, unique_id), cols)
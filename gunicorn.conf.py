@@ -0,0 +1,22 @@
+import gc
+import multiprocessing
+import os
+
+
+# ------------------------------------------------------------------------------
+# gunicorn settings for serving wsgi:server with several workers
+# preload_app imports wsgi.py, and so loads the data, once in the master. The
+# workers are forked from it and share the loaded snapshot copy-on-write; the fit
+# matrices are memory-mapped files shared through the page cache. Run
+# prepare.py first so the master only reads the prepared snapshot.
+bind = os.environ.get('BIND', '0.0.0.0:8050')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+threads = int(os.environ.get('THREADS', 1))
+timeout = 120
+preload_app = True
+
+
+def pre_fork(server, worker):
+    # the collector would write to every object it scans and so copy its page into the
+    # worker; frozen objects are never scanned
+    gc.freeze()
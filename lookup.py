@@ -0,0 +1,59 @@
+import numpy as np
+
+
+# ------------------------------------------------------------------------------
+# Key indexes
+# Hash index from a key column (Position Key, Unique ID) to row positions, with
+# attributes of the first row per key pulled out as arrays. Built once per data
+# load so the callbacks do not scan the key column for every selection.
+NO_ROWS = np.empty(0, dtype=np.intp)
+
+
+class KeyIndex:
+    def __init__(self, df, key, attributes=()):
+        keys = df[key]
+        # every row per key, in frame order; rows with a missing key cannot be selected
+        self._rows = keys.groupby(keys, sort=False).indices
+        first = np.flatnonzero(~keys.duplicated().to_numpy() & keys.notna().to_numpy())
+        self._first = dict(zip(keys.to_numpy()[first], first))
+        self._attributes = {name: df[name].to_numpy() for name in attributes}
+
+    def __contains__(self, key):
+        return self._lookup(self._first, key) is not None
+
+    def __len__(self):
+        return len(self._first)
+
+    @staticmethod
+    def _lookup(table, key):
+        try:
+            return table.get(key)
+        except TypeError:
+            # unhashable selections match nothing
+            return None
+
+    def rows(self, key):
+        # positions of every row with the key, empty when there is none
+        rows = self._lookup(self._rows, key)
+        return NO_ROWS if rows is None else rows
+
+    def first(self, key):
+        # position of the first row with the key; KeyError when there is none
+        row = self._lookup(self._first, key)
+        if row is None:
+            raise KeyError(key)
+        return row
+
+    def get(self, key, attribute):
+        # an attribute of the first row with the key
+        return self._attributes[attribute][self.first(key)]
+
+
+class FrameRecords:
+    # rows of a frame by position, the columns the tables show; SqlRecords reads
+    # the same from a database instead
+    def __init__(self, df):
+        self.df = df
+
+    def take(self, rows, columns):
+        return self.df.iloc[rows][columns]
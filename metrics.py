@@ -0,0 +1,105 @@
+import cProfile
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+
+# ------------------------------------------------------------------------------
+# Stage metrics
+# Every stage of the loaders and callbacks is timed into a latency histogram and
+# the rows it produced are counted; /metrics serves both as Prometheus text.
+# Setting PROFILE_DIR also writes a cProfile dump of every callback slower than
+# PROFILE_SLOW_MS milliseconds to that directory, for snakeviz or pstats.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+PROFILE_DIR = os.environ.get('PROFILE_DIR')
+PROFILE_SLOW_MS = float(os.environ.get('PROFILE_SLOW_MS', 1000))
+
+
+class StageMetrics:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = np.asarray(buckets, dtype=float)
+        self.lock = threading.Lock()
+        self.stages = {}
+
+    def observe(self, name, seconds, rows=None):
+        with self.lock:
+            entry = self.stages.get(name)
+            if entry is None:
+                entry = self.stages[name] = {'buckets': np.zeros(len(self.buckets), dtype=np.int64),
+                                             'count': 0, 'sum': 0.0, 'rows': None}
+            entry['buckets'][np.searchsorted(self.buckets, seconds):] += 1
+            entry['count'] += 1
+            entry['sum'] += seconds
+            # rows stays None for stages that never report them, which are left out of the counter
+            if rows is not None:
+                entry['rows'] = (entry['rows'] or 0) + int(rows)
+
+    @contextmanager
+    def stage(self, name):
+        # the block may set info['rows'] to the number of rows it produced;
+        # stages that raise are not recorded
+        info = {}
+        start = time.perf_counter()
+        yield info
+        self.observe(name, time.perf_counter() - start, info.get('rows'))
+
+    def snapshot(self):
+        with self.lock:
+            return {name: dict(entry, buckets=entry['buckets'].copy()) for name, entry in self.stages.items()}
+
+    def render(self, prefix='succession'):
+        lines = ['# HELP {}_stage_seconds Time spent in each loading and callback stage.'.format(prefix),
+                 '# TYPE {}_stage_seconds histogram'.format(prefix)]
+        stages = sorted(self.snapshot().items())
+        for name, entry in stages:
+            for le, count in zip(self.buckets, entry['buckets']):
+                lines.append('{}_stage_seconds_bucket{{stage="{}",le="{:g}"}} {}'.format(prefix, name, le, count))
+            lines.append('{}_stage_seconds_bucket{{stage="{}",le="+Inf"}} {}'.format(prefix, name, entry['count']))
+            lines.append('{}_stage_seconds_sum{{stage="{}"}} {!r}'.format(prefix, name, entry['sum']))
+            lines.append('{}_stage_seconds_count{{stage="{}"}} {}'.format(prefix, name, entry['count']))
+        lines += ['# HELP {}_stage_rows_total Rows produced by each stage.'.format(prefix),
+                  '# TYPE {}_stage_rows_total counter'.format(prefix)]
+        for name, entry in stages:
+            if entry['rows'] is None:
+                continue
+            lines.append('{}_stage_rows_total{{stage="{}"}} {}'.format(prefix, name, entry['rows']))
+        return '\n'.join(lines) + '\n'
+
+
+METRICS = StageMetrics()
+
+
+def timed(name):
+    return METRICS.stage(name)
+
+
+@contextmanager
+def profiled(name, directory=None, slow_ms=None):
+    # profiles the block and keeps the profile only when it was slow
+    directory = PROFILE_DIR if directory is None else directory
+    slow_ms = PROFILE_SLOW_MS if slow_ms is None else slow_ms
+    if not directory:
+        yield
+        return
+    profile = cProfile.Profile()
+    start = time.perf_counter()
+    try:
+        profile.enable()
+    except ValueError:
+        # another profiler is already running in this thread
+        yield
+        return
+    try:
+        yield
+    finally:
+        profile.disable()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if elapsed_ms >= slow_ms:
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, '{}-{}-{}-{}-{}ms.prof'.format(
+                name, time.strftime('%Y%m%d-%H%M%S'), os.getpid(), threading.get_ident(), int(elapsed_ms)))
+            profile.dump_stats(path)
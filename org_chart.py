@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+from lookup import NO_ROWS, KeyIndex
+
+
+# ------------------------------------------------------------------------------
+# Reporting graph
+# The seats of target (one per row) with their incumbent (Unique ID, missing for a
+# vacant seat) and the manager they report to (Manager Unique ID). Built once per
+# data load: the seats of an employee and the seats reporting to a manager are
+# looked up through key indexes, and a team is found a reporting level at a time.
+def employee_id(value):
+    # Unique IDs read from a column with missing values come back as floats
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        return int(value)
+    return value.item() if isinstance(value, np.generic) else value
+
+
+class OrgChart:
+    def __init__(self, target):
+        self.keys = target['Position Key'].to_numpy()
+        self.holders = target['Unique ID'].to_numpy()
+        self.managers = target['Manager Unique ID'].to_numpy()
+        self.by_key = KeyIndex(target, 'Position Key')
+        self.by_holder = KeyIndex(target, 'Unique ID')
+        self.by_manager = KeyIndex(target, 'Manager Unique ID')
+
+    def __len__(self):
+        return len(self.keys)
+
+    def seats(self, employee):
+        # Position Keys held by the employee
+        return list(dict.fromkeys(self.keys[self.by_holder.rows(employee)].tolist()))
+
+    def holders_of(self, position):
+        # Unique IDs of the current incumbents of the seat
+        holders = self.holders[self.by_key.rows(position)]
+        return [employee_id(h) for h in pd.unique(holders[pd.notna(holders)])]
+
+    def manager(self, position):
+        # Unique ID the seat reports to, None when it is not known
+        managers = self.managers[self.by_key.rows(position)]
+        managers = managers[pd.notna(managers)]
+        return employee_id(managers[0]) if len(managers) else None
+
+    def team(self, employee):
+        # Unique IDs of everyone reporting to the employee, directly or through their managers;
+        # every seat is visited once, so a cycle in the reporting lines ends the walk
+        visited = np.zeros(len(self.keys), dtype=bool)
+        frontier = [employee]
+        while len(frontier):
+            rows = np.concatenate([self.by_manager.rows(manager) for manager in frontier] + [NO_ROWS])
+            rows = rows[~visited[rows]]
+            visited[rows] = True
+            holders = self.holders[rows]
+            frontier = pd.unique(holders[pd.notna(holders)])
+        team = self.holders[visited]
+        return pd.unique(team[pd.notna(team)])
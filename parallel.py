@@ -0,0 +1,137 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+from types import SimpleNamespace
+
+import numpy as np
+
+import fit_matrix
+
+
+# ------------------------------------------------------------------------------
+# Parallel scoring
+# The reference and candidate competency arrays are copied into shared memory once;
+# worker processes attach to them by name and score whole blocks of references into
+# shared output arrays. Tasks are block offsets, so nothing but integers is
+# pickled. Blocks have the same shape as in fit_matrix.fill, so the scores are the
+# same as on the single-process path.
+BLAS_THREAD_VARIABLES = ['OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS']
+
+# below this many reference x candidate pairs starting the workers costs more than it saves
+PARALLEL_MIN_PAIRS = 50000000
+
+
+def default_workers():
+    return int(os.environ.get('SCORING_WORKERS', 1))
+
+
+class SharedArrays:
+    # numpy arrays copied into named shared memory blocks
+    def __init__(self, arrays):
+        self.blocks = []
+        self.specs = {}
+        self.arrays = {}
+        for name, array in arrays.items():
+            if array is None:
+                self.specs[name] = None
+                continue
+            block = SharedMemory(create=True, size=max(array.nbytes, 1))
+            self.blocks.append(block)
+            view = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+            view[...] = array
+            self.arrays[name] = view
+            self.specs[name] = (block.name, array.shape, array.dtype.str)
+
+    def close(self):
+        self.arrays = {}
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+
+# -- worker side -------------------------------------------------------------
+_blocks = []
+_arrays = {}
+
+
+def _attach(specs):
+    for name, spec in specs.items():
+        if spec is None:
+            _arrays[name] = None
+            continue
+        block_name, shape, dtype = spec
+        block = SharedMemory(name=block_name)
+        _blocks.append(block)
+        _arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+
+
+def _score_refs(start):
+    # one block of references against every block of candidates
+    refs = SimpleNamespace(adjusted=_arrays['ref_adjusted'], weights=_arrays['ref_weights'])
+    others = SimpleNamespace(filled=_arrays['filled'], valid=_arrays['valid'])
+    ref_rows = _arrays['ref_rows'][start:start + fit_matrix.BLOCK_REFS]
+    other_cols = _arrays['other_cols']
+    for j in range(0, len(other_cols), fit_matrix.BLOCK_OTHERS):
+        s, a = fit_matrix.score_block(refs, others, ref_rows, other_cols[j:j + fit_matrix.BLOCK_OTHERS])
+        _arrays['signed'][start:start + len(ref_rows), j:j + s.shape[1]] = s
+        _arrays['absolute'][start:start + len(ref_rows), j:j + s.shape[1]] = a
+    return start
+
+
+# -- parent side -------------------------------------------------------------
+@contextmanager
+def single_threaded_blas():
+    # worker processes inherit this, so N workers use N cores instead of N x BLAS threads
+    saved = {name: os.environ.get(name) for name in BLAS_THREAD_VARIABLES}
+    os.environ.update({name: '1' for name in BLAS_THREAD_VARIABLES})
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def parallel_fill(signed, absolute, refs, others, ref_rows, other_cols, workers):
+    # same result as fit_matrix.fill, computed by a pool of worker processes
+    if len(ref_rows) == 0 or len(other_cols) == 0:
+        return
+    shared = SharedArrays({
+        'ref_adjusted': refs.adjusted, 'ref_weights': refs.weights,
+        'filled': others.filled, 'valid': others.valid,
+        'ref_rows': np.asarray(ref_rows), 'other_cols': np.asarray(other_cols),
+        'signed': np.empty((len(ref_rows), len(other_cols)), dtype=np.float32),
+        'absolute': np.empty((len(ref_rows), len(other_cols)), dtype=np.float32),
+    })
+    try:
+        starts = range(0, len(ref_rows), fit_matrix.BLOCK_REFS)
+        chunksize = max(1, len(starts) // (workers * 8))
+        with single_threaded_blas(), ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn'),
+                                                         initializer=_attach, initargs=(shared.specs,)) as pool:
+            for _ in pool.map(_score_refs, starts, chunksize=chunksize):
+                pass
+        # copy the results out block by block so the fancy-indexed temporaries stay small
+        for i in starts:
+            rows = ref_rows[i:i + fit_matrix.BLOCK_REFS]
+            if len(other_cols) == signed.shape[1]:
+                signed[rows] = shared.arrays['signed'][i:i + len(rows)]
+                absolute[rows] = shared.arrays['absolute'][i:i + len(rows)]
+            else:
+                signed[np.ix_(rows, other_cols)] = shared.arrays['signed'][i:i + len(rows)]
+                absolute[np.ix_(rows, other_cols)] = shared.arrays['absolute'][i:i + len(rows)]
+    finally:
+        shared.close()
+
+
+def fill(signed, absolute, refs, others, ref_rows, other_cols, workers=None):
+    # fit_matrix.fill, spread over worker processes when the job is big enough
+    workers = default_workers() if workers is None else workers
+    if workers > 1 and len(ref_rows) * len(other_cols) >= PARALLEL_MIN_PAIRS:
+        parallel_fill(signed, absolute, refs, others, ref_rows, other_cols, workers)
+    else:
+        fit_matrix.fill(signed, absolute, refs, others, ref_rows, other_cols)
@@ -0,0 +1,32 @@
+import argparse
+import sys
+
+from data_loader import DataStore
+from storage import BACKENDS
+
+
+# ------------------------------------------------------------------------------
+# Prepare the data snapshot
+# Parses and cleans the workbooks, scores the fit matrices and writes the database
+# of a SQL storage backend into .snapshot/ once, ahead of a deployment, so the
+# server (or every worker of it) starts by reading the snapshot and memory-mapping
+# the fit matrices instead of parsing Excel.
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build the data snapshot and fit matrices of a workbook directory.')
+    parser.add_argument('data_dir', nargs='?', default='.', help='directory with the source workbooks')
+    parser.add_argument('--workers', type=int, help='processes for scoring the fit matrices (default: $SCORING_WORKERS or 1)')
+    parser.add_argument('--backend', choices=BACKENDS, help='storage backend (default: $STORAGE_BACKEND or memory)')
+    args = parser.parse_args(argv)
+
+    store = DataStore(args.data_dir, args.workers, args.backend).load()
+    status = store.status()
+    if status['status'] != 'ready':
+        parser.exit(1, "Preparing the data failed: {}\n".format(status['progress'].get('error')))
+    data = store.get()
+    print("Prepared snapshot {} in {:.1f}s: {} positions, {} employees, {:.1f} MB of frames".format(
+        data.version, status['elapsed_seconds'], len(data.position_list), len(data.employee_list),
+        data.memory['After (MB)'].iloc[-1]), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
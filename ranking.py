@@ -0,0 +1,21 @@
+import numpy as np
+
+
+# ------------------------------------------------------------------------------
+# Top-K selection
+def top_k_indices(scores, k=None, descending=False):
+    # Positions of the k best scores, best first. Ties keep their original order.
+    # np.partition finds the k-th score in linear time, so only k scores get sorted.
+    scores = np.asarray(scores, dtype=np.float64)
+    if descending:
+        scores = -scores
+    n = len(scores)
+    if k is None or k >= n:
+        return np.argsort(scores, kind='stable')
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    kth = np.partition(scores, k - 1)[k - 1]
+    better = np.flatnonzero(scores < kth)
+    ties = np.flatnonzero(scores == kth)[:k - len(better)]
+    chosen = np.sort(np.concatenate([better, ties]))
+    return chosen[np.argsort(scores[chosen], kind='stable')]
@@ -0,0 +1,78 @@
+import json
+import os
+
+import numpy as np
+
+
+# ------------------------------------------------------------------------------
+# Readiness rules
+# readiness_rules.json gives, per tab and time scale, the range of employee levels
+# that are ready for a pay band ("employee") or the range of pay bands an employee
+# level is ready for ("position"). A range is either relative to the key or read
+# from a table; keys missing from a table put no constraint on the other side.
+RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'readiness_rules.json')
+
+
+class IntervalTable:
+    def __init__(self, spec):
+        self.relative = spec.get('relative')
+        table = sorted((float(key), limits) for key, limits in spec.get('table', {}).items())
+        self.keys = np.array([key for key, _ in table], dtype=np.float64)
+        self.low = np.array([limits[0] for _, limits in table], dtype=np.float64)
+        self.high = np.array([limits[1] for _, limits in table], dtype=np.float64)
+
+    def limits(self, keys):
+        # lowest and highest allowed value for every key, -inf/inf when unconstrained
+        keys = np.asarray(keys, dtype=np.float64)
+        if self.relative is not None:
+            return keys + self.relative[0], keys + self.relative[1]
+        low = np.full(keys.shape, -np.inf)
+        high = np.full(keys.shape, np.inf)
+        if len(self.keys):
+            i = np.searchsorted(self.keys, keys).clip(max=len(self.keys) - 1)
+            found = self.keys[i] == keys
+            low[found] = self.low[i[found]]
+            high[found] = self.high[i[found]]
+        return low, high
+
+
+class ReadinessRules:
+    def __init__(self, rules):
+        self.tables = {tab: {time_scale: IntervalTable(spec) for time_scale, spec in scales.items()}
+                       for tab, scales in rules.items()}
+
+    @classmethod
+    def load(cls, path=RULES_FILE):
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def limits(self, tab, time_scale, keys):
+        table = self.tables[tab].get(time_scale)
+        if table is None:
+            keys = np.asarray(keys, dtype=np.float64)
+            return np.full(keys.shape, -np.inf), np.full(keys.shape, np.inf)
+        return table.limits(keys)
+
+    def range(self, tab, time_scale, key):
+        # (low, high) for one key, or None when the time scale puts no constraint on it
+        low, high = self.limits(tab, time_scale, [key])
+        if low[0] == -np.inf and high[0] == np.inf:
+            return None
+        return low[0], high[0]
+
+    # -- batch ---------------------------------------------------------------
+    def masks(self, tab, time_scale, keys, values):
+        # keys x values matrix: is the value ready for the key (e.g. every pay band x every employee level)
+        low, high = self.limits(tab, time_scale, keys)
+        values = np.asarray(values, dtype=np.float64)
+        unconstrained = (low == -np.inf) & (high == np.inf)
+        return ((values >= low[:, None]) & (values <= high[:, None])) | unconstrained[:, None]
+
+    def counts(self, tab, time_scale, keys, values):
+        # number of ready values per key, without building the matrix
+        low, high = self.limits(tab, time_scale, keys)
+        values = np.asarray(values, dtype=np.float64)
+        ordered = np.sort(values[~np.isnan(values)])
+        counts = np.searchsorted(ordered, high, side='right') - np.searchsorted(ordered, low, side='left')
+        counts = np.where(np.isnan(low) | np.isnan(high), 0, counts.clip(min=0))
+        return np.where((low == -np.inf) & (high == np.inf), len(values), counts)
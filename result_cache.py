@@ -0,0 +1,101 @@
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+# ------------------------------------------------------------------------------
+# Scored results cache
+# Bounded LRU cache keyed by (selection, data snapshot version). When a lookup
+# arrives with a new snapshot version, every entry of the old versions is dropped.
+# Replaced versions are retired: requests still running on an old snapshot are
+# computed without touching the cache.
+def result_size(value):
+    # approximate memory held by a cached result
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(result_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    def __init__(self, max_entries=256, max_bytes=256 * 2 ** 20):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.version = None
+        self._retired = set()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key, version, compute):
+        with self._lock:
+            if version != self.version and version not in self._retired:
+                self._invalidate(version)
+            entry = self._entries.get(key) if version == self.version else None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        # computed outside the lock; two requests for the same key may both compute it
+        value = compute()
+        size = result_size(value)
+        with self._lock:
+            if version == self.version and size <= self.max_bytes:
+                old = self._entries.pop(key, None)
+                if old is not None:
+                    self.bytes -= old[1]
+                self._entries[key] = (value, size)
+                self.bytes += size
+                self._evict()
+        return value
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self.bytes > self.max_bytes):
+            _, (_, size) = self._entries.popitem(last=False)
+            self.bytes -= size
+            self.evictions += 1
+
+    def _invalidate(self, version):
+        if self.version is not None:
+            self._retired.add(self.version)
+        self._retired.discard(version)
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+        self.bytes = 0
+        self.version = version
+
+    def invalidate(self, version=None):
+        with self._lock:
+            self._invalidate(version)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'version': self.version,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
@@ -0,0 +1,170 @@
+import numpy as np
+
+from ranking import top_k_indices
+
+
+# ------------------------------------------------------------------------------
+# Similar talent
+# The k employees nearest to a reference employee by weighted L1 distance,
+# sum(weights * |reference - adjusted|) over the 14 level-adjusted competencies,
+# the absolute weighted difference of the fit scores. The weights belong to the
+# reference (importance_weights of its own scores) and so change with every query;
+# a KD-tree bounds the distance of a whole node from its bounding box for any
+# weights, which lets one tree answer them all. Negative weights (the adjusted
+# scores of low-level employees can be below zero) count as zero: with them a
+# farther row could score a smaller distance, and a distance below zero. Ties are
+# broken by row, nearest first, exactly as a full scan would.
+LEAF_SIZE = 64
+
+# sets this small, and rows with missing scores, are scanned instead: a numpy scan of
+# up to about this many rows is faster than walking the tree
+BRUTE_FORCE_ROWS = 50000
+
+
+class KDTree:
+    # Points are split at the median of their widest dimension until at most
+    # leaf_size are left; every node keeps the bounding box of its points.
+    def __init__(self, points, rows, leaf_size=LEAF_SIZE):
+        points = np.asarray(points, dtype=np.float64)
+        self.leaf_size = leaf_size
+        self.order = np.arange(len(points))
+        nodes = {'lower': [], 'upper': [], 'start': [], 'end': [], 'left': [], 'right': []}
+        if len(points):
+            self._build(nodes, points, 0, len(points))
+        self.lower = np.array(nodes['lower']).reshape(-1, points.shape[1])
+        self.upper = np.array(nodes['upper']).reshape(-1, points.shape[1])
+        self.start, self.end, self.left, self.right = (np.array(nodes[name], dtype=np.intp)
+                                                       for name in ('start', 'end', 'left', 'right'))
+        # the points of a node are the slice start:end
+        self.points = points[self.order]
+        self.rows = np.asarray(rows)[self.order]
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _build(self, nodes, points, start, end):
+        node = len(nodes['start'])
+        rows = self.order[start:end]
+        lower, upper = points[rows].min(axis=0), points[rows].max(axis=0)
+        for name, value in [('lower', lower), ('upper', upper), ('start', start), ('end', end), ('left', -1), ('right', -1)]:
+            nodes[name].append(value)
+        dim = np.argmax(upper - lower)
+        # a node of identical points stays a leaf whatever its size
+        if end - start > self.leaf_size and upper[dim] > lower[dim]:
+            mid = (start + end) // 2
+            self.order[start:end] = rows[np.argpartition(points[rows, dim], mid - start)]
+            nodes['left'][node] = self._build(nodes, points, start, mid)
+            nodes['right'][node] = self._build(nodes, points, mid, end)
+        return node
+
+    def bounds(self, nodes, reference, weights):
+        # the smallest distance any point of each node can have, for weights >= 0
+        below = self.lower[nodes] - reference
+        above = reference - self.upper[nodes]
+        return np.maximum(np.maximum(below, above), 0) @ weights
+
+    def scan(self, points, reference, weights, exclude):
+        rows = self.rows[points]
+        distances = np.abs(self.points[points] - reference) @ weights
+        if len(exclude):
+            keep = ~np.isin(rows, exclude)
+            rows, distances = rows[keep], distances[keep]
+        return rows, distances
+
+    def query(self, reference, weights, k, exclude=()):
+        # Rows and distances of the k nearest points, leaving out the rows in exclude.
+        # The nodes are visited a level at a time, so the work per query is a few
+        # array operations per level plus the leaves that cannot be ruled out.
+        exclude = np.asarray(exclude)
+        if not len(self) or k <= 0:
+            return self.rows[:0], np.empty(0)
+
+        # the k-th distance within the nearest node that still holds k points bounds the answer
+        node = 0
+        while self.left[node] >= 0:
+            children = np.array([self.left[node], self.right[node]])
+            child = children[np.argmin(self.bounds(children, reference, weights))]
+            if self.end[child] - self.start[child] < k + len(exclude):
+                break
+            node = child
+        first = slice(self.start[node], self.end[node])
+        best_rows, best = self.scan(first, reference, weights, exclude)
+        order = np.lexsort((best_rows, best))[:k]
+        best_rows, best = best_rows[order], best[order]
+        kth = best[-1] if len(best) == k else np.inf
+
+        # every other leaf whose box is not farther than that; nodes within the scanned one are done
+        nodes, leaves, leaf_bounds = np.array([0]), [], []
+        while len(nodes):
+            bounds = self.bounds(nodes, reference, weights)
+            scanned = (self.start[nodes] >= first.start) & (self.end[nodes] <= first.stop)
+            keep = (bounds <= kth) & ~scanned
+            nodes, bounds = nodes[keep], bounds[keep]
+            leaf = self.left[nodes] < 0
+            leaves.append(nodes[leaf])
+            leaf_bounds.append(bounds[leaf])
+            inner = nodes[~leaf]
+            nodes = np.concatenate([self.left[inner], self.right[inner]])
+        leaf_bounds = np.concatenate(leaf_bounds)
+        order = np.argsort(leaf_bounds, kind='stable')
+        leaves, leaf_bounds = np.concatenate(leaves)[order], leaf_bounds[order]
+
+        # nearest leaves first, in batches that double in size, until the next one is too far
+        done, batch = 0, 1
+        while done < len(leaves) and leaf_bounds[done] <= kth:
+            chosen = leaves[done:done + batch]
+            points = np.concatenate([np.arange(self.start[leaf], self.end[leaf]) for leaf in chosen])
+            rows, distances = self.scan(points, reference, weights, exclude)
+            best_rows = np.concatenate([best_rows, rows])
+            best = np.concatenate([best, distances])
+            order = np.lexsort((best_rows, best))[:k]
+            best_rows, best = best_rows[order], best[order]
+            if len(best) == k:
+                kth = best[-1]
+            done += len(chosen)
+            batch *= 2
+        return best_rows, best
+
+
+class SimilarityIndex:
+    # rows (all by default) of a matrix of level-adjusted competencies; missing
+    # scores contribute nothing to a distance, as in the fit scores
+    def __init__(self, adjusted, rows=None, leaf_size=LEAF_SIZE, brute_force_rows=BRUTE_FORCE_ROWS):
+        adjusted = np.asarray(adjusted, dtype=np.float64)
+        rows = np.arange(len(adjusted)) if rows is None else np.asarray(rows)
+        complete = ~np.isnan(adjusted[rows]).any(axis=1)
+        self.tree = None
+        if complete.sum() > brute_force_rows:
+            self.tree = KDTree(adjusted[rows[complete]], rows[complete], leaf_size)
+            rows = rows[~complete]
+        self.rows = rows
+        self.valid = ~np.isnan(adjusted[rows])
+        self.filled = np.where(self.valid, adjusted[rows], 0)
+
+    def __len__(self):
+        return len(self.rows) + (len(self.tree) if self.tree is not None else 0)
+
+    def brute_force(self, reference, weights, k, exclude=()):
+        # the scanned rows, nearest first
+        distances = (np.abs(reference - self.filled) * self.valid) @ weights
+        keep = ~np.isin(self.rows, exclude)
+        rows, distances = self.rows[keep], distances[keep]
+        order = top_k_indices(distances, k)
+        return rows[order], distances[order]
+
+    def nearest(self, reference, weights=None, k=10, exclude=()):
+        # Rows and distances of the k nearest rows, nearest first. weights=None is
+        # plain L1; unknown reference scores or weights and negative weights count nothing.
+        reference = np.asarray(reference, dtype=np.float64)
+        weights = np.ones(len(reference)) if weights is None else np.asarray(weights, dtype=np.float64)
+        unknown = np.isnan(reference) | np.isnan(weights)
+        reference = np.where(unknown, 0, reference)
+        weights = np.where(unknown, 0, np.maximum(weights, 0))
+        rows, distances = self.brute_force(reference, weights, k, exclude)
+        if self.tree is not None:
+            tree_rows, tree_distances = self.tree.query(reference, weights, k, exclude)
+            rows = np.concatenate([rows, tree_rows])
+            distances = np.concatenate([distances, tree_distances])
+            order = np.lexsort((rows, distances))[:k]
+            rows, distances = rows[order], distances[order]
+        return rows, distances
@@ -0,0 +1,138 @@
+import hashlib
+import importlib.util
+import json
+import os
+import pickle
+
+import pandas as pd
+
+# pandas reads and writes Parquet through pyarrow, which is never imported here
+HAS_PARQUET = importlib.util.find_spec('pyarrow') is not None
+
+
+# ------------------------------------------------------------------------------
+# On-disk snapshot of the cleaned frames.
+# The manifest records size, mtime and sha256 of every source workbook; the
+# snapshot is reused as long as the workbooks are unchanged and rebuilt otherwise.
+CACHE_FORMAT_VERSION = 3
+MANIFEST = 'manifest.json'
+
+
+def file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_stats(paths):
+    stats = {}
+    for name, path in paths.items():
+        st = os.stat(path)
+        stats[name] = {'path': os.path.abspath(path), 'size': st.st_size, 'mtime': st.st_mtime}
+    return stats
+
+
+def read_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, MANIFEST)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('version') != CACHE_FORMAT_VERSION:
+        return None
+    return manifest
+
+
+def is_fresh(manifest, stats):
+    # size and mtime decide quickly; only files whose stat changed get hashed,
+    # so touching or copying a workbook does not force a rebuild
+    cached = manifest['sources']
+    if set(cached) != set(stats):
+        return False
+    for name, st in stats.items():
+        old = cached[name]
+        if old['path'] != st['path'] or old['size'] != st['size']:
+            return False
+        if old['mtime'] != st['mtime']:
+            if file_hash(st['path']) != old['sha256']:
+                return False
+            old['mtime'] = st['mtime']
+    return True
+
+
+def write_frame(df, cache_dir, name):
+    if HAS_PARQUET:
+        path = os.path.join(cache_dir, name + '.parquet')
+        try:
+            df.to_parquet(path + '.tmp', engine='pyarrow')
+            os.replace(path + '.tmp', path)
+            return 'parquet'
+        except Exception:
+            # mixed-type object columns cannot be stored as arrow, keep them pickled
+            if os.path.exists(path + '.tmp'):
+                os.remove(path + '.tmp')
+    path = os.path.join(cache_dir, name + '.pkl')
+    df.to_pickle(path + '.tmp', protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(path + '.tmp', path)
+    return 'pickle'
+
+
+def read_frame(cache_dir, name, fmt):
+    if fmt == 'parquet':
+        return pd.read_parquet(os.path.join(cache_dir, name + '.parquet'), engine='pyarrow')
+    return pd.read_pickle(os.path.join(cache_dir, name + '.pkl'))
+
+
+def write_snapshot(cache_dir, frames, stats):
+    os.makedirs(cache_dir, exist_ok=True)
+    formats = {name: write_frame(df, cache_dir, name) for name, df in frames.items()}
+    # the manifest is written last, so a half-written snapshot is never picked up
+    write_manifest(cache_dir, {'version': CACHE_FORMAT_VERSION, 'sources': stats, 'frames': formats})
+
+
+def write_manifest(cache_dir, manifest):
+    path = os.path.join(cache_dir, MANIFEST)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(path + '.tmp', path)
+
+
+def snapshot_version(sources):
+    # identifies the data: the same workbooks always give the same version
+    digest = hashlib.sha256()
+    for name in sorted(sources):
+        digest.update('{}={};'.format(name, sources[name]['sha256']).encode())
+    return '{}-{}'.format(CACHE_FORMAT_VERSION, digest.hexdigest()[:16])
+
+
+def load_snapshot(paths, cache_dir, build):
+    # paths: frame name -> source workbook, build: callable returning the cleaned frames
+    # returns the frames and their snapshot version
+    stats = source_stats(paths)
+    manifest = read_manifest(cache_dir)
+    if manifest is not None:
+        mtimes = {name: src['mtime'] for name, src in manifest['sources'].items()}
+        if is_fresh(manifest, stats):
+            try:
+                frames = {name: read_frame(cache_dir, name, fmt) for name, fmt in manifest['frames'].items()}
+            except (OSError, ValueError):
+                frames = None
+            if frames is not None:
+                if any(mtimes[name] != src['mtime'] for name, src in manifest['sources'].items()):
+                    try:
+                        write_manifest(cache_dir, manifest)
+                    except OSError:
+                        pass
+                return frames, snapshot_version(manifest['sources'])
+    # hash before building so a workbook edited mid-build is not recorded as current
+    for st in stats.values():
+        st['sha256'] = file_hash(st['path'])
+    frames = build()
+    try:
+        write_snapshot(cache_dir, frames, stats)
+    except OSError:
+        # a read-only data directory only costs us the speed-up
+        pass
+    return frames, snapshot_version(stats)
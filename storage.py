@@ -0,0 +1,224 @@
+import os
+import sqlite3
+import threading
+from urllib.request import pathname2url
+
+import numpy as np
+import pandas as pd
+
+try:
+    import duckdb
+    HAS_DUCKDB = True
+except ImportError:
+    HAS_DUCKDB = False
+
+
+# ------------------------------------------------------------------------------
+# SQL storage
+# With STORAGE_BACKEND=sqlite (or duckdb, when installed) the tables of a data
+# snapshot are also written to one embedded database file per snapshot version,
+# indexed on the columns the app selects and filters by. The readiness and
+# preference filters then run in the database as a WHERE clause and only the row
+# numbers of the matching rows come back; 'memory' keeps the bitset FilterIndex.
+# The rows a table shows are read from the database too (SqlRecords), so the
+# snapshot drops the frames once the scores and indexes are built from them.
+BACKENDS = ['memory', 'sqlite', 'duckdb']
+EXTENSIONS = {'sqlite': '.sqlite', 'duckdb': '.duckdb'}
+
+INDEXED_COLUMNS = ['Unique ID', 'Position Key', 'Function', 'Location', 'Employee Level', 'Job Profile Pay Band']
+
+# position of every row in its frame, the primary key of the tables
+ROW = '_row'
+
+
+def quote(name):
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+def sql_value(value):
+    # database drivers bind plain Python values only
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def sql_frame(df):
+    # categoricals as their values and float16 (which neither database knows) as float32
+    df = pd.DataFrame({column: values.astype(object) if isinstance(values.dtype, pd.CategoricalDtype)
+                       else values.astype(np.float32) if values.dtype == np.float16 else values
+                       for column, values in df.items()})
+    df.insert(0, ROW, np.arange(len(df)))
+    return df
+
+
+def restored(values, dtype):
+    # values read back from a database in the dtype of the frame column they were written from
+    if isinstance(dtype, pd.CategoricalDtype):
+        return pd.Categorical(values, dtype=dtype)
+    return pd.Series(values, dtype=object).astype(dtype).array
+
+
+def write_sqlite(path, tables):
+    con = sqlite3.connect(path)
+    try:
+        for name, df in tables.items():
+            sql_frame(df).to_sql(name, con, index=False, dtype={ROW: 'INTEGER PRIMARY KEY'}, chunksize=10000)
+            create_indexes(con, name, df.columns)
+        con.commit()
+    finally:
+        con.close()
+
+
+def write_duckdb(path, tables):
+    con = duckdb.connect(path)
+    try:
+        for name, df in tables.items():
+            con.register('frame', sql_frame(df))
+            con.execute('CREATE TABLE {} AS SELECT * FROM frame'.format(quote(name)))
+            con.unregister('frame')
+            create_indexes(con, name, df.columns)
+    finally:
+        con.close()
+
+
+def create_indexes(con, table, columns):
+    for column in INDEXED_COLUMNS:
+        if column in columns:
+            index = 'ix_{}_{}'.format(table, column.replace(' ', '_').lower())
+            con.execute('CREATE INDEX {} ON {} ({})'.format(quote(index), quote(table), quote(column)))
+
+
+def connect(path, backend):
+    if backend == 'duckdb':
+        return duckdb.connect(path, read_only=True)
+    return sqlite3.connect('file:{}?mode=ro'.format(pathname2url(os.path.abspath(path))), uri=True,
+                           check_same_thread=False)
+
+
+class Condition:
+    # a WHERE clause and its parameters; & combines two of them like two filter bitsets
+    def __init__(self, sql='1', params=()):
+        self.sql = sql
+        self.params = list(params)
+
+    def __and__(self, other):
+        return Condition('({}) AND ({})'.format(self.sql, other.sql), self.params + other.params)
+
+
+class SqlStorage:
+    # One database file per snapshot version, written once and then only read. The
+    # file of a version is kept across restarts and shared by every worker process.
+    def __init__(self, path, backend='sqlite'):
+        self.path = path
+        self.backend = backend
+        self.pid = None
+        self.connection()
+
+    @classmethod
+    def build(cls, directory, version, tables, backend='sqlite'):
+        if backend not in EXTENSIONS:
+            raise ValueError('unknown storage backend {!r}, expected one of {}'.format(backend, BACKENDS))
+        if backend == 'duckdb' and not HAS_DUCKDB:
+            raise ImportError('the duckdb storage backend needs the duckdb package')
+        file = version + EXTENSIONS[backend]
+        path = os.path.join(directory, file)
+        if not os.path.exists(path):
+            os.makedirs(directory, exist_ok=True)
+            if os.path.exists(path + '.tmp'):
+                os.remove(path + '.tmp')
+            (write_duckdb if backend == 'duckdb' else write_sqlite)(path + '.tmp', tables)
+            os.replace(path + '.tmp', path)
+            # databases of older versions; connections already open on them stay valid after the unlink
+            for name in os.listdir(directory):
+                if name != file and name.endswith(EXTENSIONS[backend]):
+                    try:
+                        os.remove(os.path.join(directory, name))
+                    except OSError:
+                        pass
+        return cls(path, backend)
+
+    def connection(self):
+        # a connection does not survive a fork, so every process opens its own
+        if self.pid != os.getpid():
+            self.con = connect(self.path, self.backend)
+            self.lock = threading.Lock()
+            self.pid = os.getpid()
+        return self.con
+
+    def query(self, sql, params=()):
+        con = self.connection()
+        with self.lock:
+            return con.execute(sql, [sql_value(p) for p in params]).fetchall()
+
+    def select_rows(self, table, condition):
+        # row numbers of table where condition holds
+        rows = self.query('SELECT {} FROM {} WHERE {}'.format(ROW, quote(table), condition.sql), condition.params)
+        return np.fromiter((row for row, in rows), dtype=np.intp, count=len(rows))
+
+    def select_records(self, table, columns, rows=None):
+        # the row number and columns of the given rows (all of them for None), in no particular order
+        sql = 'SELECT {} FROM {}'.format(', '.join(quote(column) for column in [ROW] + columns), quote(table))
+        if rows is not None:
+            # row numbers are integers, written into the statement instead of binding one parameter each
+            sql += ' WHERE {} IN ({})'.format(ROW, ', '.join(str(int(row)) for row in rows))
+        return self.query(sql)
+
+
+class SqlFilterIndex:
+    # The FilterIndex interface over a table of a SqlStorage: the filters build a
+    # Condition instead of a bitset and mask() runs it in the database.
+    def __init__(self, storage, table, df):
+        self.storage = storage
+        self.table = table
+        self.index = df.index
+        self.size = len(df)
+
+    def everything(self):
+        return Condition()
+
+    def isin(self, column, values):
+        values = list(values)
+        present = [value for value in values if not pd.isna(value)]
+        parts = []
+        if present:
+            parts.append('{} IN ({})'.format(quote(column), ', '.join('?' * len(present))))
+        if len(present) < len(values):
+            parts.append('{} IS NULL'.format(quote(column)))
+        return Condition(' OR '.join(parts) or '0', present)
+
+    def between(self, column, low, high):
+        return Condition('{} BETWEEN ? AND ?'.format(quote(column)), [low, high])
+
+    def below(self, column, high):
+        return Condition('{} < ?'.format(quote(column)), [high])
+
+    def at_least(self, column, value):
+        return Condition('{} >= ?'.format(quote(column)), [value])
+
+    def mask(self, condition):
+        mask = np.zeros(self.size, dtype=bool)
+        mask[self.storage.select_rows(self.table, condition)] = True
+        return mask
+
+    def positions(self, df):
+        return self.index.get_indexer(df.index)
+
+
+class SqlRecords:
+    # The FrameRecords interface over a table of a SqlStorage: take() reads the rows
+    # from the database and gives back the index and dtypes the frame had.
+    def __init__(self, storage, table, df):
+        self.storage = storage
+        self.table = table
+        self.index = df.index
+        self.dtypes = df.dtypes
+        self.size = len(df)
+
+    def take(self, rows, columns):
+        rows = np.asarray(rows, dtype=np.intp)
+        columns = list(columns)
+        if not len(rows):
+            return pd.DataFrame({column: restored([], self.dtypes[column]) for column in columns}, index=self.index[rows])
+        # reading the whole table is faster than looking up most of its rows
+        records = self.storage.select_records(self.table, columns, rows if 2 * len(rows) < self.size else None)
+        found = pd.DataFrame.from_records(records, columns=[ROW] + columns).set_index(ROW).loc[rows]
+        return pd.DataFrame({column: restored(found[column].to_numpy(), self.dtypes[column]) for column in columns},
+                            index=self.index[rows])
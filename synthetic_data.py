@@ -0,0 +1,155 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from competency import COMPETENCIES, SIGNATURE_COLUMNS
+from data_loader import SOURCE_FILES
+
+
+# ------------------------------------------------------------------------------
+# Synthetic workbooks
+# Random data with the columns of the five source workbooks, for reproducing
+# performance problems without the confidential data. About 5% of the talent rows
+# have their scores entered twice, as in the real extract.
+FUNCTIONS = ['Finance', 'Tax', 'Accounting', 'Culinary', 'Coffee', 'People', 'Facilities', 'Development',
+             'Global Development', 'Marketing', 'Legal', 'IT', 'Operations', 'Supply Chain']
+LOCATIONS = ['Miami', 'Toronto', 'Oakville', 'London', 'Zug', 'Sao Paulo', 'Singapore', 'Shanghai']
+PAY_BANDS = np.array([1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 12])
+DOUBLED_SHARE = 0.05
+VACANT_SHARE = 0.1
+
+# Excel sheets end at 1,048,576 rows
+EXCEL_MAX_ROWS = 1048575
+
+# talent.xlsx has Working with Others before Communications
+TALENT_COMPETENCIES = COMPETENCIES[:3] + ['Working with Others', 'Communications'] + COMPETENCIES[5:]
+
+
+def employee_ids(n):
+    return np.arange(100000, 100000 + n)
+
+
+def make_talent(rng, ids):
+    n = len(ids)
+    # fewer employees at every level up
+    levels = np.linspace(2, 0.2, 11)
+    talent = pd.DataFrame({'Unique ID': ids,
+                           'Employee Level': rng.choice(np.arange(11), n, p=levels / levels.sum()),
+                           '9box Score (box number 1-9)': rng.integers(1, 10, n)})
+    for column in TALENT_COMPETENCIES + ['Knowledge Creator']:
+        talent[column] = rng.integers(1, 6, n)
+    doubled = rng.random(n) < DOUBLED_SHARE
+    for column in TALENT_COMPETENCIES + ['Knowledge Creator']:
+        talent.loc[doubled, column] *= 2
+    # a doubled row always shows a 6 somewhere
+    talent.loc[doubled, 'Working with Others'] = 6
+    talent['Previous 9Box Score'] = rng.integers(1, 10, n)
+    talent['Mobility'] = rng.choice(['Yes', 'No'], n)
+    talent['Employee Preference'] = rng.choice(['Stay', 'Move', 'Promotion'], n)
+    return talent
+
+
+def make_job_signatures(rng, n_profiles):
+    profiles = ['Profile {}'.format(i) for i in range(n_profiles)]
+    signatures = pd.DataFrame({'Job Profile Name': profiles,
+                               'Job Code': np.arange(n_profiles),
+                               'Department': rng.choice(['Corporate', 'Restaurants', 'Franchise'], n_profiles),
+                               'Job Family Group': rng.choice(['Support', 'Operations', 'Leadership'], n_profiles),
+                               'Specialist / Generalist': rng.choice(['Specialist', 'Generalist'], n_profiles),
+                               'Qualification/Certification?': rng.choice(['Y', 'N'], n_profiles),
+                               'Market Definition': 'Global',
+                               'Knowledge Creator': rng.integers(1, 6, n_profiles),
+                               'Job Grade': rng.choice(PAY_BANDS, n_profiles)})
+    for column in COMPETENCIES:
+        signatures[SIGNATURE_COLUMNS.get(column, column)] = rng.integers(1, 6, n_profiles)
+    return signatures
+
+
+def make_target(rng, ids, signatures):
+    n = len(ids)
+    n_positions = n + int(n * VACANT_SHARE)
+    holders = np.concatenate([rng.permutation(ids).astype(float), np.full(n_positions - n, np.nan)])
+    profile = rng.integers(0, len(signatures), n_positions)
+    # most positions sit in the grade of their job profile, some one band off
+    band_index = np.searchsorted(PAY_BANDS, signatures['Job Grade'].to_numpy()[profile])
+    band_index = (band_index + rng.choice([-1, 0, 1], n_positions, p=[0.1, 0.8, 0.1])).clip(0, len(PAY_BANDS) - 1)
+    return pd.DataFrame({'Unique ID': holders,
+                         'Position': np.arange(50000000, 50000000 + n_positions),
+                         'Position Text': ['Title {}'.format(i) for i in rng.integers(0, max(10, n_positions // 20), n_positions)],
+                         'Manager Unique ID': rng.choice(ids, n_positions),
+                         'Job Profile': signatures['Job Profile Name'].to_numpy()[profile],
+                         'Job Profile Pay Band': PAY_BANDS[band_index],
+                         'Job Family Group': signatures['Job Family Group'].to_numpy()[profile],
+                         'Company Code': rng.choice(['US01', 'CA01', 'CH01'], n_positions),
+                         'Location': rng.choice(LOCATIONS, n_positions),
+                         'Organization': rng.choice(['Corporate', 'Field', 'Digital'], n_positions),
+                         'Function': rng.choice(FUNCTIONS, n_positions),
+                         'Time in Position (months)': rng.integers(0, 72, n_positions),
+                         'Time in Level (months)': rng.integers(0, 96, n_positions),
+                         'Time in Company (years)': rng.integers(0, 30, n_positions)})
+
+
+def make_job_history(rng, ids, max_jobs=5):
+    # 1 to max_jobs jobs per employee, each starting 3 months to 4 years after the previous one
+    jobs = rng.integers(1, max_jobs + 1, len(ids))
+    first = np.cumsum(jobs) - jobs
+    gaps = rng.integers(90, 1500, jobs.sum())
+    gaps[first] = rng.integers(0, 3650, len(ids))
+    days = np.cumsum(gaps)
+    days -= np.repeat(days[first] - gaps[first], jobs)
+    return pd.DataFrame({'Unique ID': np.repeat(ids, jobs),
+                         'Effective Date': pd.Timestamp('2005-01-01') + pd.to_timedelta(days, unit='D'),
+                         'Function': rng.choice(FUNCTIONS, jobs.sum()),
+                         'Pay Scale Group': rng.integers(1, 12, jobs.sum())})
+
+
+def make_feedback(rng, ids, raters=3):
+    n = len(ids) * raters
+    return pd.DataFrame({'Unique ID': np.repeat(ids, raters),
+                         'Rater': np.tile(['Manager', 'Peer', 'Direct Report'][:raters], len(ids)),
+                         'Score': rng.integers(1, 6, n)})
+
+
+def generate(employees, seed=0, profiles=None):
+    # frames named like data_loader.SOURCE_FILES
+    rng = np.random.default_rng(seed)
+    ids = employee_ids(employees)
+    if profiles is None:
+        profiles = int(np.clip(employees // 50, 20, 1000))
+    signatures = make_job_signatures(rng, profiles)
+    return {'feedback_360': make_feedback(rng, ids),
+            'target': make_target(rng, ids, signatures),
+            'talent': make_talent(rng, ids),
+            'job_signatures': signatures,
+            'job_history': make_job_history(rng, ids)}
+
+
+def write_workbooks(frames, out_dir):
+    too_long = [name for name, df in frames.items() if len(df) > EXCEL_MAX_ROWS]
+    if too_long:
+        raise ValueError('too many rows for an Excel sheet: ' + ', '.join(too_long))
+    os.makedirs(out_dir, exist_ok=True)
+    for name, df in frames.items():
+        df.to_excel(os.path.join(out_dir, SOURCE_FILES[name]), index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Write synthetic versions of the five source workbooks.')
+    parser.add_argument('out_dir', help='directory for the workbooks')
+    parser.add_argument('-n', '--employees', type=int, default=1000, help='number of employees (1,000 to 1,000,000)')
+    parser.add_argument('--profiles', type=int, help='number of job profiles (default: employees / 50, 20 to 1,000)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    frames = generate(args.employees, args.seed, args.profiles)
+    try:
+        write_workbooks(frames, args.out_dir)
+    except ValueError as e:
+        parser.exit(1, "{}; use generate() for larger sizes\n".format(e))
+    print("Wrote {} employees to {}".format(args.employees, args.out_dir), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+
+# ------------------------------------------------------------------------------
+# Server-side table queries
+# The result tables run with page_action, sort_action and filter_action set to
+# 'custom': the browser sends its page, sort_by and filter_query and only the
+# requested page of the ranked result is sent back. filter_query is the DataTable
+# syntax, e.g. '{Location} contains Mia && {Employee Level} >= 3'.
+PAGE_SIZE = 25
+
+OPERATORS = {'=': 'eq', 'eq': 'eq', '!=': 'ne', 'ne': 'ne', '<': 'lt', 'lt': 'lt', '<=': 'le', 'le': 'le',
+             '>': 'gt', 'gt': 'gt', '>=': 'ge', 'ge': 'ge', 'contains': 'contains',
+             'datestartswith': 'datestartswith', 'is blank': 'blank', 'is nil': 'blank'}
+
+FILTER_PART = re.compile(r'^\s*\{(?P<column>[^}]*)\}\s*'
+                         r'(?P<operator>is blank|is nil|[is]?(?:datestartswith|contains|<=|>=|!=|=|<|>|eq|ne|lt|le|gt|ge))'
+                         r'\s*(?P<value>.*?)\s*$')
+
+
+def parse_filter(filter_query):
+    # [(column, operator, value)] of a filter_query; parts that do not parse are ignored
+    parts = []
+    for part in (filter_query or '').split(' && '):
+        match = FILTER_PART.match(part)
+        if match is None:
+            continue
+        operator = match.group('operator')
+        # the i and s prefixes (icontains, s=) only choose case sensitivity, which is not told apart here
+        if operator not in OPERATORS:
+            operator = operator[1:]
+        value = match.group('value')
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in '"\'`':
+            value = value[1:-1].replace('\\' + value[0], value[0])
+        parts.append((match.group('column'), OPERATORS[operator], value))
+    return parts
+
+
+def filter_mask(df, column, operator, value):
+    values = df[column]
+    if operator == 'blank':
+        return values.isna().to_numpy()
+    if operator in ('contains', 'datestartswith'):
+        text = values.astype(str).where(values.notna(), '')
+        if operator == 'contains':
+            return text.str.contains(value, case=False, regex=False).to_numpy()
+        return text.str.startswith(value).to_numpy()
+    if pd.api.types.is_numeric_dtype(values):
+        try:
+            value = float(value)
+        except ValueError:
+            return np.zeros(len(df), dtype=bool)
+    else:
+        values = values.astype(str).where(values.notna(), None)
+    compare = {'eq': values.eq, 'ne': values.ne, 'lt': values.lt, 'le': values.le, 'gt': values.gt, 'ge': values.ge}
+    try:
+        return compare[operator](value).fillna(False).to_numpy(dtype=bool)
+    except TypeError:
+        return np.zeros(len(df), dtype=bool)
+
+
+def query_table(df, filter_query=None, sort_by=None):
+    # rows of df that pass filter_query, sorted by sort_by; without sort_by the ranking is kept
+    mask = np.ones(len(df), dtype=bool)
+    for column, operator, value in parse_filter(filter_query):
+        if column in df.columns:
+            mask &= filter_mask(df, column, operator, value)
+    if not mask.all():
+        df = df[mask]
+    sort_by = [s for s in (sort_by or []) if s.get('column_id') in df.columns]
+    if sort_by:
+        # a stable sort keeps ties in ranking order; missing values sort last
+        df = df.sort_values([s['column_id'] for s in sort_by],
+                            ascending=[s.get('direction', 'asc') == 'asc' for s in sort_by],
+                            kind='mergesort', na_position='last')
+    return df
+
+
+def page_count(rows, page_size):
+    return max(1, -(-rows // page_size))
+
+
+def page_rows(df, page_current, page_size):
+    # the requested page and its rows; past the end of a shrunken result, the last page
+    page_size = page_size or PAGE_SIZE
+    page = min(page_current or 0, page_count(len(df), page_size) - 1)
+    return page, df.iloc[page * page_size:(page + 1) * page_size]
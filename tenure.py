@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+
+
+# ------------------------------------------------------------------------------
+# Time in function
+# Employee x function matrices built from job_history. Every job runs until the
+# employee's next job, the current one until today; its length in years is
+# rounded to 0.1 and summed per function. The weighted years use the Pay Scale
+# Group of the employee's first job in the function. Finished jobs are summed once;
+# only the current job of each employee depends on the date a column is read.
+YEAR = np.timedelta64(31556952, 's')  # 365.2425 days
+
+
+def job_years(start, end):
+    years = np.round((end - start) / YEAR, 1)
+    return np.where(np.isnan(years), 0.0, years)
+
+
+class TenureMatrix:
+    def __init__(self, job_history):
+        self.employees = pd.Index([])
+        self.functions = pd.Index([])
+        self.years = np.zeros((0, 0))
+        self.pay_scale = np.zeros((0, 0))
+        self.seen = np.zeros((0, 0), dtype=bool)
+        self.current_function = np.zeros(0, dtype=np.intp)
+        self.current_start = np.zeros(0, dtype='datetime64[ns]')
+        self.append(job_history)
+
+    def __len__(self):
+        return len(self.employees)
+
+    def copy(self):
+        # appending to the copy leaves this matrix untouched
+        other = object.__new__(TenureMatrix)
+        for name, value in vars(self).items():
+            setattr(other, name, value.copy() if isinstance(value, np.ndarray) else value)
+        return other
+
+    def _grow(self, ids, functions):
+        new_ids = pd.Index(ids).dropna().unique().difference(self.employees, sort=False)
+        new_functions = pd.Index(functions).dropna().unique().difference(self.functions, sort=False)
+        if len(new_ids) == 0 and len(new_functions) == 0:
+            return
+        self.employees = self.employees.append(new_ids)
+        self.functions = self.functions.append(new_functions)
+        pad = ((0, len(new_ids)), (0, len(new_functions)))
+        self.years = np.pad(self.years, pad)
+        self.pay_scale = np.pad(self.pay_scale, pad, constant_values=np.nan)
+        self.seen = np.pad(self.seen, pad)
+        self.current_function = np.append(self.current_function, np.full(len(new_ids), -1))
+        self.current_start = np.append(self.current_start, np.full(len(new_ids), np.datetime64('NaT'), dtype='datetime64[ns]'))
+
+    def _fold(self, e, f, start, pay_scale, carried):
+        # rows sorted by employee and date; carried rows are the current jobs already counted
+        last = np.append(e[1:] != e[:-1], True)
+        end = np.append(start[1:], np.datetime64('NaT')).astype('datetime64[ns]')
+        finished = ~last & (f >= 0)
+        np.add.at(self.years, (e[finished], f[finished]), job_years(start[finished], end[finished]))
+
+        # the first job of an employee in a function sets the pay scale
+        new = (f >= 0) & ~carried
+        pairs = e[new] * len(self.functions) + f[new]
+        _, first = np.unique(pairs, return_index=True)
+        rows = np.flatnonzero(new)[first]
+        unseen = rows[~self.seen[e[rows], f[rows]]]
+        self.pay_scale[e[unseen], f[unseen]] = pay_scale[unseen]
+        self.seen[e[unseen], f[unseen]] = True
+
+        self.current_function[e[last]] = f[last]
+        self.current_start[e[last]] = start[last]
+
+    def _reset(self, employees):
+        self.years[employees] = 0
+        self.pay_scale[employees] = np.nan
+        self.seen[employees] = False
+        self.current_function[employees] = -1
+        self.current_start[employees] = np.datetime64('NaT')
+
+    def append(self, rows, history=None):
+        # Folds appended job_history rows in. Only the employees in rows are touched;
+        # an employee with a row dated before their current job is recounted from
+        # history, the whole job_history including rows.
+        rows = rows.dropna(subset=['Unique ID'])
+        known = len(self.employees)
+        self._grow(rows['Unique ID'], rows['Function'])
+        e = self.employees.get_indexer(rows['Unique ID'])
+        f = self.functions.get_indexer(rows['Function'])
+        start = rows['Effective Date'].to_numpy(dtype='datetime64[ns]')
+        pay_scale = rows['Pay Scale Group'].to_numpy(dtype=np.float64)
+
+        # undated jobs sort last, so anything next to one is recounted as well
+        current = self.current_start[e]
+        late = (e < known) & (np.isnat(current) | np.isnat(start) | (start < current))
+        if late.any():
+            if history is None:
+                raise ValueError('job_history rows out of date order need the full history')
+            redo = np.unique(e[late])
+            self._reset(redo)
+            keep = ~np.isin(e, redo)
+            e, f, start, pay_scale = e[keep], f[keep], start[keep], pay_scale[keep]
+            redone = history[history['Unique ID'].isin(self.employees[redo])]
+            e = np.concatenate([self.employees.get_indexer(redone['Unique ID']), e])
+            f = np.concatenate([self.functions.get_indexer(redone['Function']), f])
+            start = np.concatenate([redone['Effective Date'].to_numpy(dtype='datetime64[ns]'), start])
+            pay_scale = np.concatenate([redone['Pay Scale Group'].to_numpy(dtype=np.float64), pay_scale])
+
+        # the current job of every touched employee comes first so it is closed by the new rows
+        touched = np.unique(e)
+        touched = touched[~np.isnat(self.current_start[touched])]
+        carried = np.zeros(len(touched) + len(e), dtype=bool)
+        carried[:len(touched)] = True
+        e = np.concatenate([touched, e])
+        f = np.concatenate([self.current_function[touched], f])
+        start = np.concatenate([self.current_start[touched], start])
+        pay_scale = np.concatenate([np.full(len(touched), np.nan), pay_scale])
+
+        order = np.lexsort((start, e))
+        if len(order):
+            self._fold(e[order], f[order], start[order], pay_scale[order], carried[order])
+        return self
+
+    def column(self, function, as_of=None):
+        # raw and weighted years of every employee in one function, NaN if they never worked in it
+        nothing = np.full(len(self.employees), np.nan)
+        if function not in self.functions:
+            return nothing, nothing
+        i = self.functions.get_loc(function)
+        as_of = np.datetime64(pd.Timestamp.today() if as_of is None else pd.Timestamp(as_of), 'ns')
+        years = self.years[:, i].copy()
+        current = self.current_function == i
+        years[current] += job_years(self.current_start[current], as_of)
+        years = np.where(self.seen[:, i], np.round(years, 1), np.nan)
+        return years, years * self.pay_scale[:, i]
@@ -0,0 +1,32 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import data_loader
+import synthetic_data
+
+
+# ------------------------------------------------------------------------------
+# Synthetic data
+# A few hundred generated employees, cleaned like the workbooks, with some missing
+# competency scores so the paths that leave them out of the sums are covered too.
+def synthetic_frames(employees=200, seed=0):
+    raw = synthetic_data.generate(employees, seed)
+    talent = raw['talent']
+    talent.loc[talent.index[::17], 'Mentoring'] = np.nan
+    talent.loc[talent.index[5::23], 'Communications'] = np.nan
+    return data_loader.clean_data(raw)
+
+
+@pytest.fixture(scope='session')
+def frames():
+    return synthetic_frames()
+
+
+@pytest.fixture(scope='session')
+def data(frames):
+    return data_loader.DataSnapshot(frames)
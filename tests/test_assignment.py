@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+import app_test
+from assignment import solve
+
+optimize = pytest.importorskip('scipy.optimize')
+
+
+def random_pairs(rng, n_rows, n_cols, density):
+    # each (row, col) pair at most once, integer costs so that many assignments tie
+    allowed = rng.random((n_rows, n_cols)) < density
+    rows, cols = np.nonzero(allowed)
+    costs = rng.integers(-20, 20, len(rows)).astype(float)
+    return rows, cols, costs
+
+
+def dense_optimum(rows, cols, costs, n_rows, n_cols):
+    # how many rows a full matching fills and at what cost, by linear_sum_assignment on the
+    # dense matrix; an unfilled row costs more than any set of real pairs
+    unfilled = (np.abs(costs).sum() + 1) * 2
+    matrix = np.full((n_rows, n_cols + n_rows), np.inf)
+    matrix[rows, cols] = costs
+    matrix[np.arange(n_rows), n_cols + np.arange(n_rows)] = unfilled
+    row_ind, col_ind = optimize.linear_sum_assignment(matrix)
+    filled = col_ind < n_cols
+    return filled.sum(), matrix[row_ind[filled], col_ind[filled]].sum()
+
+
+def assignment_cost(assigned, rows, cols, costs):
+    cost = {(r, c): x for r, c, x in zip(rows, cols, costs)}
+    filled = np.flatnonzero(assigned >= 0)
+    return len(filled), sum(cost[r, assigned[r]] for r in filled)
+
+
+def test_solve_matches_the_dense_optimum():
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        n_rows, n_cols = rng.integers(1, 30), rng.integers(1, 30)
+        rows, cols, costs = random_pairs(rng, n_rows, n_cols, rng.choice([0.05, 0.2, 0.6]))
+        assigned = solve(rows, cols, costs, n_rows, n_cols)
+        # every filled row has an allowed pair and no column is used twice
+        filled = assigned[assigned >= 0]
+        assert len(np.unique(filled)) == len(filled)
+        filled_rows, cost = assignment_cost(assigned, rows, cols, costs)
+        expected_rows, expected_cost = dense_optimum(rows, cols, costs, n_rows, n_cols)
+        assert filled_rows == expected_rows
+        assert cost == pytest.approx(expected_cost)
+
+
+def test_no_pairs():
+    np.testing.assert_array_equal(solve(np.array([], dtype=int), np.array([], dtype=int), np.array([]), 3, 4),
+                                  [-1, -1, -1])
+
+
+def test_top_k_at_least_the_positions_is_optimal(data):
+    # the best K = number of positions candidates of each position reach the optimum over all of them
+    positions = list(data.position_list[:12])
+    for time_scale in ['Ready Now', 'Ready Later']:
+        top = app_test.assign_positions(data, positions, time_scale)
+        everyone = app_test.assign_positions(data, positions, time_scale, top_k=len(data.talent_candidates))
+        assert top['Unique ID'].notna().sum() == everyone['Unique ID'].notna().sum()
+        assert top['Sum of Weighted Differences'].sum() == pytest.approx(everyone['Sum of Weighted Differences'].sum())
+        ids = top['Unique ID'].dropna()
+        assert ids.is_unique
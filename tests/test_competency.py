@@ -0,0 +1,88 @@
+import pandas as pd
+
+import app_test
+from competency import COMPETENCIES, SIGNATURE_COLUMNS, adjust_scores
+
+SIGNED = 'Sum of Weighted Differences'
+ABSOLUTE = 'Sum of Weighted Differences (Absolute)'
+
+
+# ------------------------------------------------------------------------------
+# The scoring of both tabs as it was before the competency engine: scores adjusted
+# cell by cell and the weighted differences summed over a frame per selection.
+def adjust_scores_loop(df):
+    for row in range(0, df.shape[0]):
+        for col in range(1, df.shape[1]):
+            df.iloc[row, col] = df.iloc[row, 0] + (df.iloc[row, col] - 3)
+    return df
+
+
+def weighted_differences(reference, weights, df):
+    diff = reference.values.squeeze() - df
+    df[SIGNED] = (diff * weights.values.squeeze()).sum(axis=1)
+    df[ABSOLUTE] = (diff.abs() * weights.values.squeeze()).sum(axis=1)
+    return df
+
+
+def importance(adjusted):
+    return adjusted.replace([2], 1).replace([1], 0.5)
+
+
+def old_position_scores(data, adjusted_talent, job_profile):
+    df_target = data.job_signatures.loc[data.job_signatures['Job Profile Name'] == job_profile,
+                                        ['Job Grade'] + [SIGNATURE_COLUMNS.get(c, c) for c in COMPETENCIES]]
+    adjusted_target = adjust_scores_loop(df_target.astype(float)).drop(columns=['Job Grade'])
+    df_talent = weighted_differences(adjusted_target, importance(adjusted_target), adjusted_talent.copy())
+    return df_talent.sort_values(SIGNED).dropna(subset=['Communications'])
+
+
+def old_employee_scores(data, unique_id):
+    df_employee = data.talent.loc[data.talent['Unique ID'] == unique_id, ['Employee Level'] + COMPETENCIES]
+    adjusted_employee = adjust_scores_loop(df_employee.astype(float)).drop(columns=['Employee Level'])
+    employee_level = df_employee['Employee Level'].values[0]
+    df_position = data.position_pool.loc[data.position_pool['Job Profile Pay Band'] >= employee_level,
+                                         ['Job Profile Pay Band'] + COMPETENCIES]
+    df_position = adjust_scores_loop(df_position.astype(float)).drop(columns=['Job Profile Pay Band'])
+    df_position = weighted_differences(adjusted_employee, importance(adjusted_employee), df_position)
+    return df_position.sort_values(SIGNED, ascending=False).dropna(subset=['Communications'])
+
+
+def ranking(df, ascending=True):
+    # rows and scores in rank order, ties by row, so both sides order them the same
+    df = df.sort_index().sort_values(SIGNED, ascending=ascending, kind='stable')
+    return list(zip(df.index, df[SIGNED], df[ABSOLUTE]))
+
+
+def test_adjust_scores_matches_loop(data):
+    df = data.talent_pool[['Employee Level'] + COMPETENCIES].astype(float)
+    pd.testing.assert_frame_equal(adjust_scores(df.copy()), adjust_scores_loop(df.copy()))
+
+
+def test_position_ranking_matches_old_scoring(data):
+    talent = data.talent_pool.loc[data.talent_pool['Employee Level'] >= 0, ['Employee Level'] + COMPETENCIES]
+    adjusted_talent = adjust_scores_loop(talent.astype(float)).drop(columns=['Employee Level'])
+    for position in data.position_list[::25]:
+        job_profile = data.target_by_key.get(position, 'Job Profile')
+        expected = old_position_scores(data, adjusted_talent, job_profile)
+        got = app_test.calculateScore_position(data, position)
+        # rows of talent_candidates are the talent_pool rows of the engine
+        got.index = data.engine.pool_rows[got.index]
+        assert got[SIGNED].tolist() == expected[SIGNED].tolist()
+        assert ranking(got) == ranking(expected)
+
+
+def test_employee_ranking_matches_old_scoring(data):
+    for unique_id in data.employee_list[::20]:
+        expected = old_employee_scores(data, unique_id)
+        got = app_test.calculateScore_employee(data, unique_id)
+        assert got[SIGNED].tolist() == expected[SIGNED].tolist()
+        assert ranking(got, ascending=False) == ranking(expected, ascending=False)
+
+
+def test_missing_scores_are_left_out(data):
+    # employees without a Communications score are dropped, other missing scores count nothing
+    missing = data.talent.loc[data.talent['Communications'].isna(), 'Unique ID']
+    position = data.position_list[0]
+    got = app_test.calculateScore_position(data, position)
+    assert len(missing) and not got['Unique ID'].isin(missing).any()
+    assert not got[[SIGNED, ABSOLUTE]].isna().any().any()
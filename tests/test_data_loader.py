@@ -0,0 +1,110 @@
+import os
+import subprocess
+import sys
+import time
+
+import pandas as pd
+
+import app_test
+import data_loader
+import synthetic_data
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# loads the data at the top level, without an if __name__ == '__main__' guard
+UNGUARDED_SCRIPT = '''
+import sys
+sys.path.insert(0, {root!r})
+import data_loader
+frames = data_loader.read_workbooks(sys.argv[1])
+print(sorted((name, len(df)) for name, df in frames.items()))
+'''
+
+
+def write_workbooks(directory, employees=30):
+    frames = synthetic_data.generate(employees, seed=0)
+    synthetic_data.write_workbooks(frames, str(directory))
+    return frames
+
+
+def test_unguarded_script_reads_the_workbooks(tmp_path):
+    frames = write_workbooks(tmp_path / 'data')
+    script = tmp_path / 'script.py'
+    script.write_text(UNGUARDED_SCRIPT.format(root=ROOT))
+    result = subprocess.run([sys.executable, str(script), str(tmp_path / 'data')],
+                            capture_output=True, text=True, timeout=300)
+    assert result.returncode == 0, result.stderr
+    expected = sorted((name, len(df)) for name, df in frames.items())
+    assert result.stdout.strip().splitlines()[-1] == str(expected)
+
+
+def test_read_workbooks(tmp_path):
+    frames = write_workbooks(tmp_path)
+    read = data_loader.read_workbooks(str(tmp_path))
+    assert set(read) == set(frames)
+    assert list(read['talent']['Unique ID']) == list(frames['talent']['Unique ID'])
+
+
+def reloaded(store):
+    # starts a reload and waits for it
+    assert store.reload()
+    while store.reload_status['state'] == 'reloading':
+        time.sleep(0.05)
+    assert store.reload_status['error'] is None, store.reload_status['error']
+    return store.get()
+
+
+def test_reload_takes_over_unchanged_structures(tmp_path):
+    frames = write_workbooks(tmp_path, employees=60)
+    store = data_loader.DataStore(str(tmp_path), backend='memory').load()
+    first = store.get()
+    assert reloaded(store) is first and store.reload_status['result'] == 'unchanged'
+
+    # jobs appended to job_history: everything but time in function is taken over as it is
+    history = frames['job_history']
+    later = history.tail(5).assign(**{'Effective Date': pd.Timestamp('2030-01-01'), 'Function': 'Finance'})
+    pd.concat([history, later]).to_excel(os.path.join(str(tmp_path), data_loader.SOURCE_FILES['job_history']),
+                                         index=False)
+    second = reloaded(store)
+    assert second is not first and store.reload_status['result'] == 'swapped'
+    assert set(second.reused) >= {'tenure', 'engine', 'fit', 'talent_similarity', 'org_chart',
+                                  'target_by_key', 'talent_by_id', 'position_filters', 'candidate_filters'}
+    for name in ['engine', 'fit', 'org_chart', 'candidate_filters']:
+        assert getattr(second, name) is getattr(first, name)
+    assert second.tenure is not first.tenure
+    assert len(second.job_history) == len(first.job_history) + 5
+
+    # a changed talent workbook is scored again
+    talent = frames['talent'].copy()
+    talent.loc[0, 'Employee Level'] = talent.loc[0, 'Employee Level'] % 5 + 1
+    talent.to_excel(os.path.join(str(tmp_path), data_loader.SOURCE_FILES['talent']), index=False)
+    third = reloaded(store)
+    assert 'engine' not in third.reused and 'talent_by_id' not in third.reused
+    assert 'tenure' in third.reused and third.tenure is second.tenure
+
+
+def test_reload_route_needs_the_admin_token(tmp_path, monkeypatch):
+    write_workbooks(tmp_path)
+    monkeypatch.setattr(app_test, 'ADMIN_TOKEN', None)
+    app = app_test.create_app(str(tmp_path))
+    # dash answers any other path itself, so the route is looked for in the URL map
+    assert '/admin/reload' not in [rule.rule for rule in app.server.url_map.iter_rules()]
+    assert app.server.test_client().post('/admin/reload').status_code != 202
+
+    monkeypatch.setattr(app_test, 'ADMIN_TOKEN', 'secret')
+    app = app_test.create_app(str(tmp_path))
+    app.store.get(timeout=300)
+    client = app.server.test_client()
+    assert client.post('/admin/reload').status_code == 403
+    assert client.post('/admin/reload', headers={'X-Admin-Token': 'wrong'}).status_code == 403
+    assert client.post('/admin/reload', headers={'X-Admin-Token': 'secret'}).status_code == 202
+
+
+def test_no_reload_route_when_preloaded(tmp_path, monkeypatch):
+    # a reload would only reach one of the forked workers
+    write_workbooks(tmp_path)
+    monkeypatch.setattr(app_test, 'ADMIN_TOKEN', 'secret')
+    app = app_test.create_app(str(tmp_path), preload=True)
+    assert '/admin/reload' not in [rule.rule for rule in app.server.url_map.iter_rules()]
+    response = app.server.test_client().post('/admin/reload', headers={'X-Admin-Token': 'secret'})
+    assert response.status_code != 202 and app.store.reload_status['reloads'] == 0
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+import data_loader
+import synthetic_data
+from competency import CompetencyEngine
+from fit_matrix import FitMatrices
+
+
+def fit_matrices(frames, directory=None):
+    engine = CompetencyEngine(frames['talent_pool'], frames['talent'], frames['position_pool'], frames['job_signatures'])
+    return FitMatrices(engine, frames['talent_pool'], frames['talent'], frames['position_pool'], directory)
+
+
+def edited_frames():
+    # the same workbooks with changed scores, a changed job signature and pay band,
+    # one employee gone and one employee added
+    raw = synthetic_data.generate(200, seed=0)
+    talent = raw['talent']
+    talent.loc[[3, 50, 120], 'Quantitative'] = [1, 5, 2]
+    talent.loc[7, 'Mentoring'] = np.nan
+    new = talent.iloc[[10]].assign(**{'Unique ID': 999999, 'Analytical': 4})
+    raw['talent'] = pd.concat([talent.drop(index=80), new], ignore_index=True)
+    signatures = raw['job_signatures']
+    signatures.loc[2, 'Conceptual'] = signatures.loc[2, 'Conceptual'] % 5 + 1
+    raw['target'].loc[[0, 1], 'Job Profile Pay Band'] = 12
+    return data_loader.clean_data(raw)
+
+
+def assert_same(refreshed, rebuilt):
+    for name in ('position', 'employee'):
+        a, b = getattr(refreshed, name), getattr(rebuilt, name)
+        np.testing.assert_array_equal(a.ref_keys, b.ref_keys)
+        np.testing.assert_array_equal(a.other_keys, b.other_keys)
+        np.testing.assert_array_equal(np.asarray(a.signed), np.asarray(b.signed))
+        np.testing.assert_array_equal(np.asarray(a.absolute), np.asarray(b.absolute))
+    np.testing.assert_array_equal(refreshed.position_columns, rebuilt.position_columns)
+
+
+def test_refresh_matches_full_rebuild(tmp_path):
+    fit_matrices(data_loader.clean_data(synthetic_data.generate(200, seed=0)), str(tmp_path))
+    frames = edited_frames()
+    refreshed = fit_matrices(frames, str(tmp_path))
+    rebuilt = fit_matrices(frames)
+    # only the changed references and columns were scored again
+    for name in ('position', 'employee'):
+        matrix = getattr(refreshed, name)
+        assert 0 < matrix.recomputed[0] < len(matrix.ref_keys)
+    assert_same(refreshed, rebuilt)
+
+
+def test_unchanged_data_is_reused(tmp_path):
+    frames = data_loader.clean_data(synthetic_data.generate(200, seed=0))
+    fit_matrices(frames, str(tmp_path))
+    reopened = fit_matrices(frames, str(tmp_path))
+    assert reopened.position.recomputed == (0, 0) and reopened.employee.recomputed == (0, 0)
+    assert_same(reopened, fit_matrices(frames))
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+import fit_matrix
+import parallel
+from fit_matrix import References
+
+
+def fill_both(refs, others, ref_rows, other_cols):
+    shape = (len(refs), len(others))
+    expected = np.zeros(shape, dtype=np.float32), np.zeros(shape, dtype=np.float32)
+    got = np.zeros(shape, dtype=np.float32), np.zeros(shape, dtype=np.float32)
+    fit_matrix.fill(*expected, refs, others, ref_rows, other_cols)
+    parallel.fill(*got, refs, others, ref_rows, other_cols, workers=2)
+    return expected, got
+
+
+@pytest.fixture
+def every_job(monkeypatch):
+    # score even these small matrices in the worker processes
+    monkeypatch.setattr(parallel, 'PARALLEL_MIN_PAIRS', 0)
+
+
+def test_parallel_fill_matches_fill(data, every_job):
+    engine = data.engine
+    refs = References(engine.signature_grades, engine.signature_scores)
+    assert engine.pool.valid is not None
+    # every block, and a subset of references against a subset of columns as on refresh
+    for ref_rows, other_cols in [(np.arange(len(refs)), np.arange(len(engine.pool))),
+                                 (np.arange(1, len(refs), 3), np.arange(0, len(engine.pool), 7))]:
+        (signed, absolute), (got_signed, got_absolute) = fill_both(refs, engine.pool, ref_rows, other_cols)
+        np.testing.assert_array_equal(got_signed, signed)
+        np.testing.assert_array_equal(got_absolute, absolute)
+
+
+def test_parallel_fill_without_missing_scores(data, every_job):
+    # positions have every score, so the workers take the path without a validity mask
+    engine = data.engine
+    refs = References(engine.talent_levels, engine.talent_scores)
+    assert engine.positions.valid is None
+    (signed, absolute), (got_signed, got_absolute) = fill_both(refs, engine.positions, np.arange(len(refs)),
+                                                               np.arange(len(engine.positions)))
+    np.testing.assert_array_equal(got_signed, signed)
+    np.testing.assert_array_equal(got_absolute, absolute)
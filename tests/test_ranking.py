@@ -0,0 +1,54 @@
+import numpy as np
+
+import app_test
+import batch
+from ranking import top_k_indices
+from result_cache import ResultCache
+
+TIME_SCALES = ['Ready Now', 'Ready Soon', 'Ready Later']
+
+
+def test_top_k_is_a_prefix_of_the_stable_sort():
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        scores = rng.integers(0, 8, rng.integers(0, 200)).astype(float)
+        for descending in (False, True):
+            full = np.argsort(-scores if descending else scores, kind='stable')
+            for k in (0, 1, 5, 10, len(scores), len(scores) + 3):
+                np.testing.assert_array_equal(top_k_indices(scores, k, descending), full[:k])
+            np.testing.assert_array_equal(top_k_indices(scores, None, descending), full)
+
+
+def test_top_employees_are_the_first_rows_of_all(data):
+    # "Top 10" shows the same employees as the first 10 rows of "All", ties included
+    for position in data.position_list[::10]:
+        ranked = app_test.calculateScore_position(data, position)
+        for time_scale in TIME_SCALES:
+            everyone = app_test.select_employees(data, ranked, time_scale, position, None, None, None, None, None, None)
+            top, count = app_test.top_employee_table(ResultCache(), data, position, 10, time_scale,
+                                                     None, None, None, None, None, None)
+            assert count == len(everyone)
+            assert top['Unique ID'].tolist() == everyone['Unique ID'].head(10).tolist()
+
+
+def test_top_positions_are_the_first_rows_of_all(data):
+    for employee in data.employee_list[::10]:
+        ranked = app_test.calculateScore_employee(data, employee)
+        for time_scale in TIME_SCALES:
+            everything = app_test.select_positions(data, ranked, time_scale, employee, None, None, None)
+            top, count = app_test.top_position_table(data, employee, 10, time_scale, None, None, None)
+            assert count == len(everything)
+            assert top['Position'].tolist() == everything['Position'].head(10).tolist()
+
+
+def test_batch_top_k_is_a_prefix_of_the_full_slate(data):
+    positions = list(data.position_list[::20])
+    full = {(p, s['Time Scale'][0]): s for p, s in batch.slates(data, positions, TIME_SCALES, (None,) * 6)
+            if len(s)}
+    for position, slate in batch.slates(data, positions, TIME_SCALES, (None,) * 6, top_k=5):
+        if len(slate):
+            expected = full[position, slate['Time Scale'][0]]
+            assert slate['Unique ID'].tolist() == expected['Unique ID'].head(5).tolist()
+            top, _ = app_test.top_employee_table(ResultCache(), data, position, 5, slate['Time Scale'][0],
+                                                 None, None, None, None, None, None)
+            assert slate['Unique ID'].tolist() == top['Unique ID'].tolist()
@@ -0,0 +1,165 @@
+import numpy as np
+import pandas as pd
+
+from readiness import ReadinessRules
+
+TIME_SCALES = ['Ready Now', 'Ready Soon', 'Ready Later']
+LEVELS = np.array([0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 12, np.nan])
+# the pay bands and levels of the rules, and some that are not in them
+KEYS = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13]
+
+
+# ------------------------------------------------------------------------------
+# The readiness filters as they were before readiness_rules.json, copied from
+# filter_employees and filter_positions
+def old_ready_employees(df, slct_time_scale_employee, job_profile_pay_band):
+    if slct_time_scale_employee == "Ready Now":
+        df = df.loc[(df['Employee Level'] >= job_profile_pay_band-2) & (df['Employee Level'] <= job_profile_pay_band + 1)]
+    if slct_time_scale_employee == "Ready Soon":
+        if job_profile_pay_band == 1:
+            df = df.loc[(df['Employee Level'] == 0)]
+        if job_profile_pay_band == 2:
+            df = df.loc[(df['Employee Level'] >= 0) & (df['Employee Level'] <= 1)]
+        if job_profile_pay_band == 3:
+            df = df.loc[(df['Employee Level'] >= 0) & (df['Employee Level'] <= 2)]
+        if job_profile_pay_band == 4:
+            df = df.loc[(df['Employee Level'] >= 1) & (df['Employee Level'] <= 3)]
+        if job_profile_pay_band == 5:
+            df = df.loc[(df['Employee Level'] >= 2) & (df['Employee Level'] <= 4)]
+        if job_profile_pay_band == 6:
+            df = df.loc[(df['Employee Level'] >= 4) & (df['Employee Level'] <= 5)]
+        if job_profile_pay_band == 7:
+            df = df.loc[(df['Employee Level'] >= 5) & (df['Employee Level'] <= 6)]
+        if job_profile_pay_band == 8:
+            df = df.loc[(df['Employee Level'] == 7)]
+        if job_profile_pay_band == 9:
+            df = df.loc[(df['Employee Level'] == 8)]
+        if job_profile_pay_band == 10:
+            df = df.loc[(df['Employee Level'] == 9)]
+        if job_profile_pay_band == 12:
+            df = df.loc[(df['Employee Level'] == 10)]
+    if slct_time_scale_employee == "Ready Later":
+        if job_profile_pay_band == 1:
+            df = df.loc[(df['Employee Level'] == 0)]
+        if job_profile_pay_band == 2:
+            df = df.loc[(df['Employee Level'] == 0)]
+        if job_profile_pay_band == 3:
+            df = df.loc[(df['Employee Level'] == 0)]
+        if job_profile_pay_band == 4:
+            df = df.loc[(df['Employee Level'] >= 0) & (df['Employee Level'] <= 1)]
+        if job_profile_pay_band == 5:
+            df = df.loc[(df['Employee Level'] >= 1) & (df['Employee Level'] <= 2)]
+        if job_profile_pay_band == 6:
+            df = df.loc[(df['Employee Level'] >= 2) & (df['Employee Level'] <= 4)]
+        if job_profile_pay_band == 7:
+            df = df.loc[(df['Employee Level'] >= 4) & (df['Employee Level'] <= 5)]
+        if job_profile_pay_band == 8:
+            df = df.loc[(df['Employee Level'] >= 6) & (df['Employee Level'] <= 7)]
+        if job_profile_pay_band == 9:
+            df = df.loc[(df['Employee Level'] >= 7) & (df['Employee Level'] <= 8)]
+        if job_profile_pay_band == 10:
+            df = df.loc[(df['Employee Level'] >= 8) & (df['Employee Level'] <= 9)]
+        if job_profile_pay_band == 12:
+            df = df.loc[(df['Employee Level'] >= 9) & (df['Employee Level'] <= 10)]
+    return df
+
+
+def old_ready_positions(df2, slct_time_scale_position, employee_level):
+    if slct_time_scale_position == "Ready Now":
+        df2 = df2.loc[(df2['Job Profile Pay Band'] >= employee_level) & (df2['Job Profile Pay Band'] <= employee_level + 2)]
+    if slct_time_scale_position == "Ready Soon":
+        if employee_level == 1:
+            df2 = df2.loc[(df2['Job Profile Pay Band'] >= 2) & (df2['Job Profile Pay Band'] <= 4)]
+        if employee_level == 2:
+            df2 = df2.loc[(df2['Job Profile Pay Band'] >= 3) & (df2['Job Profile Pay Band'] <= 4)]
+        if employee_level == 3:
+            df2 = df2.loc[(df2['Job Profile Pay Band'] >= 4) & (df2['Job Profile Pay Band'] <= 5)]
+        if employee_level == 4:
+            df2 = df2.loc[(df2['Job Profile Pay Band'] >= 4) & (df2['Job Profile Pay Band'] <= 5)]
+        if employee_level == 5:
+            df2 = df2.loc[(df2['Job Profile Pay Band'] >= 5) & (df2['Job Profile Pay Band'] <= 6)]
+        if employee_level == 6:
+            df2 = df2.loc[(df2['Job Profile Pay Band'] >= 6) & (df2['Job Profile Pay Band'] <= 7)]
+        if employee_level == 7:
+            df2 = df2.loc[(df2['Job Profile Pay Band'] >= 7) & (df2['Job Profile Pay Band'] <= 8)]
+        if employee_level == 8:
+            df2 = df2.loc[(df2['Job Profile Pay Band'] >= 8) & (df2['Job Profile Pay Band'] <= 9)]
+        if employee_level == 9:
+            df2 = df2.loc[(df2['Job Profile Pay Band'] >= 9) & (df2['Job Profile Pay Band'] <= 10)]
+        if employee_level == 10:
+            df2 = df2.loc[(df2['Job Profile Pay Band'] >= 10) & (df2['Job Profile Pay Band'] <= 12)]
+        if employee_level == 12:
+            df2 = df2.loc[(df2['Job Profile Pay Band'] == 12)]
+    if slct_time_scale_position == "Ready Later":
+        if employee_level == 1:
+            df2 = df2.loc[(df2['Job Profile Pay Band'] >= 4) & (df2['Job Profile Pay Band'] <= 5)]
+        if employee_level == 2:
+            df2 = df2.loc[(df2['Job Profile Pay Band'] >= 4) & (df2['Job Profile Pay Band'] <= 5)]
+        if employee_level == 3:
+            df2 = df2.loc[(df2['Job Profile Pay Band'] >= 5) & (df2['Job Profile Pay Band'] <= 6)]
+        if employee_level == 4:
+            df2 = df2.loc[(df2['Job Profile Pay Band'] >= 5) & (df2['Job Profile Pay Band'] <= 6)]
+        if employee_level == 5:
+            df2 = df2.loc[(df2['Job Profile Pay Band'] >= 6) & (df2['Job Profile Pay Band'] <= 7)]
+        if employee_level == 6:
+            df2 = df2.loc[df2['Job Profile Pay Band'] == 7]
+        if employee_level == 7:
+            df2 = df2.loc[df2['Job Profile Pay Band'] == 8]
+        if employee_level == 8:
+            df2 = df2.loc[df2['Job Profile Pay Band'] == 9]
+        if employee_level == 9:
+            df2 = df2.loc[df2['Job Profile Pay Band'] == 10]
+        if employee_level == 10:
+            df2 = df2.loc[df2['Job Profile Pay Band'] == 12]
+        if employee_level == 12:
+            df2 = df2.loc[df2['Job Profile Pay Band'] == 12]
+    return df2
+
+
+def old_masks(old_filter, column, time_scale):
+    # keys x levels: the rows the old filter kept for every key
+    df = pd.DataFrame({column: LEVELS})
+    masks = np.zeros((len(KEYS), len(LEVELS)), dtype=bool)
+    for i, key in enumerate(KEYS):
+        masks[i, old_filter(df, time_scale, key).index] = True
+    return masks
+
+
+def test_rules_match_the_old_filters():
+    rules = ReadinessRules.load()
+    for tab, old_filter, column in [('employee', old_ready_employees, 'Employee Level'),
+                                    ('position', old_ready_positions, 'Job Profile Pay Band')]:
+        for time_scale in TIME_SCALES:
+            expected = old_masks(old_filter, column, time_scale)
+            np.testing.assert_array_equal(rules.masks(tab, time_scale, KEYS, LEVELS), expected)
+            # the range the tabs filter by, one key at a time
+            for i, key in enumerate(KEYS):
+                limits = rules.range(tab, time_scale, key)
+                ready = np.ones(len(LEVELS), dtype=bool) if limits is None else \
+                    (LEVELS >= limits[0]) & (LEVELS <= limits[1])
+                np.testing.assert_array_equal(ready, expected[i])
+
+
+def test_unknown_time_scale_is_unconstrained():
+    rules = ReadinessRules.load()
+    assert rules.range('employee', 'Ready Eventually', 5) is None
+    assert rules.masks('position', 'Ready Eventually', KEYS, LEVELS).all()
+
+
+def test_counts_match_masks():
+    rules = ReadinessRules.load()
+    rng = np.random.default_rng(0)
+    values = rng.choice(LEVELS, 500)
+    for tab in ('employee', 'position'):
+        for time_scale in TIME_SCALES + ['Ready Eventually']:
+            masks = rules.masks(tab, time_scale, KEYS, values)
+            np.testing.assert_array_equal(rules.counts(tab, time_scale, KEYS, values), masks.sum(axis=1))
+
+
+def test_relative_and_table_rules():
+    rules = ReadinessRules({'employee': {'Ready Now': {'relative': [-1, 0]},
+                                         'Ready Soon': {'table': {'3': [1, 2]}}}})
+    assert rules.range('employee', 'Ready Now', 4) == (3, 4)
+    assert rules.range('employee', 'Ready Soon', 3) == (1, 2)
+    # keys missing from a table are not restricted
+    assert rules.range('employee', 'Ready Soon', 4) is None
@@ -0,0 +1,76 @@
+import numpy as np
+
+from result_cache import ResultCache, result_size
+
+
+class Compute:
+    # returns value and counts the calls
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.value
+
+
+def test_hits_reuse_the_result():
+    cache = ResultCache()
+    compute = Compute('slate')
+    assert cache.get('a', 'v1', compute) == 'slate'
+    assert cache.get('a', 'v1', compute) == 'slate'
+    assert compute.calls == 1
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_least_recently_used_entries_are_evicted_first():
+    cache = ResultCache(max_entries=2)
+    cache.get('a', 'v1', Compute(1))
+    cache.get('b', 'v1', Compute(2))
+    # touching a makes b the oldest entry
+    cache.get('a', 'v1', Compute(1))
+    cache.get('c', 'v1', Compute(3))
+    assert len(cache) == 2 and cache.evictions == 1
+    again = Compute(2)
+    cache.get('b', 'v1', again)
+    assert again.calls == 1
+
+
+def test_memory_bound():
+    array = np.zeros(1000)
+    cache = ResultCache(max_bytes=2 * result_size(array) + 100)
+    for key in 'abc':
+        cache.get(key, 'v1', Compute(array))
+    assert len(cache) == 2 and cache.bytes <= cache.max_bytes
+    # a result larger than the whole cache is returned but not kept
+    big = np.zeros(10000)
+    assert cache.get('big', 'v1', Compute(big)) is big
+    assert len(cache) == 2 and cache.stats()['bytes'] == 2 * result_size(array)
+
+
+def test_new_version_drops_old_entries():
+    cache = ResultCache()
+    cache.get('a', 'v1', Compute(1))
+    cache.get('b', 'v1', Compute(2))
+    compute = Compute(10)
+    assert cache.get('a', 'v2', compute) == 10 and compute.calls == 1
+    assert len(cache) == 1 and cache.invalidations == 2
+    assert cache.version == 'v2'
+
+
+def test_retired_versions_do_not_touch_the_cache():
+    cache = ResultCache()
+    cache.get('a', 'v1', Compute(1))
+    cache.invalidate('v2')
+    cache.get('a', 'v2', Compute(2))
+    # a request still running on the replaced snapshot computes its own result
+    old = Compute(1)
+    assert cache.get('a', 'v1', old) == 1 and old.calls == 1
+    assert cache.version == 'v2' and len(cache) == 1
+    current = Compute(2)
+    assert cache.get('a', 'v2', current) == 2 and current.calls == 0
+    # a version that comes back (the old workbooks restored) is current again
+    cache.invalidate('v1')
+    assert cache.version == 'v1' and len(cache) == 0
+    cache.get('a', 'v1', Compute(1))
+    assert len(cache) == 1
@@ -0,0 +1,95 @@
+import app_test
+from result_cache import ResultCache
+
+TIME_SCALES = ['Ready Now', 'Ready Later']
+
+
+# ------------------------------------------------------------------------------
+# The chain walked a seat at a time in plain Python, every slate scored in full
+def reference_ripple(data, position, employee, time_scale, steps=None, scope='anyone'):
+    chart = data.org_chart
+    ids = data.talent_candidates['Unique ID'].to_numpy()
+    taken = {employee}
+    filled = {position}
+    chain = [(0, position, employee, 'Proposed move')]
+    opened = [(seat, employee) for seat in chart.seats(employee)]
+    step = 1
+    while opened:
+        following = []
+        for seat, left in opened:
+            if seat in filled or seat not in data.target_by_key:
+                continue
+            filled.add(seat)
+            if steps is not None and step > steps:
+                chain.append((step, seat, None, 'Not followed'))
+                continue
+            team = set(chart.team(left)) if scope == 'team' else None
+            slate = [ids[row] for row in app_test.position_slate(data, seat, time_scale)[0]]
+            free = [e for e in slate if e not in taken and (team is None or e in team)]
+            if not free:
+                chain.append((step, seat, None, 'No free candidate'))
+                continue
+            taken.add(free[0])
+            chain.append((step, seat, free[0], 'Filled'))
+            following += [(vacated, free[0]) for vacated in chart.seats(free[0])]
+        if steps is not None and step > steps:
+            break
+        opened = following
+        step += 1
+    return chain
+
+
+def moves(data):
+    # proposed moves of employees who hold a seat, into another position
+    holders = [h for h in data.org_chart.holders[::7] if h in data.talent_by_id]
+    positions = data.position_list[::11]
+    return [(positions[i % len(positions)], holder) for i, holder in enumerate(holders[:15])]
+
+
+def chain_of(frame):
+    return [(row['Step'], row['Position Key'], None if row['Outcome'] not in ('Filled', 'Proposed move') else row['Unique ID'],
+             row['Outcome']) for _, row in frame.iterrows()]
+
+
+def test_ripple_matches_the_reference(data):
+    lengths = []
+    for time_scale in TIME_SCALES:
+        for position, employee in moves(data):
+            for steps, scope in [(None, 'anyone'), (2, 'anyone'), (None, 'team')]:
+                chain = app_test.ripple(ResultCache(), data, position, employee, time_scale, steps, scope)
+                assert chain_of(chain) == reference_ripple(data, position, employee, time_scale, steps, scope)
+                lengths.append(len(chain))
+    # some chains go further than the proposed move and its first seat
+    assert max(lengths) > 2
+
+
+def test_ripple_invariants(data):
+    chart = data.org_chart
+    for position, employee in moves(data):
+        chain = app_test.ripple(ResultCache(), data, position, employee, 'Ready Later')
+        placed = chain['Unique ID'][chain['Outcome'].isin(['Filled', 'Proposed move'])]
+        # nobody is moved twice and every seat is reached once
+        assert placed.is_unique and chain['Position Key'].is_unique
+        mover = dict(zip(chain['Position Key'], chain['Unique ID']))
+        for _, row in chain.iloc[1:].iterrows():
+            # a seat is opened by the employee who left it, placed one step earlier
+            assert row['Position Key'] in chart.seats(row['Vacated By'])
+            assert row['Reports To'] == chart.manager(row['Position Key'])
+            left = chain[(chain['Unique ID'] == row['Vacated By']) & chain['Outcome'].isin(['Filled', 'Proposed move'])]
+            assert len(left) == 1 and left['Step'].iloc[0] == row['Step'] - 1
+            if row['Outcome'] == 'Filled':
+                assert mover[row['Position Key']] == row['Unique ID'] and row['Slate Rank'] >= 1
+
+
+def test_cached_slates_give_the_same_chain(data):
+    results = ResultCache()
+    for position, employee in moves(data):
+        first = app_test.ripple(results, data, position, employee, 'Ready Now')
+        again = app_test.ripple(results, data, position, employee, 'Ready Now')
+        assert first.equals(again)
+        assert first.equals(app_test.ripple(ResultCache(), data, position, employee, 'Ready Now'))
+
+
+def test_unknown_position_or_employee(data):
+    assert app_test.ripple(ResultCache(), data, 'no such position', data.employee_list[0], 'Ready Now').empty
+    assert app_test.ripple(ResultCache(), data, data.position_list[0], -1, 'Ready Now').empty
@@ -0,0 +1,80 @@
+import numpy as np
+
+import app_test
+from competency import importance_weights
+from similarity import KDTree, SimilarityIndex
+
+
+def clustered_points(rng, n, dims=14):
+    # integer scores around a few centres, so many distances tie
+    centres = rng.integers(1, 6, (8, dims))
+    points = centres[rng.integers(0, len(centres), n)] + rng.integers(-1, 2, (n, dims))
+    return points.astype(np.float64)
+
+
+def test_kd_tree_matches_brute_force():
+    rng = np.random.default_rng(0)
+    points = clustered_points(rng, 3000)
+    rows = np.arange(len(points))
+    tree = KDTree(points, rows, leaf_size=8)
+    scan = SimilarityIndex(points, brute_force_rows=len(points))
+    assert scan.tree is None
+    for i in range(40):
+        reference = points[rng.integers(len(points))] if i % 2 else rng.integers(1, 6, points.shape[1]).astype(float)
+        # the weights of the similar talent search: an employee's own, or none
+        weights = importance_weights(reference).astype(np.float64) if i % 3 else np.ones(points.shape[1])
+        exclude = rng.choice(rows, 5, replace=False)
+        for k in (1, 10, 100):
+            got_rows, got_distances = tree.query(reference, weights, k, exclude)
+            rows_expected, distances_expected = scan.brute_force(reference, weights, k, exclude)
+            np.testing.assert_array_equal(got_rows, rows_expected)
+            np.testing.assert_array_equal(got_distances, distances_expected)
+
+
+def test_nearest_with_tree_matches_scan():
+    # rows with missing scores are scanned next to the tree and merged into one ranking
+    rng = np.random.default_rng(1)
+    points = clustered_points(rng, 2000)
+    points[rng.choice(len(points), 50, replace=False), rng.integers(0, points.shape[1], 50)] = np.nan
+    rows = np.arange(0, len(points), 2)
+    with_tree = SimilarityIndex(points, rows, leaf_size=8, brute_force_rows=0)
+    scan = SimilarityIndex(points, rows, brute_force_rows=len(points))
+    assert with_tree.tree is not None and len(with_tree) == len(scan)
+    for i in range(20):
+        reference = points[rows[i * 7]]
+        for weights in (None, importance_weights(reference)):
+            got = with_tree.nearest(reference, weights, k=25, exclude=[rows[i * 7]])
+            expected = scan.nearest(reference, weights, k=25, exclude=[rows[i * 7]])
+            np.testing.assert_array_equal(got[0], expected[0])
+            np.testing.assert_array_equal(got[1], expected[1])
+
+
+def test_negative_weights_count_nothing():
+    # a low-level employee's adjusted scores, and so its weights, can be below zero
+    rng = np.random.default_rng(2)
+    points = clustered_points(rng, 3000) - 3
+    # halfway between the integer scores, so every other row is at least 0.5 off in every score
+    reference = points[17] + 0.5
+    assert (importance_weights(reference) < 0).any()
+    # a copy of the reference with a weighted score off by a little is the nearest row
+    points[2500] = reference
+    points[2500, np.argmax(importance_weights(reference))] += 0.01
+    for index in (SimilarityIndex(points, leaf_size=8, brute_force_rows=0),
+                  SimilarityIndex(points, brute_force_rows=len(points))):
+        rows, distances = index.nearest(reference, importance_weights(reference), k=50)
+        assert (distances >= 0).all()
+        assert np.all(np.diff(distances) >= 0)
+        assert rows[0] == 2500 and distances[0] < distances[1]
+        expected = np.abs(points[rows] - reference) @ np.maximum(importance_weights(reference), 0)
+        np.testing.assert_allclose(distances, expected)
+
+
+def test_similar_employees_are_never_negative_distances(data):
+    negative = 0
+    for employee in data.employee_list[::3]:
+        level, adjusted, weights = data.engine.employee(employee)
+        negative += bool((weights < 0).any())
+        similar = app_test.similar_employees(data, employee, 25, 'weighted')
+        assert (similar['Competency Distance'] >= 0).all()
+        assert similar['Competency Distance'].is_monotonic_increasing
+    assert negative > 0
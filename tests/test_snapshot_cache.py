@@ -0,0 +1,90 @@
+import os
+
+import pandas as pd
+
+import snapshot_cache
+
+
+class Builder:
+    # counts the builds and returns a frame made from the source files
+    def __init__(self, paths):
+        self.paths = paths
+        self.builds = 0
+
+    def __call__(self):
+        self.builds += 1
+        frames = {}
+        for name, path in self.paths.items():
+            with open(path) as f:
+                frames[name] = pd.DataFrame({'text': [f.read()], 'n': [self.builds]})
+        return frames
+
+
+def sources(tmp_path):
+    paths = {}
+    for name in ('talent', 'target'):
+        paths[name] = str(tmp_path / (name + '.xlsx'))
+        with open(paths[name], 'w') as f:
+            f.write(name)
+    return paths
+
+
+def load(paths, cache_dir, build):
+    return snapshot_cache.load_snapshot(paths, str(cache_dir), build)
+
+
+def test_unchanged_workbooks_reuse_the_snapshot(tmp_path):
+    paths = sources(tmp_path)
+    build = Builder(paths)
+    frames, version = load(paths, tmp_path / 'cache', build)
+    again, same_version = load(paths, tmp_path / 'cache', build)
+    assert build.builds == 1
+    assert version == same_version
+    pd.testing.assert_frame_equal(again['talent'], frames['talent'])
+
+
+def test_touched_workbook_is_hashed_not_rebuilt(tmp_path):
+    paths = sources(tmp_path)
+    build = Builder(paths)
+    _, version = load(paths, tmp_path / 'cache', build)
+    st = os.stat(paths['talent'])
+    os.utime(paths['talent'], (st.st_atime, st.st_mtime + 10))
+    _, touched = load(paths, tmp_path / 'cache', build)
+    assert build.builds == 1 and touched == version
+    # the new mtime is recorded, so the next start does not hash again
+    manifest = snapshot_cache.read_manifest(str(tmp_path / 'cache'))
+    assert manifest['sources']['talent']['mtime'] == st.st_mtime + 10
+
+
+def test_changed_workbook_rebuilds(tmp_path):
+    paths = sources(tmp_path)
+    build = Builder(paths)
+    _, version = load(paths, tmp_path / 'cache', build)
+    # same size, different content and mtime
+    with open(paths['talent'], 'w') as f:
+        f.write('TALENT')
+    st = os.stat(paths['talent'])
+    os.utime(paths['talent'], (st.st_atime, st.st_mtime + 10))
+    frames, changed = load(paths, tmp_path / 'cache', build)
+    assert build.builds == 2 and changed != version
+    assert frames['talent']['text'][0] == 'TALENT'
+    # going back to the old content gives back the old version
+    with open(paths['talent'], 'w') as f:
+        f.write('talent')
+    assert load(paths, tmp_path / 'cache', build)[1] == version
+
+
+def test_missing_or_stale_snapshot_rebuilds(tmp_path):
+    paths = sources(tmp_path)
+    build = Builder(paths)
+    load(paths, tmp_path / 'cache', build)
+    manifest = snapshot_cache.read_manifest(str(tmp_path / 'cache'))
+    fmt = manifest['frames']['target']
+    os.remove(str(tmp_path / 'cache' / ('target.' + ('parquet' if fmt == 'parquet' else 'pkl'))))
+    load(paths, tmp_path / 'cache', build)
+    assert build.builds == 2
+    # a snapshot written by another cache format version is ignored
+    manifest = snapshot_cache.read_manifest(str(tmp_path / 'cache'))
+    snapshot_cache.write_manifest(str(tmp_path / 'cache'), dict(manifest, version=manifest['version'] - 1))
+    load(paths, tmp_path / 'cache', build)
+    assert build.builds == 3
@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import app_test
+import data_loader
+from filters import FilterIndex
+from result_cache import ResultCache
+from storage import HAS_DUCKDB, SqlFilterIndex, SqlRecords, SqlStorage
+
+BACKENDS = ['sqlite', pytest.param('duckdb', marks=pytest.mark.skipif(not HAS_DUCKDB, reason='needs duckdb'))]
+
+DIMENSIONS = ['Employee Level', 'Function', 'Location', '9Box Score']
+THRESHOLDS = ['Time in Position (months)', 'Time in Level (months)']
+
+
+def random_filter(rng, df):
+    # one filter of the kinds the tabs build, as the method and its arguments
+    kind = rng.integers(4)
+    if kind == 0:
+        column = DIMENSIONS[rng.integers(len(DIMENSIONS))]
+        values = df[column].dropna().unique()
+        chosen = list(rng.choice(values, rng.integers(0, len(values) + 1), replace=False))
+        return 'isin', (column, chosen + [np.nan] * int(rng.integers(2)))
+    if kind == 1:
+        low = int(rng.integers(0, 11))
+        return 'between', ('Employee Level', low, low + int(rng.integers(0, 4)))
+    if kind == 2:
+        return 'below', ('Employee Level', int(rng.integers(0, 12)))
+    return 'at_least', (THRESHOLDS[rng.integers(len(THRESHOLDS))], int(rng.integers(0, 100)))
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_sql_mask_matches_bitsets(data, tmp_path, backend):
+    df = data.talent_candidates.copy()
+    # missing values are selected by a NaN in the chosen values
+    df.loc[df.index[::9], 'Location'] = np.nan
+    storage = SqlStorage.build(str(tmp_path), 'test', {'talent_candidates': df}, backend)
+    bitsets = FilterIndex(df, DIMENSIONS, THRESHOLDS)
+    sql = SqlFilterIndex(storage, 'talent_candidates', df)
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        bits, condition = bitsets.everything(), sql.everything()
+        for _ in range(rng.integers(0, 4)):
+            method, args = random_filter(rng, df)
+            bits &= getattr(bitsets, method)(*args)
+            condition &= getattr(sql, method)(*args)
+        np.testing.assert_array_equal(sql.mask(condition), bitsets.mask(bits))
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_sql_backend_selects_the_same_rows(frames, data, tmp_path, backend):
+    stored = data_loader.DataSnapshot(frames, store_dir=str(tmp_path), backend=backend)
+    assert isinstance(stored.candidate_filters, SqlFilterIndex)
+    for time_scale in ['Ready Now', 'Ready Soon', 'Ready Later']:
+        for position in data.position_list[::40]:
+            for level, function, location, nine_box, tip, til in [
+                    (None, None, None, None, None, None),
+                    (list(data.employee_level_list), ['Finance', 'Culinary', 'People'], None, None, 12, None),
+                    (None, None, ['Miami', 'Zug', 'London', 'Toronto'], [4, 5, 6, 7, 8, 9], None, 24)]:
+                args = (time_scale, position, level, function, location, nine_box, tip, til)
+                np.testing.assert_array_equal(app_test.employee_mask(stored, *args),
+                                              app_test.employee_mask(data, *args))
+        for employee in data.employee_list[::40]:
+            for band, function, location in [(None, None, None),
+                                             (list(data.job_profile_pay_band_list), ['Finance', 'Tax', 'People'], None),
+                                             (None, None, ['Miami', 'Zug', 'London', 'Toronto'])]:
+                args = (time_scale, employee, band, function, location)
+                np.testing.assert_array_equal(app_test.position_mask(stored, *args),
+                                              app_test.position_mask(data, *args))
+
+
+def assert_same_table(got, expected):
+    if isinstance(got, list):
+        got, expected = pd.DataFrame(got), pd.DataFrame(expected)
+    pd.testing.assert_frame_equal(got, expected)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_sql_backend_reads_the_same_tables(frames, data, tmp_path, backend):
+    stored = data_loader.DataSnapshot(frames, store_dir=str(tmp_path), backend=backend)
+    # the pools are read from the database and no longer held
+    assert stored.talent_pool is None and stored.position_pool is None and stored.talent_candidates is None
+    assert isinstance(stored.candidate_records, SqlRecords)
+    results, stored_results = ResultCache(), ResultCache()
+    for position in data.position_list[::25]:
+        assert_same_table(app_test.find_position(stored, position), app_test.find_position(data, position))
+        assert_same_table(app_test.calculateScore_position(stored, position), app_test.calculateScore_position(data, position))
+        for top_k in (None, 10):
+            args = (position, top_k, 'Ready Later', None, None, None, None, None, None)
+            got, count = app_test.ranked_employees(stored_results, stored, *args)
+            expected, expected_count = app_test.ranked_employees(results, data, *args)
+            assert count == expected_count
+            assert_same_table(got, expected)
+    for employee in data.employee_list[::25]:
+        assert_same_table(app_test.find_employee(stored, employee), app_test.find_employee(data, employee))
+        assert_same_table(app_test.calculateScore_employee(stored, employee), app_test.calculateScore_employee(data, employee))
+        assert_same_table(app_test.top_position_table(stored, employee, 10, 'Ready Later', None, None, None)[0],
+                          app_test.top_position_table(data, employee, 10, 'Ready Later', None, None, None)[0])
+        assert_same_table(app_test.similar_employees(stored, employee, 10, 'weighted'),
+                          app_test.similar_employees(data, employee, 10, 'weighted'))
+    positions = list(data.position_list[:10])
+    assert_same_table(app_test.assign_positions(stored, positions, 'Ready Later'),
+                      app_test.assign_positions(data, positions, 'Ready Later'))
+    assert app_test.open_positions(stored, None, ['Finance'], None) == app_test.open_positions(data, None, ['Finance'], None)
+
+
+def test_sql_records_keep_order_and_dtypes(data, tmp_path):
+    df = data.position_pool
+    storage = SqlStorage.build(str(tmp_path), 'test', {'position_pool': df}, 'sqlite')
+    records = SqlRecords(storage, 'position_pool', df)
+    columns = list(df.columns)
+    rng = np.random.default_rng(0)
+    # a few rows, repeated and out of order, most of the table, and none
+    for rows in [rng.integers(0, len(df), 7), rng.permutation(len(df))[:len(df) - 3], np.arange(0)]:
+        pd.testing.assert_frame_equal(records.take(rows, columns), df.iloc[rows][columns])
+
+
+def test_reload_on_the_database_reuses_unchanged_structures(frames, tmp_path):
+    first = data_loader.DataSnapshot(frames, store_dir=str(tmp_path), backend='sqlite', version='v1')
+    changed = dict(frames, target=frames['target'].iloc[:-1])
+    second = data_loader.DataSnapshot(changed, store_dir=str(tmp_path), backend='sqlite', version='v2', previous=first)
+    # dropped frames are compared by their fingerprints
+    assert 'engine' in second.reused and 'talent_by_id' in second.reused
+    assert 'org_chart' not in second.reused and 'target_by_key' not in second.reused
+    assert second.engine is first.engine
+    pd.testing.assert_frame_equal(second.candidate_records.take(np.arange(5), ['Unique ID', 'Location']),
+                                  first.candidate_records.take(np.arange(5), ['Unique ID', 'Location']))
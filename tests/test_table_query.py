@@ -0,0 +1,73 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+import app_test
+from result_cache import ResultCache
+from table_query import PAGE_SIZE, page_rows, parse_filter, query_table
+
+
+def people():
+    return pd.DataFrame({'Unique ID': [5, 3, 8, 1, 9, 2],
+                         'Location': ['Miami', 'Toronto', 'miami beach', None, 'Madrid', 'Toronto'],
+                         'Employee Level': [3, 1, 4, 3, np.nan, 2],
+                         'Hire Date': ['2019-03-01', '2020-01-15', '2019-11-30', '2021-06-01', None, '2018-02-02']})
+
+
+def test_parse_filter():
+    query = ('{Location} icontains "Mi" && {Employee Level} >= 3 && {Hire Date} datestartswith 2019'
+             ' && {Location} s= \'it\\\'s\' && {Mobility} is blank && nonsense')
+    assert parse_filter(query) == [('Location', 'contains', 'Mi'), ('Employee Level', 'ge', '3'),
+                                   ('Hire Date', 'datestartswith', '2019'), ('Location', 'eq', "it's"),
+                                   ('Mobility', 'blank', '')]
+    assert parse_filter('') == [] and parse_filter(None) == []
+
+
+def test_filters():
+    df = people()
+    ids = lambda query: query_table(df, query)['Unique ID'].tolist()
+    assert ids('{Location} contains mi') == [5, 8]
+    assert ids('{Employee Level} >= 3') == [5, 8, 1]
+    assert ids('{Employee Level} > 1 && {Location} = Toronto') == [2]
+    assert ids('{Employee Level} != 3') == [3, 8, 9, 2]
+    assert ids('{Hire Date} datestartswith 2019') == [5, 8]
+    assert ids('{Location} is blank') == [1]
+    # a number that does not parse matches nothing; an unknown column is ignored
+    assert ids('{Employee Level} > high') == []
+    assert ids('{Unknown} = 1') == [5, 3, 8, 1, 9, 2]
+
+
+def test_sort_is_stable_with_missing_values_last():
+    df = people()
+    ids = lambda sort_by: query_table(df, None, sort_by)['Unique ID'].tolist()
+    assert ids([{'column_id': 'Employee Level', 'direction': 'asc'}]) == [3, 2, 5, 1, 8, 9]
+    assert ids([{'column_id': 'Employee Level', 'direction': 'desc'}]) == [8, 5, 1, 2, 3, 9]
+    assert ids([{'column_id': 'Location', 'direction': 'asc'},
+                {'column_id': 'Employee Level', 'direction': 'desc'}]) == [9, 5, 2, 3, 8, 1]
+    # without a sort the ranking is kept
+    assert query_table(df, None, [])['Unique ID'].tolist() == [5, 3, 8, 1, 9, 2]
+
+
+def test_page_rows():
+    df = pd.DataFrame({'a': range(60)})
+    page, rows = page_rows(df, 1, None)
+    assert page == 1 and rows['a'].tolist() == list(range(PAGE_SIZE, 2 * PAGE_SIZE))
+    # past the end of a shrunken result, the last page
+    page, rows = page_rows(df.head(30), 2, 10)
+    assert page == 2 and rows['a'].tolist() == list(range(20, 30))
+
+
+def test_download_has_every_row_of_the_view(data):
+    results = ResultCache()
+    position = data.position_list[0]
+    sort_by = [{'column_id': 'Employee Level', 'direction': 'desc'}]
+    filter_query = '{Sum of Weighted Differences} > -1000'
+    selection = (position, 'Ready Later', None, None, None, None, None, None, None, sort_by, filter_query)
+    ranked, count, view = app_test.employee_view(results, data, *selection)
+    assert len(view) == count > PAGE_SIZE
+    sent = app_test.csv_download(view, app_test.CANDIDATE_TABLE_COLUMNS, 'candidates.csv')
+    csv = pd.read_csv(io.StringIO(sent['content']))
+    assert list(csv.columns) == app_test.CANDIDATE_TABLE_COLUMNS
+    assert csv['Unique ID'].tolist() == view['Unique ID'].tolist()
+    assert csv['Unique ID'].tolist() == query_table(ranked, filter_query, sort_by)['Unique ID'].tolist()
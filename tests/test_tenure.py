@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import synthetic_data
+from tenure import TenureMatrix
+
+AS_OF = '2024-06-30'
+
+
+def job_history(employees=150, seed=0):
+    rng = np.random.default_rng(seed)
+    return synthetic_data.make_job_history(rng, synthetic_data.employee_ids(employees))
+
+
+def assert_same(appended, rebuilt):
+    assert set(appended.functions) == set(rebuilt.functions)
+    assert set(appended.employees) == set(rebuilt.employees)
+    for function in rebuilt.functions:
+        for got, expected in zip(appended.column(function, AS_OF), rebuilt.column(function, AS_OF)):
+            got = pd.Series(got, index=appended.employees).reindex(rebuilt.employees)
+            np.testing.assert_array_equal(got.to_numpy(), expected)
+
+
+def test_appended_later_jobs_match_a_rebuild():
+    history = job_history()
+    # the last job of every employee arrives later, plus the jobs of new employees
+    latest = history.groupby('Unique ID').cumcount(ascending=False) == 0
+    new_employee = history['Unique ID'] >= 100140
+    old = history[~latest & ~new_employee]
+    rows = history[latest | new_employee]
+    full = pd.concat([old, rows])
+    tenure = TenureMatrix(old).append(rows, full)
+    assert_same(tenure, TenureMatrix(full))
+
+
+def test_new_function_is_added():
+    history = job_history()
+    rows = pd.DataFrame({'Unique ID': [100000, 999999], 'Effective Date': pd.to_datetime(['2030-01-01', '2020-01-01']),
+                         'Function': ['Astronomy', 'Astronomy'], 'Pay Scale Group': [3, 4]})
+    full = pd.concat([history, rows])
+    tenure = TenureMatrix(history).append(rows, full)
+    assert 'Astronomy' in tenure.functions
+    assert_same(tenure, TenureMatrix(full))
+
+
+def test_rows_out_of_date_order_are_recounted():
+    history = job_history()
+    # a job dated before the employee's current one, and an undated job
+    middle = history.groupby('Unique ID').cumcount() == 1
+    rows = history[middle].head(20).copy()
+    old = history.drop(index=rows.index)
+    undated = history[history['Unique ID'] == history['Unique ID'].iloc[-1]].head(1).assign(**{'Effective Date': pd.NaT})
+    rows = pd.concat([rows, undated])
+    full = pd.concat([old, rows])
+    with pytest.raises(ValueError):
+        TenureMatrix(old).append(rows)
+    assert_same(TenureMatrix(old).append(rows, full), TenureMatrix(full))
+
+
+def test_copy_is_independent():
+    history = job_history()
+    half = history['Unique ID'] < 100075
+    tenure = TenureMatrix(history[half])
+    before = tenure.column('Finance', AS_OF)[0].copy()
+    tenure.copy().append(history[~half], history)
+    np.testing.assert_array_equal(tenure.column('Finance', AS_OF)[0], before)
+    assert len(tenure) == half.groupby(history['Unique ID']).first().sum()
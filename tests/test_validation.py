@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+import data_loader
+import synthetic_data
+import validation
+
+
+# ------------------------------------------------------------------------------
+# The double-score fix-up as it was before validation.fix_double_scores. The
+# score columns are made float first: newer pandas no longer casts an integer
+# column when a half is written into it.
+def old_fix_double_scores(talent_pool):
+    talent_pool = talent_pool.copy()
+    for column in range(3, 18):
+        talent_pool.isetitem(column, talent_pool.iloc[:, column].astype(float))
+    wrong_list = []
+    for row in range(0, talent_pool.iloc[:, 3:17].shape[0]):
+        for col in range(1, talent_pool.iloc[:, 3:17].shape[1]):
+            if talent_pool.iloc[:, 3:17].iloc[row, col] == 6:
+                if row not in wrong_list:
+                    wrong_list.append(row)
+    for row in wrong_list:
+        for column in range(3, 18):
+            talent_pool.iloc[row, column] = talent_pool.iloc[row, column].astype(int) / 2
+    return talent_pool, wrong_list
+
+
+def talent_pool_before_fix(monkeypatch, employees=300):
+    # the talent_pool clean_data hands to fix_double_scores, and what it makes of it
+    seen = {}
+
+    def fix(talent_pool):
+        seen['before'] = talent_pool.copy()
+        seen['rows'] = validation.fix_double_scores(talent_pool)
+        seen['after'] = talent_pool
+        return seen['rows']
+
+    monkeypatch.setattr(data_loader, 'fix_double_scores', fix)
+    data_loader.clean_data(synthetic_data.generate(employees, seed=0))
+    return seen
+
+
+def test_fix_matches_old_loop(monkeypatch):
+    seen = talent_pool_before_fix(monkeypatch)
+    expected, wrong_list = old_fix_double_scores(seen['before'])
+    assert len(wrong_list) > 0
+    np.testing.assert_array_equal(seen['rows'], sorted(wrong_list))
+    pd.testing.assert_frame_equal(seen['after'], expected, check_dtype=False)
+
+
+def test_whole_halves_keep_integer_columns():
+    df = pd.DataFrame({'a': [1, 2], 'b': [1, 2], 'c': [1, 2]})
+    for i in range(15):
+        df['s{}'.format(i)] = [2, 4]
+    df['s2'] = [6, 4]
+    df['s14'] = [3, 5]
+    rows = validation.fix_double_scores(df)
+    np.testing.assert_array_equal(rows, [0])
+    assert df['s3'].dtype == np.int64 and df['s3'].tolist() == [1, 4]
+    # 3 / 2 is not whole, so that column becomes float
+    assert df['s14'].tolist() == [1.5, 5]
+
+
+def test_no_doubled_rows():
+    df = pd.DataFrame(np.ones((3, 20), dtype=int))
+    assert len(validation.fix_double_scores(df)) == 0
+    assert (df == 1).all().all()
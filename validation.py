@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+from competency import COMPETENCIES, SIGNATURE_COLUMNS, competency_matrix
+
+
+# ------------------------------------------------------------------------------
+# Ingest validation
+# Runs once when the workbooks are cleaned. Fixes the double-scored talent rows in
+# bulk and counts the problems found; the counts are kept with the snapshot.
+COMPETENCY_RANGE = (1, 5)
+DOUBLED_SCORE = 6
+
+
+def fix_double_scores(talent_pool):
+    # Rows with a 6 in columns 4-16 had their scores added twice; columns 3-17 of
+    # those rows are halved. Returns the positions of the fixed rows.
+    checked = talent_pool.iloc[:, 4:17].to_numpy()
+    doubled = np.flatnonzero((checked == DOUBLED_SCORE).any(axis=1))
+    if len(doubled) == 0:
+        return doubled
+    for column in range(3, 18):
+        name = talent_pool.columns[column]
+        dtype = talent_pool[name].dtype
+        values = talent_pool[name].to_numpy(dtype=np.float64, copy=True)
+        values[doubled] = np.trunc(values[doubled]) / 2
+        # integer columns stay integer as long as every halved score is whole
+        if pd.api.types.is_integer_dtype(dtype) and (values[doubled] == np.trunc(values[doubled])).all():
+            talent_pool[name] = values.astype(dtype)
+        else:
+            talent_pool[name] = values
+    return doubled
+
+
+def out_of_range(scores):
+    low, high = COMPETENCY_RANGE
+    return int(((scores < low) | (scores > high)).sum())
+
+
+def validation_report(talent, target, job_signatures, talent_pool, fixed_rows):
+    talent_scores = competency_matrix(talent_pool)
+    signature_scores = competency_matrix(job_signatures, [SIGNATURE_COLUMNS.get(c, c) for c in COMPETENCIES])
+    checks = [
+        ('doubled score rows fixed', len(fixed_rows)),
+        ('talent scores out of range', out_of_range(talent_scores)),
+        ('talent scores missing', int(np.isnan(talent_scores).sum())),
+        ('job signature scores out of range', out_of_range(signature_scores)),
+        ('job signature scores missing', int(np.isnan(signature_scores).sum())),
+        ('duplicate talent Unique IDs', int(talent['Unique ID'].duplicated().sum())),
+        ('duplicate target Unique IDs', int(target['Unique ID'].dropna().duplicated().sum())),
+    ]
+    return pd.DataFrame(checks, columns=['Check', 'Count'])
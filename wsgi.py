@@ -0,0 +1,12 @@
+import os
+
+from app_test import create_app
+
+
+# ------------------------------------------------------------------------------
+# WSGI entry point for gunicorn: gunicorn -c gunicorn.conf.py wsgi:server
+# The data is loaded when this module is imported. gunicorn.conf.py preloads it in
+# the master, so the workers are forked with the snapshot already in memory and
+# share its pages instead of each loading a copy.
+app = create_app(os.environ.get('DATA_DIR', '.'), preload=True)
+server = app.server